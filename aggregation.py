@@ -0,0 +1,122 @@
+from operator import itemgetter
+import numpy as np
+from fit_store import point_value
+from fit_stream import iter_buckets
+
+NANOS_PER_HOUR = 3600 * 1000000000
+NANOS_PER_DAY = 24 * NANOS_PER_HOUR
+
+DEFAULT_PERCENTILES = (5, 25, 50, 75, 95)
+
+# Turn a response (dict or raw bytes) into (starts, ends, values) arrays. The points are
+# gathered into one list, and every column is filled from it by np.fromiter in one go.
+def response_to_arrays(response):
+    points = []
+    if response:
+        if isinstance(response, (bytes, bytearray)):
+            buckets = iter_buckets(response)
+        else:
+            points.extend(response.get('point', []))
+            buckets = response.get('bucket', [])
+        points.extend(point for bucket in buckets for dataset in bucket.get('dataset', [])
+                      for point in dataset.get('point', []))
+
+    count = len(points)
+    return (np.fromiter(map(int, map(itemgetter('startTimeNanos'), points)), np.int64, count),
+            np.fromiter(map(int, map(itemgetter('endTimeNanos'), points)), np.int64, count),
+            np.fromiter(map(point_value, points), np.float64, count))
+
+# Read a window of a source from the local store as arrays, like FitStore.read: the newest row
+# for every start time, then the rows that overlap [start_ns, end_ns), sorted by start time.
+# The day columns are read with np.frombuffer, without a Python step per row.
+def store_to_arrays(store, data_source_id, start_ns, end_ns):
+    columns = store.day_columns(data_source_id, start_ns, end_ns)
+    if not columns:
+        return np.empty(0, np.int64), np.empty(0, np.int64), np.empty(0, np.float64)
+    starts = np.concatenate([np.frombuffer(day[0], np.int64) for day in columns])
+    ends = np.concatenate([np.frombuffer(day[1], np.int64) for day in columns])
+    values = np.concatenate([np.frombuffer(day[2], np.float64) for day in columns])
+    del columns
+
+    # Rows are appended in time order, so unless a start time was written again the starts
+    # are already unique and sorted; otherwise keep the last (newest) row of every start
+    if starts.size > 1 and not (starts[1:] > starts[:-1]).all():
+        _, last = np.unique(starts[::-1], return_index=True)
+        newest = starts.size - 1 - last
+        starts, ends, values = starts[newest], ends[newest], values[newest]
+
+    overlap = (starts < end_ns) & (ends >= start_ns)
+    return starts[overlap], ends[overlap], values[overlap]
+
+# Average of `values` over [start_ns, end_ns), every point weighted by the part of the window
+# it covers (see FitStore.average); a plain mean when no point has a duration. None when empty.
+def window_average(starts, ends, values, start_ns, end_ns):
+    if values.size == 0:
+        return None
+    weights = np.minimum(ends, end_ns) - np.maximum(starts, start_ns)
+    covering = weights > 0
+    if not covering.any():
+        return float(values.mean())
+    return float(np.dot(weights[covering], values[covering]) / weights[covering].sum())
+
+# Hours of [start_ns, end_ns) covered by segments, counting only the part inside the window
+def window_duration_hours(starts, ends, start_ns, end_ns):
+    covered = np.minimum(ends, end_ns) - np.maximum(starts, start_ns)
+    return float(covered[covered > 0].sum()) / NANOS_PER_HOUR
+
+# Count, mean, min, max and percentiles of heart rate values, or None when there are none
+def heart_rate_stats(values, percentiles=DEFAULT_PERCENTILES):
+    values = np.asarray(values, np.float64)
+    if values.size == 0:
+        return None
+    return {
+        'count': int(values.size),
+        'mean': float(values.mean()),
+        'min': float(values.min()),
+        'max': float(values.max()),
+        'percentiles': dict(zip(percentiles, np.percentile(values, percentiles).tolist())),
+    }
+
+# Group values into fixed-size time buckets by their start time.
+# Returns the bucket start times and the count, mean, min and max of every non-empty bucket.
+def bucket_stats(starts, values, bucket_nanos=NANOS_PER_HOUR):
+    starts = np.asarray(starts, np.int64)
+    values = np.asarray(values, np.float64)
+    if values.size == 0:
+        empty = np.empty(0, np.float64)
+        return {'start': np.empty(0, np.int64), 'count': np.empty(0, np.int64),
+                'mean': empty, 'min': empty, 'max': empty}
+
+    buckets = starts // bucket_nanos
+    order = np.argsort(buckets, kind='stable')
+    buckets = buckets[order]
+    values = values[order]
+
+    # Index of the first value of every bucket
+    first = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    counts = np.diff(np.r_[first, values.size])
+    return {
+        'start': buckets[first] * bucket_nanos,
+        'count': counts,
+        'mean': np.add.reduceat(values, first) / counts,
+        'min': np.minimum.reduceat(values, first),
+        'max': np.maximum.reduceat(values, first),
+    }
+
+# Total hours covered by sleep segments
+def total_sleep_hours(starts, ends):
+    durations = np.asarray(ends, np.int64) - np.asarray(starts, np.int64)
+    return float(durations.sum()) / NANOS_PER_HOUR
+
+# Hours of sleep per UTC day, counting every segment on the day it ends (the day of waking up).
+# Returns the day start times and the hours slept.
+def daily_sleep_hours(starts, ends):
+    starts = np.asarray(starts, np.int64)
+    ends = np.asarray(ends, np.int64)
+    if starts.size == 0:
+        return np.empty(0, np.int64), np.empty(0, np.float64)
+
+    days = ends // NANOS_PER_DAY
+    unique_days, index = np.unique(days, return_inverse=True)
+    hours = np.bincount(index, weights=(ends - starts).astype(np.float64)) / NANOS_PER_HOUR
+    return unique_days * NANOS_PER_DAY, hours
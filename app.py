@@ -1,39 +1,7 @@
 import tkinter as tk
 from tkinter import messagebox
 from PIL import Image, ImageTk
-
-# Function to assess mental health based on input values
-def assess_mental_health(heart_rate_var, sleep_hours, noise_level, light_level):
-    stress_score = 0
-
-    # Physiological Factors
-    if heart_rate_var < 50 or heart_rate_var > 95:
-        stress_score += 1
-
-    if sleep_hours < 6 or sleep_hours > 15:
-        stress_score += 1
-
-    # Environmental Factors
-    if noise_level > 70:
-        stress_score += 1
-
-    if light_level < 30 or light_level > 200:
-        stress_score += 1
-
-    return stress_score
-
-# Function to provide recommendations based on stress score
-def provide_recommendation(stress_score):
-    if stress_score == 0:
-        return "You are doing well! Keep up your current routine."
-    elif stress_score == 1:
-        return "Slight stress detected. Try to relax and take breaks."
-    elif stress_score == 2:
-        return "Moderate stress detected. Ensure you have enough sleep and reduce exposure to noise."
-    elif stress_score == 3:
-        return "High stress detected. Consider reducing environmental stressors and practice mindfulness."
-    else:
-        return "Critical stress levels detected! Please reach out to a mental health professional."
+from scoring import assess_mental_health, provide_recommendation
 
 # Function to collect sensor data from user input and assess mental health
 def on_submit():
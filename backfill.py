@@ -0,0 +1,142 @@
+import os
+import json
+import argparse
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from krde import (authenticate_google_fit, fetch_combined_data, fetch_data, heart_rate_data_source,
+                  sleep_data_source)
+from fit_service import get_fitness_service
+from fit_store import STORE_DIR, FitStore, points_from_response
+from fit_aggregate import PointCollector, parse_aggregate_response
+
+# Finished chunks of every source are recorded here so an interrupted backfill resumes where it stopped
+CHECKPOINT_FILE = os.path.join(STORE_DIR, 'backfill_checkpoint.json')
+
+SOURCES = [
+    (heart_rate_data_source, "com.google.heart_rate.bpm"),
+    (sleep_data_source, "com.google.sleep.segment"),
+]
+
+DAY_MILLIS = 86400000
+
+
+# The chunks (start_time-end_time in milliseconds) of every source that past backfills finished.
+# A chunk recorded without a source (older checkpoints) is finished for all sources.
+class BackfillCheckpoint:
+    def __init__(self, path=CHECKPOINT_FILE):
+        self.path = path
+        self.completed = set()
+        if os.path.exists(path):
+            try:
+                with open(path) as f:
+                    self.completed = set(json.load(f).get('completed', []))
+            except (OSError, ValueError) as e:
+                print(f"Ignoring unreadable checkpoint {path}: {e}")
+
+    @staticmethod
+    def _key(chunk, source=None):
+        key = f"{chunk[0]}-{chunk[1]}"
+        return f"{key} {source}" if source else key
+
+    def is_done(self, chunk, source):
+        return self._key(chunk) in self.completed or self._key(chunk, source) in self.completed
+
+    # Record a finished chunk of a source and save the checkpoint atomically
+    def mark_done(self, chunk, source):
+        self.completed.add(self._key(chunk, source))
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({'completed': sorted(self.completed)}, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+# Split [start_time, end_time) into consecutive chunks of `chunk_millis`
+def split_range(start_time, end_time, chunk_millis):
+    chunks = []
+    while start_time < end_time:
+        chunks.append((start_time, min(start_time + chunk_millis, end_time)))
+        start_time += chunk_millis
+    return chunks
+
+# Fetch one chunk of `sources` (runs on the worker pool).
+# Returns a list of (data source ID, points), with None as the points of a source that failed.
+def fetch_chunk(service, chunk, sources=SOURCES):
+    start_time, end_time = chunk
+    if len(sources) > 1:
+        response = fetch_combined_data(service, start_time, end_time, sources)
+        if response is not None:
+            collectors = parse_aggregate_response(response, [PointCollector() for _ in sources])
+            return [(source, collector.result()) for (source, _), collector in zip(sources, collectors)]
+
+    # The combined request failed (e.g. sleep is forbidden); fetch the sources one by one,
+    # so the ones that can be read are still stored
+    results = []
+    for source, data_type in sources:
+        response = fetch_data(service, start_time, end_time, source, data_type)
+        results.append((source, None if response is None else list(points_from_response(response))))
+    return results
+
+# Backfill the store over [start_time, end_time), `workers` chunks at a time.
+# Every source of a chunk is checkpointed on its own: the sources that were fetched are
+# stored even when another one failed (e.g. forbidden sleep), and only the sources that
+# failed are requested again by the next run. Returns the (done, failed) chunk counts.
+def backfill(service, store, checkpoint, start_time, end_time, chunk_days=7, workers=4):
+    pending = []
+    for chunk in split_range(start_time, end_time, chunk_days * DAY_MILLIS):
+        sources = [(source, data_type) for source, data_type in SOURCES if not checkpoint.is_done(chunk, source)]
+        if sources:
+            pending.append((chunk, sources))
+    print(f"Backfilling {len(pending)} chunks of {chunk_days} days with {workers} workers...")
+
+    done = failed = 0
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='backfill') as pool:
+        futures = {pool.submit(fetch_chunk, service, chunk, sources): (chunk, sources) for chunk, sources in pending}
+        for future in as_completed(futures):
+            chunk, sources = futures[future]
+            try:
+                results = future.result()
+            except Exception as e:
+                print(f"Error fetching chunk {chunk}: {e}")
+                results = [(source, None) for source, _ in sources]
+
+            # Only this thread writes to the store and the checkpoint
+            failed_sources = [source for source, points in results if points is None]
+            for source, points in results:
+                if points is not None:
+                    store.append(source, points)
+                    checkpoint.mark_done(chunk, source)
+            if failed_sources:
+                failed += 1
+                print(f"Chunk {chunk}: {len(failed_sources)} of {len(results)} sources failed")
+                continue
+            done += 1
+            print(f"{done}/{len(pending)} chunks done")
+
+    if failed:
+        print(f"{failed} chunks failed; run the backfill again to retry their failed sources.")
+    return done, failed
+
+def parse_date(text):
+    return datetime.strptime(text, '%Y-%m-%d').replace(tzinfo=timezone.utc)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='krde.py backfill',
+                                     description="Backfill heart rate and sleep history into the local store.")
+    parser.add_argument('--start', type=parse_date, required=True, help="first day to backfill (YYYY-MM-DD, UTC)")
+    parser.add_argument('--end', type=parse_date, help="day to stop before (YYYY-MM-DD, UTC; default: now)")
+    parser.add_argument('--chunk-days', type=int, default=7, help="days fetched per request")
+    parser.add_argument('--workers', type=int, default=4, help="chunks fetched at the same time")
+    args = parser.parse_args(argv)
+
+    end = args.end or datetime.now(timezone.utc)
+    start_time = int(args.start.timestamp() * 1000)
+    end_time = int(end.timestamp() * 1000)
+
+    service = get_fitness_service(authenticate_google_fit(), pool_size=args.workers)  # One connection per worker
+    backfill(service, FitStore(), BackfillCheckpoint(), start_time, end_time,
+             chunk_days=args.chunk_days, workers=args.workers)
+
+if __name__ == '__main__':
+    main()
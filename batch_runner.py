@@ -0,0 +1,147 @@
+import os
+import csv
+import json
+import time
+import argparse
+from datetime import datetime, timedelta, timezone
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from krde import SCOPES, heart_rate_data_source, sleep_data_source
+from fit_auth import get_credential_manager
+from fit_service import get_fitness_service
+from fit_scheduler import ForbiddenError, RequestScheduler
+from fit_stream import raw_request
+from fit_aggregate import AverageAccumulator, DurationAccumulator, build_aggregate_body, parse_aggregate_response
+from scoring import assess_mental_health, provide_recommendation
+
+SOURCES = [
+    (heart_rate_data_source, "com.google.heart_rate.bpm"),
+    (sleep_data_source, "com.google.sleep.segment"),
+]
+
+RESULT_FIELDS = ['user', 'heart_rate', 'sleep_hours', 'noise_level', 'light_level',
+                 'stress_score', 'recommendation', 'error']
+
+# Find the users to score: every <user>.json token file in a directory
+def find_users(credentials_dir):
+    users = []
+    for name in sorted(os.listdir(credentials_dir)):
+        if name.endswith('.json'):
+            users.append((name[:-len('.json')], os.path.join(credentials_dir, name)))
+    return users
+
+# Fetch the raw aggregate responses of one user (runs on the I/O thread pool).
+# Returns a list of raw response bytes per source group: both sources in one
+# request, or each on its own when the combined request is forbidden (e.g. no sleep access).
+def fetch_user(token_file, start_time, end_time):
+    creds = get_credential_manager(SCOPES, token_file=token_file, interactive=False).get_credentials()
+    service = get_fitness_service(creds)
+    # Google Fit rate limits are per user, so every user gets its own scheduler
+    scheduler = RequestScheduler()
+
+    def request(sources):
+        body = build_aggregate_body(sources, start_time, end_time)
+        return scheduler.execute(raw_request(service.users().dataset().aggregate(userId="me", body=body)))
+
+    try:
+        return [(list(range(len(SOURCES))), request(SOURCES))]
+    except ForbiddenError as e:
+        print(f"Combined request forbidden for {token_file}, fetching sources separately: {e}")
+
+    responses = []
+    for index, source in enumerate(SOURCES):
+        try:
+            responses.append(([index], request([source])))
+        except Exception as e:
+            print(f"Error fetching {source[1]} data for {token_file}: {e}")
+    if not responses:
+        raise RuntimeError("No data could be fetched")
+    return responses
+
+# Parse one user's responses and score them (runs on the process pool)
+def score_user(user, responses, noise_level, light_level):
+    accumulators = [AverageAccumulator(), DurationAccumulator()]
+    for indexes, raw in responses:
+        parse_aggregate_response(json.loads(raw), [accumulators[index] for index in indexes])
+
+    heart_rate = accumulators[0].result() or 0  # Set to 0 if no data is available
+    sleep_hours = accumulators[1].result()
+    stress_score = assess_mental_health(heart_rate, sleep_hours, noise_level, light_level)
+    return {
+        'user': user,
+        'heart_rate': heart_rate,
+        'sleep_hours': sleep_hours,
+        'noise_level': noise_level,
+        'light_level': light_level,
+        'stress_score': stress_score,
+        'recommendation': provide_recommendation(stress_score),
+        'error': '',
+    }
+
+# Fetch and score every user: fetches run on `io_workers` threads, and each
+# finished fetch is parsed and scored on a pool of `cpu_workers` processes
+def run_batch(users, start_time, end_time, noise_level, light_level, io_workers=8, cpu_workers=None):
+    results = []
+    with ThreadPoolExecutor(max_workers=io_workers, thread_name_prefix='batch-fetch') as io_pool, \
+            ProcessPoolExecutor(max_workers=cpu_workers) as cpu_pool:
+        fetches = {io_pool.submit(fetch_user, token_file, start_time, end_time): user
+                   for user, token_file in users}
+
+        scores = {}
+        for future in as_completed(fetches):
+            user = fetches[future]
+            try:
+                responses = future.result()
+            except Exception as e:
+                print(f"Error fetching data for {user}: {e}")
+                results.append(dict.fromkeys(RESULT_FIELDS, '') | {'user': user, 'error': str(e)})
+                continue
+            scores[cpu_pool.submit(score_user, user, responses, noise_level, light_level)] = user
+
+        for future in as_completed(scores):
+            try:
+                results.append(future.result())
+            except Exception as e:
+                print(f"Error scoring {scores[future]}: {e}")
+                results.append(dict.fromkeys(RESULT_FIELDS, '') | {'user': scores[future], 'error': str(e)})
+
+    return sorted(results, key=lambda result: result['user'])
+
+# Write all results to one CSV file
+def write_results(results, path):
+    with open(path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=RESULT_FIELDS)
+        writer.writeheader()
+        writer.writerows(results)
+
+def main():
+    parser = argparse.ArgumentParser(description="Fetch and score many users' Google Fit data in parallel.")
+    parser.add_argument('credentials_dir', help="directory with one <user>.json token file per user")
+    parser.add_argument('--output', default='batch_results.csv', help="consolidated results file (CSV)")
+    parser.add_argument('--days', type=int, default=1, help="how many days back to fetch")
+    parser.add_argument('--noise', type=float, default=50, help="noise level (dB) to score with")
+    parser.add_argument('--light', type=float, default=100, help="light level (lux) to score with")
+    parser.add_argument('--io-workers', type=int, default=8, help="concurrent Google Fit requests")
+    parser.add_argument('--cpu-workers', type=int, default=None, help="parsing/scoring processes (default: all cores)")
+    args = parser.parse_args()
+
+    users = find_users(args.credentials_dir)
+    if not users:
+        print(f"No token files found in {args.credentials_dir}")
+        return
+
+    now = datetime.now(timezone.utc)
+    start_time = int((now - timedelta(days=args.days)).timestamp() * 1000)
+    end_time = int(now.timestamp() * 1000)
+
+    started = time.perf_counter()
+    results = run_batch(users, start_time, end_time, args.noise, args.light,
+                        io_workers=args.io_workers, cpu_workers=args.cpu_workers)
+    elapsed = time.perf_counter() - started
+
+    write_results(results, args.output)
+    failed = sum(1 for result in results if result['error'])
+    print(f"Scored {len(results) - failed} of {len(users)} users in {elapsed:.2f} s "
+          f"({len(users) / elapsed:.1f} users/s), results written to {args.output}")
+
+if __name__ == '__main__':
+    main()
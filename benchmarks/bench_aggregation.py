@@ -0,0 +1,118 @@
+# Compare the pure Python heart rate and sleep calculations with the NumPy
+# aggregation module on a year of synthetic minute-level heart rate: from the
+# response, and from the local store (what the apps summarize on every update).
+#
+#     python -m benchmarks.bench_aggregation [--days 365]
+import argparse
+import tempfile
+import time
+from krde import calculate_average_heart_rate, calculate_total_sleep_hours
+from aggregation import (bucket_stats, daily_sleep_hours, heart_rate_stats, response_to_arrays, store_to_arrays,
+                         total_sleep_hours)
+from fit_store import FitStore, points_from_response
+from benchmarks.synthetic import minute_heart_rate_response, daily_sleep_response
+
+NANOS_PER_HOUR = 3600 * 1000000000
+
+# Best wall-clock time of a few runs, in seconds
+def best_time(function, repeat=3):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+# The same statistics as heart_rate_stats and bucket_stats, point by point in pure Python
+def python_stats(response):
+    values = []
+    hourly = {}
+    for bucket in response.get('bucket', []):
+        for dataset in bucket.get('dataset', []):
+            for point in dataset.get('point', []):
+                value = point['value'][0]['fpVal']
+                values.append(value)
+                hourly.setdefault(int(point['startTimeNanos']) // NANOS_PER_HOUR, []).append(value)
+
+    ordered = sorted(values)
+    stats = {
+        'mean': sum(values) / len(values),
+        'min': ordered[0],
+        'max': ordered[-1],
+        'percentiles': {p: ordered[min(len(ordered) - 1, len(ordered) * p // 100)] for p in (5, 25, 50, 75, 95)},
+    }
+    buckets = {hour: (len(v), sum(v) / len(v), min(v), max(v)) for hour, v in hourly.items()}
+    return stats, buckets
+
+# FitStore.average and total_duration_hours over a window, row by row on FitStore.read
+def python_store_summary(store, heart_rate_key, sleep_key, start_ns, end_ns):
+    starts, ends, values = store.read(heart_rate_key, start_ns, end_ns)
+    weights = [min(ends[i], end_ns) - max(starts[i], start_ns) for i in range(len(starts))]
+    average = sum(w * v for w, v in zip(weights, values) if w > 0) / sum(w for w in weights if w > 0)
+    starts, ends, _ = store.read(sleep_key, start_ns, end_ns)
+    sleep_nanos = sum(max(min(ends[i], end_ns) - max(starts[i], start_ns), 0) for i in range(len(starts)))
+    return average, sleep_nanos / NANOS_PER_HOUR
+
+# The same with NumPy: what FitStore.average and total_duration_hours do
+def numpy_store_summary(store, heart_rate_key, sleep_key, start_ns, end_ns):
+    return store.average(heart_rate_key, start_ns, end_ns), store.total_duration_hours(sleep_key, start_ns, end_ns)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the NumPy aggregation module.")
+    parser.add_argument('--days', type=int, default=365, help="days of minute-level heart rate to generate")
+    args = parser.parse_args()
+
+    print(f"Generating {args.days} days of minute-level heart rate...")
+    heart_rate_response = minute_heart_rate_response(args.days)
+    sleep_response = daily_sleep_response(args.days)
+
+    starts, _, values = response_to_arrays(heart_rate_response)
+    sleep_starts, sleep_ends, _ = response_to_arrays(sleep_response)
+
+    results = [
+        ("calculate_average_heart_rate", best_time(lambda: calculate_average_heart_rate(heart_rate_response))),
+        ("calculate_total_sleep_hours", best_time(lambda: calculate_total_sleep_hours(sleep_response))),
+        ("pure Python stats + hourly buckets", best_time(lambda: python_stats(heart_rate_response))),
+        ("response_to_arrays (heart rate)", best_time(lambda: response_to_arrays(heart_rate_response))),
+        ("heart_rate_stats", best_time(lambda: heart_rate_stats(values))),
+        ("bucket_stats (hourly)", best_time(lambda: bucket_stats(starts, values))),
+        ("total_sleep_hours + daily_sleep_hours", best_time(
+            lambda: (total_sleep_hours(sleep_starts, sleep_ends), daily_sleep_hours(sleep_starts, sleep_ends)))),
+    ]
+
+    print(f"{len(values)} heart rate points, {len(sleep_starts)} sleep segments")
+    for name, seconds in results:
+        print(f"{name:40s} {seconds * 1000:10.2f} ms")
+
+    # End to end, both paths start from the same response, so the conversion to arrays counts
+    seconds = dict(results)
+    python_seconds = seconds["pure Python stats + hourly buckets"]
+    stats_seconds = seconds["heart_rate_stats"] + seconds["bucket_stats (hourly)"]
+    numpy_seconds = seconds["response_to_arrays (heart rate)"] + stats_seconds
+    print(f"NumPy end to end (response_to_arrays + stats): {numpy_seconds * 1000:.2f} ms, "
+          f"{python_seconds / numpy_seconds:.1f}x the pure Python path")
+    print(f"Stats alone, arrays already built: {python_seconds / stats_seconds:.1f}x")
+
+    # From the local store, which holds the points as columns already
+    with tempfile.TemporaryDirectory() as directory:
+        store = FitStore(directory)
+        store.append('heart_rate', points_from_response(heart_rate_response))
+        store.append('sleep', points_from_response(sleep_response))
+        start_ns, end_ns = int(starts[0]), int(starts[-1]) + 60 * 1000000000
+        arguments = (store, 'heart_rate', 'sleep', start_ns, end_ns)
+        store_results = [
+            ("FitStore.read + Python summary", best_time(lambda: python_store_summary(*arguments))),
+            ("store_to_arrays (heart rate)", best_time(lambda: store_to_arrays(store, 'heart_rate', start_ns, end_ns))),
+            ("FitStore.average + total_duration_hours", best_time(lambda: numpy_store_summary(*arguments))),
+        ]
+
+    print(f"\nWindow of {args.days} days from the local store:")
+    for name, seconds in store_results:
+        print(f"{name:40s} {seconds * 1000:10.2f} ms")
+    seconds = dict(store_results)
+    print(f"Store summaries with NumPy: {seconds['FitStore.read + Python summary'] / seconds['FitStore.average + total_duration_hours']:.1f}x "
+          f"the row-by-row Python path")
+
+if __name__ == '__main__':
+    main()
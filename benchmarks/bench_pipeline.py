@@ -0,0 +1,191 @@
+# Benchmark suite for the fetch, parse and score path, on synthetic aggregate
+# responses from one day of daily buckets up to a year of minute buckets. The
+# fetch path runs against fake_fit_server.py, so no network or account is needed.
+#
+#     python -m benchmarks.bench_pipeline [--sizes 1d-daily,30d-minute] [--output results.json]
+#     python -m benchmarks.bench_pipeline --save-baseline    # record benchmarks/baseline.json
+#
+# Results are compared with the stored baseline; the exit status is 1 when a case
+# got slower than the baseline by more than --tolerance.
+import os
+import sys
+import json
+import random
+import timeit
+import argparse
+import platform
+from datetime import datetime, timezone
+import fit_scheduler
+from fit_scheduler import RequestScheduler
+from fit_service import get_fitness_service
+from fake_fit_server import FakeFitServer
+from krde import (calculate_average_heart_rate, calculate_total_sleep_hours, fetch_combined_data, fetch_data,
+                  heart_rate_data_source, sleep_data_source)
+from nextday import extract_last_heart_rate_data, fetch_heart_rate_data
+from scoring import assess_mental_health, assess_mental_health_batch
+from benchmarks.synthetic import EPOCH_NANOS, daily_sleep_response, heart_rate_response
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+
+# Response sizes: name -> (days, heart rate bucket minutes)
+SIZES = {
+    '1d-daily': (1, 1440),
+    '7d-hourly': (7, 60),
+    '30d-minute': (30, 1),
+    '365d-minute': (365, 1),
+}
+# Sizes the fetch path runs for (its minute-level request over a year would be ~100 MB)
+FETCH_SIZES = ('1d-daily', '7d-hourly', '30d-minute')
+
+SCORING_SAMPLES = 10000
+
+SOURCES = [
+    (heart_rate_data_source, "com.google.heart_rate.bpm"),
+    (sleep_data_source, "com.google.sleep.segment"),
+]
+
+# Best time of one call in seconds. Each measurement runs the function often
+# enough to take at least 0.2 s (like `python -m timeit`), so tiny cases are stable.
+def measure(function, repeat=5):
+    timer = timeit.Timer(function)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=repeat, number=number)) / number
+
+# Parse and score cases for one response size: name -> (function, items processed per call)
+def parse_cases(size):
+    days, bucket_minutes = SIZES[size]
+    heart_rate = heart_rate_response(days, bucket_minutes)
+    sleep = daily_sleep_response(days)
+    raw_heart_rate = json.dumps(heart_rate).encode()
+    buckets = len(heart_rate['bucket'])
+    return {
+        'calculate_average_heart_rate': (lambda: calculate_average_heart_rate(heart_rate), buckets),
+        'calculate_total_sleep_hours': (lambda: calculate_total_sleep_hours(sleep), len(sleep['bucket'])),
+        'extract_last_heart_rate_data': (lambda: extract_last_heart_rate_data(heart_rate), buckets),
+        # From the response bytes: parsed whole into dicts, or streamed one bucket at a time
+        'json.loads + extract_last_heart_rate_data': (
+            lambda: extract_last_heart_rate_data(json.loads(raw_heart_rate)), buckets),
+        'extract_last_heart_rate_data (raw bytes)': (lambda: extract_last_heart_rate_data(raw_heart_rate), buckets),
+    }
+
+# Scoring cases: one call per sample, and the vectorized batch API
+def scoring_cases():
+    rng = random.Random(0)
+    samples = [(rng.uniform(40, 120), rng.uniform(3, 12), rng.uniform(30, 90), rng.uniform(10, 300))
+               for _ in range(SCORING_SAMPLES)]
+    columns = [list(column) for column in zip(*samples)]
+    return {
+        'assess_mental_health': (lambda: [assess_mental_health(*sample) for sample in samples], SCORING_SAMPLES),
+        'assess_mental_health_batch': (lambda: assess_mental_health_batch(*columns), SCORING_SAMPLES),
+    }
+
+# Fetch cases for one response size, against the fake server's service
+def fetch_cases(service, size):
+    days, _ = SIZES[size]
+    start_time = EPOCH_NANOS // 1000000
+    end_time = start_time + days * 86400000
+    # Like the apps, fetch_data asks for hourly buckets (see fit_aggregate.SYNC_BUCKET_MILLIS)
+    # and fetch_heart_rate_data for minute buckets
+    return {
+        'fetch_data (heart rate)': (
+            lambda: fetch_data(service, start_time, end_time, heart_rate_data_source, "com.google.heart_rate.bpm"), days),
+        'fetch_combined_data': (lambda: fetch_combined_data(service, start_time, end_time, SOURCES), days),
+        'fetch_heart_rate_data + extract_last': (lambda: extract_last_heart_rate_data(
+            fetch_heart_rate_data(service, start_time, end_time, heart_rate_data_source)), days * 1440),
+    }
+
+# Run every case of the chosen sizes; returns name -> result
+def run(sizes, verbose=True):
+    results = {}
+
+    def record(group, cases):
+        for name, (function, items) in cases.items():
+            seconds = measure(function)
+            key = f"{name}[{group}]" if group else name
+            results[key] = {'seconds': seconds, 'items': items, 'ns_per_item': seconds * 1e9 / items}
+            if verbose:
+                print(f"{key:64s} {seconds * 1000:12.3f} ms  {seconds * 1e9 / items:10.1f} ns/item")
+
+    record(None, scoring_cases())
+    for size in sizes:
+        record(size, parse_cases(size))
+
+    fetch_sizes = [size for size in sizes if size in FETCH_SIZES]
+    if fetch_sizes:
+        # The stub has no quota, so requests are not throttled
+        default_scheduler = fit_scheduler.default_scheduler
+        fit_scheduler.default_scheduler = RequestScheduler(rate=1e9, burst=1e9)
+        try:
+            with FakeFitServer() as server:
+                service = get_fitness_service(None, endpoint=server.url)
+                for size in fetch_sizes:
+                    record(size, fetch_cases(service, size))
+        finally:
+            fit_scheduler.default_scheduler = default_scheduler
+    return results
+
+# Compare with a baseline; returns the names of the cases that regressed
+def compare(results, baseline, tolerance):
+    regressions = []
+    print(f"\n{'case':64s} {'baseline':>12s} {'current':>12s} {'ratio':>7s}")
+    for name, result in results.items():
+        previous = baseline.get('results', {}).get(name)
+        if previous is None:
+            print(f"{name:64s} {'-':>12s} {result['seconds'] * 1000:10.3f}ms {'new':>7s}")
+            continue
+        ratio = result['seconds'] / previous['seconds']
+        flag = ''
+        if ratio > 1 + tolerance:
+            regressions.append(name)
+            flag = '  REGRESSION'
+        print(f"{name:64s} {previous['seconds'] * 1000:10.3f}ms {result['seconds'] * 1000:10.3f}ms {ratio:7.2f}{flag}")
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the fetch, parse and score path.")
+    parser.add_argument('--sizes', default=','.join(SIZES),
+                        help=f"comma-separated response sizes ({', '.join(SIZES)})")
+    parser.add_argument('--output', help="write the results to this JSON file")
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help="baseline results to compare with")
+    parser.add_argument('--save-baseline', action='store_true', help="store the results as the new baseline")
+    parser.add_argument('--tolerance', type=float, default=0.5,
+                        help="slowdown over the baseline reported as a regression (0.5 = 50%%)")
+    args = parser.parse_args(argv)
+
+    sizes = [size for size in args.sizes.split(',') if size]
+    unknown = [size for size in sizes if size not in SIZES]
+    if unknown:
+        parser.error(f"unknown sizes: {', '.join(unknown)}")
+
+    report = {
+        'meta': {
+            'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'machine': platform.machine(),
+        },
+        'results': run(sizes),
+    }
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --save-baseline to record one.")
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    regressions = compare(report['results'], baseline, args.tolerance)
+    if regressions:
+        print(f"\n{len(regressions)} cases slower than the baseline by more than {args.tolerance:.0%}")
+        return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,59 @@
+import random
+
+NANOS_PER_MINUTE = 60 * 1000000000
+NANOS_PER_DAY = 24 * 60 * NANOS_PER_MINUTE
+
+# Start of the synthetic data (2024-01-01 00:00 UTC)
+EPOCH_NANOS = 1704067200 * 1000000000
+
+# Aggregate response with one heart rate summary point (average, max, min) per bucket
+# of `bucket_minutes` (1440 gives daily buckets)
+def heart_rate_response(days, bucket_minutes=1, seed=0):
+    rng = random.Random(seed)
+    bucket_nanos = bucket_minutes * NANOS_PER_MINUTE
+    buckets = []
+    for index in range(days * 24 * 60 // bucket_minutes):
+        start = EPOCH_NANOS + index * bucket_nanos
+        average = 70 + 15 * rng.random()
+        buckets.append({
+            "startTimeMillis": str(start // 1000000),
+            "endTimeMillis": str((start + bucket_nanos) // 1000000),
+            "dataset": [{
+                "dataSourceId": "derived:com.google.heart_rate.summary:com.google.android.gms:aggregated",
+                "point": [{
+                    "startTimeNanos": str(start),
+                    "endTimeNanos": str(start + bucket_nanos - 1),
+                    "dataTypeName": "com.google.heart_rate.summary",
+                    "value": [{"fpVal": average}, {"fpVal": average + 10}, {"fpVal": average - 10}],
+                }],
+            }],
+        })
+    return {"bucket": buckets}
+
+# Aggregate response with one heart rate summary point per minute bucket
+def minute_heart_rate_response(days, seed=0):
+    return heart_rate_response(days, 1, seed)
+
+# Aggregate response with daily buckets holding a few sleep segments each night
+def daily_sleep_response(days, seed=0):
+    rng = random.Random(seed)
+    buckets = []
+    for day in range(days):
+        day_start = EPOCH_NANOS + day * NANOS_PER_DAY
+        points = []
+        segment_start = day_start + rng.randint(0, 60) * NANOS_PER_MINUTE
+        for _ in range(rng.randint(3, 6)):
+            segment_end = segment_start + rng.randint(30, 120) * NANOS_PER_MINUTE
+            points.append({
+                "startTimeNanos": str(segment_start),
+                "endTimeNanos": str(segment_end),
+                "dataTypeName": "com.google.sleep.segment",
+                "value": [{"intVal": rng.randint(1, 6)}],
+            })
+            segment_start = segment_end
+        buckets.append({
+            "startTimeMillis": str(day_start // 1000000),
+            "endTimeMillis": str((day_start + NANOS_PER_DAY) // 1000000),
+            "dataset": [{"dataSourceId": "derived:com.google.sleep.segment:com.google.android.gms:merged", "point": points}],
+        })
+    return {"bucket": buckets}
@@ -0,0 +1,196 @@
+import os
+import csv
+import time
+import signal
+import argparse
+import threading
+from datetime import datetime, timezone
+from krde import authenticate_google_fit, fetch_data, heart_rate_data_source, sleep_data_source
+from fit_service import get_fitness_service
+from fit_store import STORE_DIR, FitStore, points_from_response
+from fit_sync import SyncState, sync_source
+from scoring import assess_mental_health, provide_recommendation
+from sample_ring import RING_NAME, SampleRing
+
+# Scores are appended here, one row per assessment
+SCORES_FILE = os.path.join(STORE_DIR, 'scores.csv')
+# The collector keeps its own store and sync state: it runs next to the apps, which
+# write to the default store, and two processes must never append to the same columns
+COLLECTOR_STORE_DIR = os.path.join(STORE_DIR, 'collector')
+SCORE_FIELDS = ['time', 'heart_rate', 'sleep_hours', 'noise_level', 'light_level', 'stress_score', 'recommendation']
+
+# Scores use the last day of data, like the apps; a source that was never synced starts a day back
+SCORE_WINDOW_MILLIS = 24 * 60 * 60 * 1000
+FIRST_SYNC_MILLIS = 24 * 60 * 60 * 1000
+
+# Sources to poll: (data source ID, data type, shortest and longest poll interval in seconds).
+# Heart rate arrives all day while the watch syncs; sleep arrives once, after waking up.
+SOURCES = [
+    (heart_rate_data_source, "com.google.heart_rate.bpm", 60, 30 * 60),
+    (sleep_data_source, "com.google.sleep.segment", 15 * 60, 4 * 60 * 60),
+]
+
+
+# Poll interval of one source that follows how often new data actually arrives:
+# it halves while polls find new points (activity) and doubles while they come back
+# empty (overnight, watch off), staying between `min_interval` and `max_interval`.
+class AdaptiveSchedule:
+    def __init__(self, min_interval, max_interval, tighten=0.5, backoff=2.0):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.tighten = tighten
+        self.backoff = backoff
+        self.interval = min_interval
+        self.next_due = 0  # Poll right away
+
+    def due(self, now):
+        return now >= self.next_due
+
+    # Adjust the interval after a poll and schedule the next one
+    def record(self, found_new_data, now):
+        if found_new_data:
+            self.interval = max(self.min_interval, self.interval * self.tighten)
+        else:
+            self.interval = min(self.max_interval, self.interval * self.backoff)
+        self.next_due = now + self.interval
+
+
+# Appends every score as a CSV row (with a header when the file is new)
+class ScoreFile:
+    def __init__(self, path=SCORES_FILE):
+        self.path = path
+
+    def __call__(self, record):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        new_file = not os.path.exists(self.path)
+        with open(self.path, 'a', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=SCORE_FIELDS)
+            if new_file:
+                writer.writeheader()
+            writer.writerow(record)
+
+
+# Headless collector: polls every source on its own adaptive schedule, syncs only
+# the data that is new since the last poll into the local store, and writes a new
+# score whenever a poll brought new data. Every score is passed to each of `sinks`,
+# and every new heart rate point (an hourly average) to each of `sample_sinks` as
+# (time its data runs up to, heart rate, noise level, light level), e.g. SampleRing.append.
+class Collector:
+    def __init__(self, service, store, state, noise_level, light_level, sinks=(), sample_sinks=(),
+                 sources=SOURCES):
+        self.service = service
+        self.store = store
+        self.state = state
+        self.noise_level = noise_level
+        self.light_level = light_level
+        self.sinks = list(sinks)
+        self.sample_sinks = list(sample_sinks)
+        self.sources = [(source, data_type, AdaptiveSchedule(min_interval, max_interval))
+                        for source, data_type, min_interval, max_interval in sources]
+        self.scored = False
+        self._stopped = threading.Event()
+
+    # Sync one source; returns the fetched points that are newer than what was synced before
+    def poll(self, source, data_type, now):
+        previous_nanos = self.state.get(source) or 0
+        end_time = int(now * 1000)
+        response = sync_source(self.store, self.state, source, end_time - FIRST_SYNC_MILLIS, end_time,
+                               lambda start, end: fetch_data(self.service, start, end, source, data_type))
+        if response is None:
+            return []
+        return [point for point in points_from_response(response) if point[1] > previous_nanos]
+
+    # Score the last day of data from the store and hand the result to the sinks
+    def score(self, now):
+        end_nanos = int(now * 1000) * 1000000
+        start_nanos = end_nanos - SCORE_WINDOW_MILLIS * 1000000
+        heart_rate = self.store.average(heart_rate_data_source, start_nanos, end_nanos) or 0  # 0 if no data is available
+        sleep_hours = self.store.total_duration_hours(sleep_data_source, start_nanos, end_nanos)
+        stress_score = assess_mental_health(heart_rate, sleep_hours, self.noise_level, self.light_level)
+        record = {
+            'time': datetime.fromtimestamp(now, timezone.utc).isoformat(timespec='seconds'),
+            'heart_rate': heart_rate,
+            'sleep_hours': sleep_hours,
+            'noise_level': self.noise_level,
+            'light_level': self.light_level,
+            'stress_score': stress_score,
+            'recommendation': provide_recommendation(stress_score),
+        }
+        for sink in self.sinks:
+            sink(record)
+        self.scored = True
+        return record
+
+    # Poll the sources that are due and score if anything new arrived.
+    # Returns the seconds until the next source is due.
+    def run_once(self):
+        now = time.time()
+        found_new_data = False
+        for source, data_type, schedule in self.sources:
+            if not schedule.due(now):
+                continue
+            new_points = self.poll(source, data_type, now)
+            schedule.record(bool(new_points), time.time())
+            found_new_data = found_new_data or bool(new_points)
+            print(f"{data_type}: {len(new_points)} new points, next poll in {schedule.interval:.0f} s")
+
+            if source == heart_rate_data_source:
+                # The bucket of the current hour ends in the future; its data runs up to now
+                for _, end_nanos, heart_rate in new_points:
+                    for sink in self.sample_sinks:
+                        sink(min(end_nanos / 1e9, now), heart_rate, self.noise_level, self.light_level)
+
+        if found_new_data or not self.scored:
+            record = self.score(time.time())
+            print(f"Stress score {record['stress_score']} (heart rate {record['heart_rate']:.1f}, "
+                  f"sleep {record['sleep_hours']:.2f} h)")
+        return max(0, min(schedule.next_due for _, _, schedule in self.sources) - time.time())
+
+    # Poll until stop() is called
+    def run(self):
+        while not self._stopped.is_set():
+            self._stopped.wait(self.run_once())
+
+    def stop(self):
+        self._stopped.set()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='krde.py collect',
+                                     description="Collect Google Fit data and write stress scores without a display.")
+    parser.add_argument('--output', default=SCORES_FILE, help="CSV file the scores are appended to")
+    parser.add_argument('--store', default=COLLECTOR_STORE_DIR,
+                        help="directory of the collector's own store and sync state (not shared with the apps)")
+    parser.add_argument('--noise', type=float, default=50, help="noise level (dB) to score with")
+    parser.add_argument('--light', type=float, default=100, help="light level (lux) to score with")
+    parser.add_argument('--endpoint', help="send requests to this server (e.g. fake_fit_server.py) without signing in")
+    parser.add_argument('--once', action='store_true', help="poll every source once, score and exit")
+    parser.add_argument('--ring', nargs='?', const=RING_NAME,
+                        help=f"publish heart rate samples to the UI in a shared-memory ring (default name: {RING_NAME})")
+    args = parser.parse_args(argv)
+
+    creds = None if args.endpoint else authenticate_google_fit()
+    service = get_fitness_service(creds, endpoint=args.endpoint)
+    ring = SampleRing.create(args.ring) if args.ring else None
+    store = FitStore(args.store)
+    state = SyncState(os.path.join(args.store, 'sync_state.json'))
+    collector = Collector(service, store, state, args.noise, args.light, sinks=[ScoreFile(args.output)],
+                          sample_sinks=[ring.append] if ring else [])
+
+    try:
+        if args.once:
+            collector.run_once()
+            return
+
+        # Stop cleanly on Ctrl+C or when the service manager stops the daemon
+        signal.signal(signal.SIGINT, lambda signum, frame: collector.stop())
+        signal.signal(signal.SIGTERM, lambda signum, frame: collector.stop())
+        print(f"Collecting; scores are appended to {args.output}")
+        collector.run()
+    finally:
+        if ring:
+            ring.close()
+
+if __name__ == '__main__':
+    main()
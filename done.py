@@ -1,12 +1,19 @@
-import os
+from startup_report import StartupTimer
+startup = StartupTimer()  # Created before the other imports so they are timed too
+
 from datetime import datetime, timedelta, timezone
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from google.auth.transport.requests import Request
-from googleapiclient.discovery import build
 import tkinter as tk
 from tkinter import messagebox
-from PIL import Image, ImageTk
+from logo_cache import load_logo
+from fit_store import FitStore
+from fit_sync import SyncState, forbidden_sources, sync_all
+from fit_aggregate import SYNC_BUCKET_MILLIS, build_aggregate_body
+from response_cache import RESPONSE_CACHE_DIR, ResponseCache
+from fit_worker import BackgroundFetcher
+import fit_metrics
+import scoring
+from scoring import assess_mental_health
+startup.mark('imports')
 
 # Set the required Google Fit API scopes for heart rate and sleep data
 SCOPES = [
@@ -14,118 +21,61 @@ SCOPES = [
     'https://www.googleapis.com/auth/fitness.sleep.read'
 ]
 
-# Authenticate with Google Fit API
+# Authenticate with Google Fit API. The token is loaded once, kept in memory
+# and refreshed in the background before it expires.
+# The Google API client and auth libraries take a while to import, so they are
+# imported on first use (on the fetch worker) instead of before the window appears.
 def authenticate_google_fit():
-    creds = None
-    if os.path.exists('token.json'):
-        creds = Credentials.from_authorized_user_file('token.json', SCOPES)
-    
-    if not creds or not creds.valid:
-        if creds and creds.expired and creds.refresh_token:
-            creds.refresh(Request())
-        else:
-            flow = InstalledAppFlow.from_client_secrets_file('credentials.json', SCOPES)
-            creds = flow.run_local_server(port=0)
-        
-        # Save the credentials for the next run
-        with open('token.json', 'w') as token:
-            token.write(creds.to_json())
-
-    return creds
+    from fit_auth import get_credential_manager
+    return get_credential_manager(SCOPES).get_credentials()
 
-# Fetch data from Google Fit API
+# Fetch data from Google Fit API (repeated requests are answered from the response cache)
 def fetch_data(service, start_time, end_time, data_source_id, data_type):
-    body = {
-        "aggregateBy": [
-            {
-                "dataTypeName": data_type,
-                "dataSourceId": data_source_id
-            }
-        ],
-        "bucketByTime": { "durationMillis": 86400000 },  # 1 day in milliseconds
-        "startTimeMillis": start_time,
-        "endTimeMillis": end_time
-    }
-    
-    try:
-        response = service.users().dataset().aggregate(userId="me", body=body).execute()
-        return response
-    except Exception as e:
-        if "403" in str(e):  # Check if the error is 403 (Forbidden)
+    sources = [(data_source_id, data_type)]
+    start_time, end_time = response_cache.round_window(start_time, end_time, SYNC_BUCKET_MILLIS)
+    body = build_aggregate_body(sources, start_time, end_time, bucket_millis=SYNC_BUCKET_MILLIS)
+
+    def request():
+        from fit_scheduler import FitApiError, ForbiddenError, execute_request
+
+        try:
+            with fit_metrics.span('fetch_data'):
+                response = execute_request(service.users().dataset().aggregate(userId="me", body=body))
+            return response
+        except ForbiddenError:
             print("Error: Unable to access sleep data source. Data may not be available or accessible.")
-        else:
+            forbidden_sources.add(data_source_id)  # Not asked for again this session
+        except FitApiError as e:  # Rate limits and server errors were already retried
             print(f"Error fetching {data_type} data: {e}")
         return None
 
-# Calculate the average heart rate from the data points
-def calculate_average_heart_rate(response):
-    total_heart_rate = 0
-    count = 0
-
-    for bucket in response.get('bucket', []):
-        for dataset in bucket.get('dataset', []):
-            for point in dataset.get('point', []):
-                for value in point.get('value', []):
-                    total_heart_rate += value.get('fpVal')
-                    count += 1
-
-    if count == 0:
+    return response_cache.get_or_fetch(response_cache.key(sources, SYNC_BUCKET_MILLIS, start_time, end_time), request)
+
+# Fetch several data sources from Google Fit API with one combined aggregate request
+# (repeated requests are answered from the response cache).
+# `sources` is a list of (data_source_id, data_type) pairs.
+def fetch_combined_data(service, start_time, end_time, sources):
+    start_time, end_time = response_cache.round_window(start_time, end_time, SYNC_BUCKET_MILLIS)
+    body = build_aggregate_body(sources, start_time, end_time, bucket_millis=SYNC_BUCKET_MILLIS)
+
+    def request():
+        from fit_scheduler import FitApiError, ForbiddenError, execute_request
+
+        try:
+            with fit_metrics.span('fetch_combined_data'):
+                response = execute_request(service.users().dataset().aggregate(userId="me", body=body))
+            return response
+        except ForbiddenError:  # One of the sources (usually sleep) is not accessible
+            print("Error: Unable to access one of the data sources. Fetching them separately.")
+        except FitApiError as e:
+            print(f"Error fetching combined data: {e}")
         return None
 
-    return total_heart_rate / count
-
-# Calculate total sleep time in hours
-def calculate_total_sleep_hours(response):
-    total_sleep_duration_nanos = 0  # Total sleep duration in nanoseconds
-
-    if response and response.get('bucket'):
-        for bucket in response.get('bucket', []):
-            for dataset in bucket.get('dataset', []):
-                for point in dataset.get('point', []):
-                    start_time_nanos = int(point.get('startTimeNanos'))
-                    end_time_nanos = int(point.get('endTimeNanos'))
-                    
-                    # Calculate duration for this sleep segment
-                    duration_nanos = end_time_nanos - start_time_nanos
-                    total_sleep_duration_nanos += duration_nanos
-
-    # Convert total duration from nanoseconds to hours
-    total_sleep_hours = total_sleep_duration_nanos / 1e9 / 3600  # nanoseconds to hours
-    return total_sleep_hours
-
-# Function to assess mental health based on input values
-def assess_mental_health(heart_rate_var, sleep_hours, noise_level, light_level):
-    stress_score = 0
-
-    # Physiological Factors
-    if heart_rate_var < 50 or heart_rate_var > 95:
-        stress_score += 1
-
-    if sleep_hours < 6 or sleep_hours > 15:
-        stress_score += 1
-
-    # Environmental Factors
-    if noise_level > 70:
-        stress_score += 1
-
-    if light_level < 30 or light_level > 200:
-        stress_score += 1
-
-    return stress_score
+    return response_cache.get_or_fetch(response_cache.key(sources, SYNC_BUCKET_MILLIS, start_time, end_time), request)
 
 # Function to provide recommendations based on stress score
 def provide_recommendation(stress_score):
-    recommendation = ""
-    if stress_score == 0:
-        recommendation = "You are doing well! Keep up your current routine."
-    elif stress_score == 1:
-        recommendation = "Slight stress detected. Try to relax and take breaks."
-    elif stress_score == 2:
-        recommendation = "Moderate stress detected. Ensure you have enough sleep and reduce exposure to noise."
-    elif stress_score == 3:
-        recommendation = "High stress detected. Consider reducing environmental stressors and practice mindfulness."
-    else:
-        recommendation = "Critical stress levels detected! Please reach out to a mental health professional."
+    recommendation = scoring.provide_recommendation(stress_score)
     
     # If stress score is 3 or 4, provide a link to the Stress Management Consultant
     if stress_score >= 3:
@@ -133,56 +83,105 @@ def provide_recommendation(stress_score):
     #https://www.justdial.com/Noida/Stress-Management-Consultants-in-Amity-International-School-Noida-Sector-44/nct-11291954 
     return recommendation
 
-# Function to automatically fetch data from Google Fit and display results
-def fetch_and_display_data():
-    try:
-        # Fetch heart rate and sleep data from Google Fit
+# Data source IDs
+heart_rate_data_source = "raw:com.google.heart_rate.bpm:com.boAt.wristgear:GoogleFitSync - HR count"
+sleep_data_source = "derived:com.google.sleep.segment:com.google.android.gms:merge_sleep_segments"
+
+# Seconds to wait for each data source; the sleep source is often slow or forbidden
+FETCH_TIMEOUTS = {
+    heart_rate_data_source: 20,
+    sleep_data_source: 10,
+}
+# Seconds to wait for the combined request before fetching every source on its own
+COMBINED_FETCH_TIMEOUT = 10
+
+# Local time-series store that every fetch writes into, and how far each source has been synced
+store = FitStore()
+sync_state = SyncState()
+
+# Recent aggregate responses, so clicking Update again doesn't repeat identical requests
+response_cache = ResponseCache(disk_dir=RESPONSE_CACHE_DIR)
+
+# Fetch heart rate and sleep data from Google Fit (runs on the background worker, not the Tk thread)
+def fetch_fit_values(report):
+    report("Authenticating with Google Fit...")
+    with fit_metrics.span('authenticate'):
         creds = authenticate_google_fit()
-        service = build('fitness', 'v1', credentials=creds)
-
-        # Define the time period (example: last 1 day)
-        now = datetime.now(timezone.utc)
-        start_time = int((now - timedelta(days=1)).timestamp() * 1000)
-        end_time = int(now.timestamp() * 1000)
-
-        # Data source IDs
-        heart_rate_data_source = "raw:com.google.heart_rate.bpm:com.boAt.wristgear:GoogleFitSync - HR count"
-        sleep_data_source = "derived:com.google.sleep.segment:com.google.android.gms:merge_sleep_segments"
 
-        # Fetch heart rate data
-        heart_rate_response = fetch_data(service, start_time, end_time, heart_rate_data_source, "com.google.heart_rate.bpm")
-
-        # Fetch sleep data
-        sleep_response = fetch_data(service, start_time, end_time, sleep_data_source, "com.google.sleep.segment")
-
-        # Calculate average heart rate
-        if heart_rate_response:
-            avg_heart_rate = calculate_average_heart_rate(heart_rate_response)
-        else:
-            avg_heart_rate = 0  # Set to 0 if no data is available
-
-        # Calculate total sleep hours
-        if sleep_response:
-            total_sleep_hours = calculate_total_sleep_hours(sleep_response)
-        else:
-            total_sleep_hours = 0  # Set sleep hours to 0 if data is not available
-
-        # Set the values in the entry fields
-        hrv_entry.delete(0, tk.END)
-        hrv_entry.insert(0, str(avg_heart_rate))
+    report("Connecting to Google Fit...")
+    from fit_service import get_fitness_service
+    with fit_metrics.span('build_service'):
+        service = get_fitness_service(creds)
+
+    # Define the time period (example: last 1 day)
+    now = datetime.now(timezone.utc)
+    start_time = int((now - timedelta(days=1)).timestamp() * 1000)
+    end_time = int(now.timestamp() * 1000)
+
+    # Fetch only the heart rate and sleep data that is new since the last sync into the local store,
+    # with a single combined request. If that fails or is slow, both are fetched at once, each with
+    # its own timeout; a source that was forbidden (usually sleep) is not asked for again.
+    report("Fetching heart rate and sleep data...")
+    sources = [
+        (heart_rate_data_source, "com.google.heart_rate.bpm"),
+        (sleep_data_source, "com.google.sleep.segment"),
+    ]
+    sync_all(store, sync_state, sources, start_time, end_time,
+             lambda start, end, sources: fetch_combined_data(service, start, end, sources),
+             lambda start, end, source, data_type: fetch_data(service, start, end, source, data_type),
+             timeouts=FETCH_TIMEOUTS, combined_timeout=COMBINED_FETCH_TIMEOUT)
+
+    # Answer the average heart rate and total sleep hours from the local store
+    report("Calculating...")
+    start_nanos = start_time * 1000000
+    end_nanos = end_time * 1000000
+    with fit_metrics.span('store_read'):
+        avg_heart_rate = store.average(heart_rate_data_source, start_nanos, end_nanos) or 0  # Set to 0 if no data is available
+        total_sleep_hours = store.total_duration_hours(sleep_data_source, start_nanos, end_nanos)
+
+    return avg_heart_rate, total_sleep_hours
+
+# Set the fetched values in the entry fields
+def display_fit_values(values):
+    avg_heart_rate, total_sleep_hours = values
+
+    hrv_entry.delete(0, tk.END)
+    hrv_entry.insert(0, str(avg_heart_rate))
+
+    sleep_entry.delete(0, tk.END)
+    sleep_entry.insert(0, str(total_sleep_hours))
+
+# Function to automatically fetch data from Google Fit and display results.
+# The fetch runs in the background; `then` is called on the Tk thread once it has finished.
+def fetch_and_display_data(then=None):
+    total = fit_metrics.span('fetch_and_display_data')
+
+    def on_done(values):
+        with fit_metrics.span('tk_update'):
+            display_fit_values(values)
+            status_var.set("")
+        total.stop()
+        if then:
+            then()
+
+    def on_error(e):
+        print(f"Error fetching data from Google Fit: {e}")
+        status_var.set("Could not fetch data from Google Fit.")
+        total.stop(error=True)
+        if then:
+            then()
 
-        sleep_entry.delete(0, tk.END)
-        sleep_entry.insert(0, str(total_sleep_hours))
+    fetcher.submit(fetch_fit_values, on_done, on_progress=status_var.set, on_error=on_error)
 
-    except Exception as e:
-        print(f"Error fetching data from Google Fit: {e}")
+# Cancel the fetch that is running, if any
+def cancel_fetch(event=None):
+    if fetcher.busy:
+        fetcher.cancel()
+        status_var.set("Fetch cancelled.")
 
-# Function to display results based on user inputs
-def on_update():
+# Assess stress from the values in the entry fields and display the result
+def display_assessment():
     try:
-        # Fetch heart rate and sleep data
-        fetch_and_display_data()
-
         # Get user input for noise and light levels
         noise_level = float(noise_entry.get())
         light_level = float(light_entry.get())
@@ -192,8 +191,9 @@ def on_update():
         sleep_hours = float(sleep_entry.get())
 
         # Assess stress based on the values
-        stress_score = assess_mental_health(heart_rate, sleep_hours, noise_level, light_level)
-        recommendation = provide_recommendation(stress_score)
+        with fit_metrics.span('scoring'):
+            stress_score = assess_mental_health(heart_rate, sleep_hours, noise_level, light_level)
+            recommendation = provide_recommendation(stress_score)
 
         # Set the stress score and recommendation
         result_var.set(f"Stress Score: {stress_score}")
@@ -209,6 +209,23 @@ def on_update():
     except ValueError:
         messagebox.showerror("Input Error", "Please enter valid numeric values.")
 
+# Function to display results based on user inputs
+def on_update():
+    total = fit_metrics.span('on_update')
+
+    def assess():
+        display_assessment()
+        total.stop()
+
+    # Fetch heart rate and sleep data, then assess once they are in the entry fields
+    fetch_and_display_data(then=assess)
+
+# Stop the background worker (and write the last metrics export) when the window is closed
+def on_close():
+    fetcher.shutdown()
+    fit_metrics.shutdown()
+    app.destroy()
+
 # Create the main application window
 app = tk.Tk()
 app.title("Mental Health Monitoring System")
@@ -218,9 +235,7 @@ app.configure(bg='#e6f2ff')
 
 # Load and display logo (ensure you have an image file 'logo.png' in the same directory)
 try:
-    logo_image = Image.open("logo.jpeg")
-    logo_image = logo_image.resize((400, 200))  # Resize logo to fit desktop size
-    logo_photo = ImageTk.PhotoImage(logo_image)
+    logo_photo = load_logo("logo.jpeg", (400, 200), master=app)  # Resized to fit desktop size, cached
     logo_label = tk.Label(app, image=logo_photo, bg='#e6f2ff')
     logo_label.grid(row=0, column=0, columnspan=2, pady=20)
 except:
@@ -268,8 +283,25 @@ recommendation_var = tk.StringVar()
 recommendation_label = tk.Label(app, textvariable=recommendation_var, font=("Helvetica", 12), bg='#e6f2ff')
 recommendation_label.grid(row=7, column=0, columnspan=2)
 
-# Start the automatic data fetch when the app is launched
-fetch_and_display_data()
+# Display fetch progress; Escape cancels a running fetch
+status_var = tk.StringVar()
+status_label = tk.Label(app, textvariable=status_var, font=("Helvetica", 10), fg='#666666', bg='#e6f2ff')
+status_label.grid(row=8, column=0, columnspan=2, pady=(0, 10))
+app.bind('<Escape>', cancel_fetch)
+
+# Background worker that keeps Google Fit requests off the Tk thread
+fetcher = BackgroundFetcher(app)
+app.protocol("WM_DELETE_WINDOW", on_close)
+
+startup.mark('window_built')
+
+# Once the window is on screen, report the startup time and start the automatic data fetch
+def on_first_paint():
+    startup.mark('first_paint')
+    startup.report()
+    fetch_and_display_data()
+
+startup.after_first_paint(app, on_first_paint)
 
 # Start the GUI event loop
 app.mainloop()
@@ -0,0 +1,377 @@
+import json
+import math
+import time
+import random
+import argparse
+import threading
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+
+# Path prefix of every Fitness API method (the discovery document's servicePath)
+SERVICE_PATH = '/fitness/v1/users/'
+
+HEART_RATE_TYPE = 'com.google.heart_rate.bpm'
+SLEEP_TYPE = 'com.google.sleep.segment'
+
+# Data sources listed by dataSources.list. Any other ID whose data type is known
+# (e.g. "raw:com.google.heart_rate.bpm:...") is served as well.
+DEFAULT_SOURCES = [
+    "raw:com.google.heart_rate.bpm:com.boAt.wristgear:GoogleFitSync - HR count",
+    "derived:com.google.heart_rate.bpm:com.google.android.gms:merge_heart_rate_bpm",
+    "derived:com.google.sleep.segment:com.google.android.gms:merge_sleep_segments",
+]
+
+# Nightly sleep window (seconds after midnight UTC) and the stages it cycles through:
+# light, deep, light, REM
+SLEEP_START = 23 * 3600
+SLEEP_END = 7 * 3600
+SLEEP_STAGES = (4, 5, 4, 6)
+
+# Error bodies shaped like the ones the real API returns
+ERROR_REASONS = {
+    400: ('INVALID_ARGUMENT', 'badRequest'),
+    403: ('PERMISSION_DENIED', 'forbidden'),
+    404: ('NOT_FOUND', 'notFound'),
+    429: ('RESOURCE_EXHAUSTED', 'rateLimitExceeded'),
+    500: ('INTERNAL', 'backendError'),
+    503: ('UNAVAILABLE', 'backendError'),
+}
+
+NANOS_PER_SECOND = 1000000000
+
+
+# Deterministic pseudo-random fraction in [0, 1) for an integer, so the same
+# sample always gets the same value without keeping any state
+def _noise(seed, index):
+    x = (index * 2654435761 + seed * 40503 + 0x9e3779b9) & 0xffffffff
+    x ^= x >> 16
+    x = (x * 0x45d9f3b) & 0xffffffff
+    x ^= x >> 16
+    return x / 4294967296.0
+
+# The data type of a data source ID ("type:data.type.name:...")
+def data_type_of(data_source_id):
+    parts = data_source_id.split(':')
+    return parts[1] if len(parts) > 1 else None
+
+
+# Deterministic synthetic Google Fit data.
+#
+# Heart rate is sampled every `hr_interval` seconds and follows a daily curve (low at
+# night, high in the afternoon) with per-sample noise. Sleep is one segment per stage
+# of `sleep_stage_minutes` from 23:00 to 07:00 UTC, with the bedtime shifted a little
+# every night. The same seed always produces the same data.
+class SyntheticFitData:
+    def __init__(self, seed=0, hr_interval=60, sleep_stage_minutes=30):
+        self.seed = seed
+        self.hr_interval = hr_interval
+        self.sleep_stage_seconds = sleep_stage_minutes * 60
+
+    def heart_rate_at(self, seconds):
+        day_phase = 2 * math.pi * ((seconds % 86400) - 9 * 3600) / 86400
+        return round(70 + 12 * math.sin(day_phase) + 10 * (_noise(self.seed, seconds) - 0.5), 1)
+
+    # Heart rate samples (start_ns, end_ns, bpm) in [start_ns, end_ns)
+    def heart_rate_samples(self, start_ns, end_ns):
+        interval = self.hr_interval
+        first = -(-start_ns // (interval * NANOS_PER_SECOND))
+        last = -(-end_ns // (interval * NANOS_PER_SECOND))
+        for index in range(first, last):
+            seconds = index * interval
+            nanos = seconds * NANOS_PER_SECOND
+            yield nanos, nanos, self.heart_rate_at(seconds)
+
+    # Sleep segments (start_ns, end_ns, stage) overlapping [start_ns, end_ns), clipped to it
+    def sleep_segments(self, start_ns, end_ns):
+        first_night = start_ns // (86400 * NANOS_PER_SECOND) - 1
+        last_night = end_ns // (86400 * NANOS_PER_SECOND)
+        for night in range(first_night, last_night + 1):
+            bedtime = night * 86400 + SLEEP_START + int(1800 * (_noise(self.seed, night) - 0.5))
+            wake_time = (night + 1) * 86400 + SLEEP_END
+            for number, segment_start in enumerate(range(bedtime, wake_time, self.sleep_stage_seconds)):
+                segment_end = min(segment_start + self.sleep_stage_seconds, wake_time)
+                segment_start_ns = max(segment_start * NANOS_PER_SECOND, start_ns)
+                segment_end_ns = min(segment_end * NANOS_PER_SECOND, end_ns)
+                if segment_start_ns < segment_end_ns:
+                    yield segment_start_ns, segment_end_ns, SLEEP_STAGES[number % len(SLEEP_STAGES)]
+
+
+# Raised by the request handlers to answer with a Google-style error
+class FakeApiError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+# Builds the JSON bodies of the supported Fitness API methods
+class FakeFitApi:
+    def __init__(self, data, sources=DEFAULT_SOURCES, forbidden=()):
+        self.data = data
+        self.sources = list(sources)
+        self.forbidden = set(forbidden)  # Data source IDs or data type names answered with 403
+
+    def _check_source(self, data_source_id=None, data_type=None):
+        data_type = data_type or data_type_of(data_source_id or '')
+        if data_source_id in self.forbidden or data_type in self.forbidden:
+            raise FakeApiError(403, f"No permission to read {data_source_id or data_type}")
+        if data_type not in (HEART_RATE_TYPE, SLEEP_TYPE):
+            raise FakeApiError(404, f"Unknown data source {data_source_id or data_type}")
+        return data_type
+
+    # Raw points of one data type in [start_ns, end_ns)
+    def _points(self, data_type, start_ns, end_ns, origin):
+        if data_type == HEART_RATE_TYPE:
+            for start, end, bpm in self.data.heart_rate_samples(start_ns, end_ns):
+                yield {'startTimeNanos': str(start), 'endTimeNanos': str(end), 'dataTypeName': data_type,
+                       'originDataSourceId': origin, 'value': [{'fpVal': bpm, 'mapVal': []}]}
+        else:
+            for start, end, stage in self.data.sleep_segments(start_ns, end_ns):
+                yield {'startTimeNanos': str(start), 'endTimeNanos': str(end), 'dataTypeName': data_type,
+                       'originDataSourceId': origin, 'value': [{'intVal': stage, 'mapVal': []}]}
+
+    # Points of one aggregate bucket: a heart rate summary (average, maximum, minimum)
+    # or the sleep segments that fall in the bucket
+    def _bucket_points(self, data_type, start_ns, end_ns, origin):
+        if data_type != HEART_RATE_TYPE:
+            return list(self._points(data_type, start_ns, end_ns, origin))
+        values = [bpm for _, _, bpm in self.data.heart_rate_samples(start_ns, end_ns)]
+        if not values:
+            return []
+        return [{'startTimeNanos': str(start_ns), 'endTimeNanos': str(end_ns),
+                 'dataTypeName': 'com.google.heart_rate.summary', 'originDataSourceId': origin,
+                 'value': [{'fpVal': sum(values) / len(values), 'mapVal': []},
+                           {'fpVal': max(values), 'mapVal': []},
+                           {'fpVal': min(values), 'mapVal': []}]}]
+
+    # users.dataset.aggregate
+    def aggregate(self, body):
+        try:
+            start_millis = int(body['startTimeMillis'])
+            end_millis = int(body['endTimeMillis'])
+            bucket_millis = int(body.get('bucketByTime', {}).get('durationMillis', end_millis - start_millis))
+            aggregate_by = body['aggregateBy']
+        except (KeyError, TypeError, ValueError) as e:
+            raise FakeApiError(400, f"Invalid aggregate request: {e}")
+        if bucket_millis <= 0 or end_millis < start_millis:
+            raise FakeApiError(400, "Invalid time range or bucket duration")
+
+        kinds = []
+        for entry in aggregate_by:
+            source_id = entry.get('dataSourceId')
+            kinds.append((self._check_source(source_id, entry.get('dataTypeName')),
+                          source_id or f"derived:{entry.get('dataTypeName')}:com.google.android.gms:aggregated"))
+
+        buckets = []
+        for bucket_start in range(start_millis, end_millis, bucket_millis):
+            bucket_end = min(bucket_start + bucket_millis, end_millis)
+            buckets.append({
+                'startTimeMillis': str(bucket_start),
+                'endTimeMillis': str(bucket_end),
+                'dataset': [{
+                    'dataSourceId': f"derived:{data_type}:com.google.android.gms:aggregated",
+                    'point': self._bucket_points(data_type, bucket_start * 1000000, bucket_end * 1000000, origin),
+                } for data_type, origin in kinds],
+            })
+        return {'bucket': buckets}
+
+    # users.dataSources.datasets.get; the dataset ID is "<start ns>-<end ns>"
+    def dataset(self, data_source_id, dataset_id, limit=None):
+        data_type = self._check_source(data_source_id)
+        try:
+            start_ns, end_ns = (int(part) for part in dataset_id.split('-'))
+        except ValueError:
+            raise FakeApiError(400, f"Invalid dataset ID {dataset_id}")
+        points = list(self._points(data_type, start_ns, end_ns, data_source_id))
+        if limit is not None:
+            points = points[:limit]
+        return {'minStartTimeNs': str(start_ns), 'maxEndTimeNs': str(end_ns),
+                'dataSourceId': data_source_id, 'point': points}
+
+    # users.dataSources.list, optionally filtered by data type names
+    def list_sources(self, data_type_names=()):
+        sources = []
+        for source_id in self.sources:
+            data_type = data_type_of(source_id)
+            if data_type_names and data_type not in data_type_names:
+                continue
+            field = 'bpm' if data_type == HEART_RATE_TYPE else 'sleep_segment_type'
+            sources.append({
+                'dataStreamId': source_id,
+                'dataStreamName': source_id.split(':', 3)[-1],
+                'type': source_id.split(':')[0],
+                'dataType': {'name': data_type,
+                             'field': [{'name': field, 'format': 'floatPoint' if field == 'bpm' else 'integer'}]},
+                'application': {'packageName': source_id.split(':')[2]},
+                'dataQualityStandard': [],
+            })
+        return {'dataSource': sources}
+
+
+# A local stand-in for the Google Fit REST API.
+#
+# Serves users.dataset.aggregate, users.dataSources.datasets.get and
+# users.dataSources.list from SyntheticFitData over plain HTTP with keep-alive.
+# Every request waits `latency` (+ up to `latency_jitter`) seconds and fails with
+# one of `error_statuses` with probability `error_rate`, both drawn from a seeded
+# generator. Point `get_fitness_service(creds, endpoint=server.url)` (or the
+# FIT_API_ENDPOINT environment variable) at it to run the fetch path offline.
+class FakeFitServer:
+    def __init__(self, host='127.0.0.1', port=0, seed=0, latency=0, latency_jitter=0, error_rate=0,
+                 error_statuses=(429, 500, 503), retry_after=None, hr_interval=60, sleep_stage_minutes=30,
+                 sources=DEFAULT_SOURCES, forbidden=(), cache_size=64, verbose=False):
+        self.api = FakeFitApi(SyntheticFitData(seed, hr_interval, sleep_stage_minutes), sources, forbidden)
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.error_rate = error_rate
+        self.error_statuses = tuple(error_statuses)
+        self.retry_after = retry_after
+        self.verbose = verbose
+        self.stats = {'requests': 0, 'errors': 0, 'bytes_sent': 0}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._thread = None
+        # Responses are generated once per distinct request, so load tests measure the client
+        self._respond = lru_cache(maxsize=cache_size)(self._encode)
+
+        self.httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self.httpd.daemon_threads = True
+
+    # Base URL to pass as the service endpoint
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name='fake-fit-server', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    # Draw this request's delay and injected error status (or None)
+    def _draw(self):
+        with self._lock:
+            delay = self.latency + self._random.uniform(0, self.latency_jitter) if self.latency_jitter else self.latency
+            failed = self.error_statuses and self._random.random() < self.error_rate
+            return delay, self._random.choice(self.error_statuses) if failed else None
+
+    # The encoded JSON response of one request
+    def _encode(self, method, path, query, body):
+        return json.dumps(self._route(method, path, query, body)).encode()
+
+    # Route one request to the API; returns the response object
+    def _route(self, method, path, query, body):
+        if not path.startswith(SERVICE_PATH):
+            raise FakeApiError(404, f"Unknown path {path}")
+        parts = [unquote(part) for part in path[len(SERVICE_PATH):].split('/')]
+        params = parse_qs(query)
+
+        if method == 'POST' and parts[1:] == ['dataset:aggregate']:
+            try:
+                return self.api.aggregate(json.loads(body or b'{}'))
+            except ValueError:
+                raise FakeApiError(400, "Request body is not valid JSON")
+        if method == 'GET' and len(parts) == 5 and parts[1] == 'dataSources' and parts[3] == 'datasets':
+            limit = int(params['limit'][0]) if 'limit' in params else None
+            return self.api.dataset(parts[2], parts[4], limit)
+        if method == 'GET' and parts[1:] == ['dataSources']:
+            return self.api.list_sources(params.get('dataTypeName', ()))
+        raise FakeApiError(404, f"Unknown method {method} {path}")
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'  # Keep connections alive like the real API
+            disable_nagle_algorithm = True  # Headers and body are written separately
+
+            def _handle(self, method):
+                url = urlsplit(self.path)
+                length = int(self.headers.get('Content-Length') or 0)
+                body = self.rfile.read(length) if length else b''
+
+                delay, error_status = server._draw()
+                if delay:
+                    time.sleep(delay)
+                try:
+                    if error_status is not None:
+                        raise FakeApiError(error_status, "Injected error")
+                    status, payload = 200, server._respond(method, url.path, url.query, body)
+                except FakeApiError as e:
+                    status_name, reason = ERROR_REASONS.get(e.status, ('UNKNOWN', 'unknown'))
+                    status, payload = e.status, json.dumps({'error': {
+                        'code': e.status, 'message': str(e), 'status': status_name,
+                        'errors': [{'message': str(e), 'domain': 'global', 'reason': reason}],
+                    }}).encode()
+
+                with server._lock:
+                    server.stats['requests'] += 1
+                    server.stats['bytes_sent'] += len(payload)
+                    if status != 200:
+                        server.stats['errors'] += 1
+
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json; charset=UTF-8')
+                self.send_header('Content-Length', str(len(payload)))
+                if status == 429 and server.retry_after is not None:
+                    self.send_header('Retry-After', str(server.retry_after))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def do_GET(self):
+                self._handle('GET')
+
+            def do_POST(self):
+                self._handle('POST')
+
+            def log_message(self, format, *args):
+                if server.verbose:
+                    super().log_message(format, *args)
+
+        return Handler
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve synthetic Google Fit data locally for offline load and latency tests.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--seed', type=int, default=0, help="seed of the synthetic data and injected errors")
+    parser.add_argument('--latency', type=float, default=0, help="delay of every response in seconds")
+    parser.add_argument('--latency-jitter', type=float, default=0, help="extra random delay of up to this many seconds")
+    parser.add_argument('--error-rate', type=float, default=0, help="fraction of requests answered with an error")
+    parser.add_argument('--error-statuses', type=lambda text: [int(status) for status in text.split(',')],
+                        default=[429, 500, 503], help="comma-separated HTTP statuses of injected errors")
+    parser.add_argument('--hr-interval', type=int, default=60, help="seconds between heart rate samples (payload size)")
+    parser.add_argument('--sleep-stage-minutes', type=int, default=30, help="length of each sleep segment (payload size)")
+    parser.add_argument('--forbid', action='append', default=[], help="data source ID or data type to answer with 403")
+    parser.add_argument('--verbose', action='store_true', help="log every request")
+    args = parser.parse_args(argv)
+
+    server = FakeFitServer(args.host, args.port, seed=args.seed, latency=args.latency,
+                           latency_jitter=args.latency_jitter, error_rate=args.error_rate,
+                           error_statuses=args.error_statuses, hr_interval=args.hr_interval,
+                           sleep_stage_minutes=args.sleep_stage_minutes, forbidden=args.forbid,
+                           verbose=args.verbose)
+    print(f"Fake Google Fit API listening, run the apps with FIT_API_ENDPOINT={server.url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+        print(f"Served {server.stats['requests']} requests ({server.stats['errors']} errors, "
+              f"{server.stats['bytes_sent']} bytes)")
+
+if __name__ == '__main__':
+    main()
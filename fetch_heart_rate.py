@@ -1,33 +1,15 @@
-import os
 import datetime
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from google.auth.transport.requests import Request
-from googleapiclient.discovery import build
+from fit_store import FitStore, points_from_response
+from fit_service import get_fitness_service
+from fit_scheduler import execute_request
+from fit_auth import get_credential_manager
 
 # Define the scope for heart rate data access
 SCOPES = ['https://www.googleapis.com/auth/fitness.heart_rate.read']
 
 def authenticate():
-    """Authenticate the user and create a token file."""
-    creds = None
-    # Check if token.json file exists, if yes load the credentials from it
-    if os.path.exists('token.json'):
-        creds = Credentials.from_authorized_user_file('token.json', SCOPES)
-
-    # If no valid credentials, let the user log in
-    if not creds or not creds.valid:
-        if creds and creds.expired and creds.refresh_token:
-            creds.refresh(Request())
-        else:
-            # Use the OAuth client secrets to authorize
-            flow = InstalledAppFlow.from_client_secrets_file('credentials.json', SCOPES)
-            creds = flow.run_local_server(port=0)
-            # Save the credentials for the next run
-            with open('token.json', 'w') as token:
-                token.write(creds.to_json())
-    
-    return creds
+    """Authenticate the user, reusing the in-memory token and refreshing it in the background."""
+    return get_credential_manager(SCOPES).get_credentials()
 
 def fetch_heart_rate_data(service):
     """Fetch heart rate data from the Google Fit API."""
@@ -45,20 +27,21 @@ def fetch_heart_rate_data(service):
 
     try:
         # Fetch heart rate data from Google Fit API
-        response = service.users().dataSources().datasets().get(
-            userId='me', dataSourceId=data_source_id, datasetId=dataset).execute()
+        response = execute_request(service.users().dataSources().datasets().get(
+            userId='me', dataSourceId=data_source_id, datasetId=dataset))
+
+        # Keep every fetched point in the local store. Raw samples get their own key: the apps
+        # store the bucket summaries of the same data source under the data source ID itself.
+        store = FitStore()
+        samples_key = data_source_id + '#samples'
+        store.append(samples_key, points_from_response(response))
 
         heart_rate_data = response.get('point', [])
         if heart_rate_data:
-            heart_rate_values = []
-            for point in heart_rate_data:
-                # Access heart rate value (assuming it is in bpm, like 'fpVal')
-                value = point['value'][0].get('fpVal')
-                if value is not None:
-                    heart_rate_values.append(value)
+            # Answer today's average from the local store
+            average_heart_rate = store.average(samples_key, start_time * 1000000, end_time * 1000000)
 
-            if heart_rate_values:
-                average_heart_rate = sum(heart_rate_values) / len(heart_rate_values)
+            if average_heart_rate is not None:
                 print(f"Average Heart Rate for Today: {average_heart_rate:.2f} BPM")
             else:
                 print("No heart rate data available for today.")
@@ -70,7 +53,7 @@ def fetch_heart_rate_data(service):
 def main():
     """Main function to authenticate and check the average heart rate data for today."""
     creds = authenticate()  # Ensure this function is defined above main()
-    service = build('fitness', 'v1', credentials=creds)
+    service = get_fitness_service(creds)
 
     # Fetch heart rate data for today
     fetch_heart_rate_data(service)
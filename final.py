@@ -1,12 +1,22 @@
-import os
+from startup_report import StartupTimer
+startup = StartupTimer()  # Created before the other imports so they are timed too
+
+import time
 from datetime import datetime, timedelta, timezone
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from google.auth.transport.requests import Request
-from googleapiclient.discovery import build
 import tkinter as tk
 from tkinter import messagebox
-from PIL import Image, ImageTk
+from logo_cache import load_logo
+from fit_store import NANOS_PER_DAY, FitStore
+from fit_sync import SyncState, forbidden_sources, sync_all, sync_source
+from fit_aggregate import SYNC_BUCKET_MILLIS, build_aggregate_body
+from response_cache import RESPONSE_CACHE_DIR, ResponseCache
+from fit_worker import BackgroundFetcher
+from warm_start import load_snapshot, save_snapshot
+from sample_ring import RECORD_DOUBLES, SampleRing
+from trend_chart import TrendChart
+import fit_metrics
+from scoring import assess_mental_health, provide_recommendation
+startup.mark('imports')
 
 # Set the required Google Fit API scopes for heart rate and sleep data
 SCOPES = [
@@ -14,168 +24,256 @@ SCOPES = [
     'https://www.googleapis.com/auth/fitness.sleep.read'
 ]
 
-# Authenticate with Google Fit API
+# Authenticate with Google Fit API. The token is loaded once, kept in memory
+# and refreshed in the background before it expires.
+# The Google API client and auth libraries take a while to import, so they are
+# imported on first use (on the fetch worker) instead of before the window appears.
 def authenticate_google_fit():
-    creds = None
-    if os.path.exists('token.json'):
-        creds = Credentials.from_authorized_user_file('token.json', SCOPES)
-    
-    if not creds or not creds.valid:
-        if creds and creds.expired and creds.refresh_token:
-            creds.refresh(Request())
-        else:
-            flow = InstalledAppFlow.from_client_secrets_file('credentials.json', SCOPES)
-            creds = flow.run_local_server(port=0)
-        
-        # Save the credentials for the next run
-        with open('token.json', 'w') as token:
-            token.write(creds.to_json())
+    from fit_auth import get_credential_manager
+    return get_credential_manager(SCOPES).get_credentials()
 
-    return creds
-
-# Fetch data from Google Fit API
+# Fetch data from Google Fit API (repeated requests are answered from the response cache)
 def fetch_data(service, start_time, end_time, data_source_id, data_type):
-    body = {
-        "aggregateBy": [
-            {
-                "dataTypeName": data_type,
-                "dataSourceId": data_source_id
-            }
-        ],
-        "bucketByTime": { "durationMillis": 86400000 },  # 1 day in milliseconds
-        "startTimeMillis": start_time,
-        "endTimeMillis": end_time
-    }
-    
-    try:
-        response = service.users().dataset().aggregate(userId="me", body=body).execute()
-        return response
-    except Exception as e:
-        if "403" in str(e):  # Check if the error is 403 (Forbidden)
+    sources = [(data_source_id, data_type)]
+    start_time, end_time = response_cache.round_window(start_time, end_time, SYNC_BUCKET_MILLIS)
+    body = build_aggregate_body(sources, start_time, end_time, bucket_millis=SYNC_BUCKET_MILLIS)
+
+    def request():
+        from fit_scheduler import FitApiError, ForbiddenError, execute_request
+
+        try:
+            with fit_metrics.span('fetch_data'):
+                response = execute_request(service.users().dataset().aggregate(userId="me", body=body))
+            return response
+        except ForbiddenError:
             print("Error: Unable to access sleep data source. Data may not be available or accessible.")
-        else:
+            forbidden_sources.add(data_source_id)  # Not asked for again this session
+        except FitApiError as e:  # Rate limits and server errors were already retried
             print(f"Error fetching {data_type} data: {e}")
         return None
 
-# Calculate the average heart rate from the data points
-def calculate_average_heart_rate(response):
-    total_heart_rate = 0
-    count = 0
-
-    for bucket in response.get('bucket', []):
-        for dataset in bucket.get('dataset', []):
-            for point in dataset.get('point', []):
-                for value in point.get('value', []):
-                    total_heart_rate += value.get('fpVal')
-                    count += 1
-
-    if count == 0:
+    return response_cache.get_or_fetch(response_cache.key(sources, SYNC_BUCKET_MILLIS, start_time, end_time), request)
+
+# Fetch several data sources from Google Fit API with one combined aggregate request
+# (repeated requests are answered from the response cache).
+# `sources` is a list of (data_source_id, data_type) pairs.
+def fetch_combined_data(service, start_time, end_time, sources):
+    start_time, end_time = response_cache.round_window(start_time, end_time, SYNC_BUCKET_MILLIS)
+    body = build_aggregate_body(sources, start_time, end_time, bucket_millis=SYNC_BUCKET_MILLIS)
+
+    def request():
+        from fit_scheduler import FitApiError, ForbiddenError, execute_request
+
+        try:
+            with fit_metrics.span('fetch_combined_data'):
+                response = execute_request(service.users().dataset().aggregate(userId="me", body=body))
+            return response
+        except ForbiddenError:  # One of the sources (usually sleep) is not accessible
+            print("Error: Unable to access one of the data sources. Fetching them separately.")
+        except FitApiError as e:
+            print(f"Error fetching combined data: {e}")
         return None
 
-    return total_heart_rate / count
-
-# Calculate total sleep time in hours
-def calculate_total_sleep_hours(response):
-    total_sleep_duration_nanos = 0  # Total sleep duration in nanoseconds
-
-    if response and response.get('bucket'):
-        for bucket in response.get('bucket', []):
-            for dataset in bucket.get('dataset', []):
-                for point in dataset.get('point', []):
-                    start_time_nanos = int(point.get('startTimeNanos'))
-                    end_time_nanos = int(point.get('endTimeNanos'))
-                    
-                    # Calculate duration for this sleep segment
-                    duration_nanos = end_time_nanos - start_time_nanos
-                    total_sleep_duration_nanos += duration_nanos
-
-    # Convert total duration from nanoseconds to hours
-    total_sleep_hours = total_sleep_duration_nanos / 1e9 / 3600  # nanoseconds to hours
-    return total_sleep_hours
-
-# Function to assess mental health based on input values
-def assess_mental_health(heart_rate_var, sleep_hours, noise_level, light_level):
-    stress_score = 0
-
-    # Physiological Factors
-    if heart_rate_var < 50 or heart_rate_var > 95:
-        stress_score += 1
-
-    if sleep_hours < 6 or sleep_hours > 15:
-        stress_score += 1
-
-    # Environmental Factors
-    if noise_level > 70:
-        stress_score += 1
-
-    if light_level < 30 or light_level > 200:
-        stress_score += 1
-
-    return stress_score
-
-# Function to provide recommendations based on stress score
-def provide_recommendation(stress_score):
-    if stress_score == 0:
-        return "You are doing well! Keep up your current routine."
-    elif stress_score == 1:
-        return "Slight stress detected. Try to relax and take breaks."
-    elif stress_score == 2:
-        return "Moderate stress detected. Ensure you have enough sleep and reduce exposure to noise."
-    elif stress_score == 3:
-        return "High stress detected. Consider reducing environmental stressors and practice mindfulness."
-    else:
-        return "Critical stress levels detected! Please reach out to a mental health professional."
-
-# Function to automatically fetch data from Google Fit and display results
-def fetch_and_display_data():
-    try:
-        # Fetch heart rate and sleep data from Google Fit
-        creds = authenticate_google_fit()
-        service = build('fitness', 'v1', credentials=creds)
-
-        # Define the time period (example: last 1 day)
-        now = datetime.now(timezone.utc)
-        start_time = int((now - timedelta(days=1)).timestamp() * 1000)
-        end_time = int(now.timestamp() * 1000)
-
-        # Data source IDs
-        heart_rate_data_source = "raw:com.google.heart_rate.bpm:com.boAt.wristgear:GoogleFitSync - HR count"
-        sleep_data_source = "derived:com.google.sleep.segment:com.google.android.gms:merge_sleep_segments"
-
-        # Fetch heart rate data
-        heart_rate_response = fetch_data(service, start_time, end_time, heart_rate_data_source, "com.google.heart_rate.bpm")
+    return response_cache.get_or_fetch(response_cache.key(sources, SYNC_BUCKET_MILLIS, start_time, end_time), request)
 
-        # Fetch sleep data
-        sleep_response = fetch_data(service, start_time, end_time, sleep_data_source, "com.google.sleep.segment")
+# Fetch heart rate in 1 minute buckets for the trend chart
+# (repeated requests are answered from the response cache)
+def fetch_minute_heart_rate(service, start_time, end_time):
+    sources = [(heart_rate_data_source, "com.google.heart_rate.bpm")]
+    start_time, end_time = response_cache.round_window(start_time, end_time, CHART_BUCKET_MILLIS)
+    body = build_aggregate_body(sources, start_time, end_time, bucket_millis=CHART_BUCKET_MILLIS)
 
-        # Calculate average heart rate
-        if heart_rate_response:
-            avg_heart_rate = calculate_average_heart_rate(heart_rate_response)
-        else:
-            avg_heart_rate = 0  # Set to 0 if no data is available
-
-        # Calculate total sleep hours
-        if sleep_response:
-            total_sleep_hours = calculate_total_sleep_hours(sleep_response)
-        else:
-            total_sleep_hours = 0  # Set sleep hours to 0 if data is not available
+    def request():
+        from fit_scheduler import FitApiError, execute_request
 
-        # Set the values in the entry fields
-        hrv_entry.delete(0, tk.END)
-        hrv_entry.insert(0, str(avg_heart_rate))
+        try:
+            with fit_metrics.span('fetch_chart_data'):
+                response = execute_request(service.users().dataset().aggregate(userId="me", body=body))
+            return response
+        except FitApiError as e:
+            print(f"Error fetching the heart rate trend: {e}")
+        return None
 
-        sleep_entry.delete(0, tk.END)
-        sleep_entry.insert(0, str(total_sleep_hours))
+    return response_cache.get_or_fetch(response_cache.key(sources, CHART_BUCKET_MILLIS, start_time, end_time), request)
+
+# Data source IDs
+heart_rate_data_source = "raw:com.google.heart_rate.bpm:com.boAt.wristgear:GoogleFitSync - HR count"
+sleep_data_source = "derived:com.google.sleep.segment:com.google.android.gms:merge_sleep_segments"
+
+# Seconds to wait for each data source; the sleep source is often slow or forbidden
+FETCH_TIMEOUTS = {
+    heart_rate_data_source: 20,
+    sleep_data_source: 10,
+}
+# Seconds to wait for the combined request before fetching every source on its own
+COMBINED_FETCH_TIMEOUT = 10
+
+# Local time-series store that every fetch writes into, and how far each source has been synced
+store = FitStore()
+sync_state = SyncState()
+
+# Recent aggregate responses, so clicking Update again doesn't repeat identical requests
+response_cache = ResponseCache(disk_dir=RESPONSE_CACHE_DIR)
+
+# When Google Fit data was last fetched, and the last assessment shown as
+# (stress score, recommendation, assessed at); both go into the warm-start snapshot
+last_fetched_at = None
+last_assessment = None
+
+# How often the UI checks the collector's shared-memory ring for new samples
+RING_POLL_MILLIS = 1000
+# Attach to the ring again after this long without new samples, in case the collector was
+# restarted (and created a new ring) without closing the old one
+RING_REATTACH_SECONDS = 5 * 60
+sample_reader = None  # Reader of the ring once a collector (`krde.py collect --ring`) has created it
+sample_seen_at = 0  # When the ring last had new samples (time.monotonic())
+
+# Trend chart: minute-level heart rate is synced into the store under its own key (next
+# to the daily averages), so the chart keeps up to a year of history across sessions.
+# Only the minutes after the newest one on the chart are read back and appended.
+CHART_BUCKET_MILLIS = 60 * 1000
+CHART_HEART_RATE_KEY = heart_rate_data_source + "#minute"
+CHART_HISTORY_DAYS = 365
+CHART_SLEEP_DAYS = 30
+CHART_REFRESH_MILLIS = 60 * 1000
+
+# Sync only the minute-level heart rate that is new since the last sync into the store
+def sync_minute_heart_rate(service, start_time, end_time):
+    return sync_source(store, sync_state, CHART_HEART_RATE_KEY, start_time, end_time,
+                       lambda start, end: fetch_minute_heart_rate(service, start, end),
+                       bucket_millis=CHART_BUCKET_MILLIS)
+
+# Read the trend chart data from the store: the minute-level heart rate after `chart_since`
+# (seconds since the epoch; the whole history when None) as times in seconds and values,
+# and the hours slept per day as {day start in seconds: hours}
+def read_chart_data(chart_since, end_nanos):
+    from aggregation import daily_sleep_hours, store_to_arrays  # Imports NumPy
+
+    if chart_since is None:
+        start_nanos = end_nanos - CHART_HISTORY_DAYS * NANOS_PER_DAY
+    else:
+        start_nanos = int(chart_since * 1e9) + 1
+    starts, _, values = store_to_arrays(store, CHART_HEART_RATE_KEY, start_nanos, end_nanos)
+    times = (starts / 1e9).tolist()
+
+    sleep_starts, sleep_ends, _ = store_to_arrays(store, sleep_data_source,
+                                                  end_nanos - CHART_SLEEP_DAYS * NANOS_PER_DAY, end_nanos)
+    days, hours = daily_sleep_hours(sleep_starts, sleep_ends)
+    daily_sleep = {int(day) // 1000000000: float(day_hours) for day, day_hours in zip(days, hours)}
+    return times, values.tolist(), daily_sleep
+
+# Fetch heart rate and sleep data from Google Fit (runs on the background worker, not the Tk thread).
+# Also returns the trend chart data newer than `chart_since` (see read_chart_data).
+def fetch_fit_values(report, chart_since=None):
+    report("Authenticating with Google Fit...")
+    with fit_metrics.span('authenticate'):
+        creds = authenticate_google_fit()
 
-    except Exception as e:
+    report("Connecting to Google Fit...")
+    from fit_service import get_fitness_service
+    with fit_metrics.span('build_service'):
+        service = get_fitness_service(creds)
+
+    # Define the time period (example: last 1 day)
+    now = datetime.now(timezone.utc)
+    start_time = int((now - timedelta(days=1)).timestamp() * 1000)
+    end_time = int(now.timestamp() * 1000)
+
+    # Fetch only the heart rate and sleep data that is new since the last sync into the local store,
+    # with a single combined request. If that fails or is slow, both are fetched at once, each with
+    # its own timeout; a source that was forbidden (usually sleep) is not asked for again.
+    report("Fetching heart rate and sleep data...")
+    sources = [
+        (heart_rate_data_source, "com.google.heart_rate.bpm"),
+        (sleep_data_source, "com.google.sleep.segment"),
+    ]
+    sync_all(store, sync_state, sources, start_time, end_time,
+             lambda start, end, sources: fetch_combined_data(service, start, end, sources),
+             lambda start, end, source, data_type: fetch_data(service, start, end, source, data_type),
+             timeouts=FETCH_TIMEOUTS, combined_timeout=COMBINED_FETCH_TIMEOUT)
+
+    report("Fetching heart rate trend...")
+    sync_minute_heart_rate(service, start_time, end_time)
+
+    # Answer the average heart rate and total sleep hours from the local store
+    report("Calculating...")
+    start_nanos = start_time * 1000000
+    end_nanos = end_time * 1000000
+    with fit_metrics.span('store_read'):
+        avg_heart_rate = store.average(heart_rate_data_source, start_nanos, end_nanos) or 0  # Set to 0 if no data is available
+        total_sleep_hours = store.total_duration_hours(sleep_data_source, start_nanos, end_nanos)
+        chart_data = read_chart_data(chart_since, end_nanos)
+
+    return avg_heart_rate, total_sleep_hours, chart_data
+
+# Sync the newest minute-level heart rate and read the chart data (background worker)
+def fetch_chart_values(report, chart_since):
+    from fit_service import get_fitness_service
+    service = get_fitness_service(authenticate_google_fit())
+    end_time = int(time.time() * 1000)
+    sync_minute_heart_rate(service, end_time - 24 * 60 * 60 * 1000, end_time)
+    with fit_metrics.span('store_read'):
+        return read_chart_data(chart_since, end_time * 1000000)
+
+# Append the new heart rate minutes to the trend chart and update the sleep bars
+def display_chart_data(chart_data):
+    times, values, daily_sleep = chart_data
+    with fit_metrics.span('chart_update'):
+        chart.update_heart_rate(times, values)
+        chart.set_daily_sleep(daily_sleep)
+
+# Set the fetched values in the entry fields
+def display_fit_values(values):
+    avg_heart_rate, total_sleep_hours, chart_data = values
+
+    hrv_entry.delete(0, tk.END)
+    hrv_entry.insert(0, str(avg_heart_rate))
+
+    sleep_entry.delete(0, tk.END)
+    sleep_entry.insert(0, str(total_sleep_hours))
+
+    # The values are fresh now (they may have been restored from the snapshot)
+    hrv_entry.config(fg=entry_fg)
+    sleep_entry.config(fg=entry_fg)
+    display_chart_data(chart_data)
+
+# Function to automatically fetch data from Google Fit and display results.
+# The fetch runs in the background; `then` is called on the Tk thread once it has finished.
+def fetch_and_display_data(then=None):
+    total = fit_metrics.span('fetch_and_display_data')
+
+    def on_done(values):
+        global last_fetched_at
+        with fit_metrics.span('tk_update'):
+            display_fit_values(values)
+            status_var.set("")
+        total.stop()
+        last_fetched_at = time.time()
+        save_warm_start()
+        if then:
+            then()
+
+    def on_error(e):
         print(f"Error fetching data from Google Fit: {e}")
-
-# Function to display results based on user inputs
-def on_update():
+        status_var.set("Could not fetch data from Google Fit.")
+        total.stop(error=True)
+        if then:
+            then()
+
+    chart_since = chart.times[-1] if chart.times else None
+    fetcher.submit(lambda report: fetch_fit_values(report, chart_since), on_done,
+                   on_progress=status_var.set, on_error=on_error)
+
+# Cancel the fetch that is running, if any
+def cancel_fetch(event=None):
+    if fetcher.busy:
+        fetcher.cancel()
+        status_var.set("Fetch cancelled.")
+
+# Assess stress from the values in the entry fields and display the result
+def display_assessment():
+    global last_assessment
     try:
-        # Fetch heart rate and sleep data
-        fetch_and_display_data()
-
         # Get user input for noise and light levels
         noise_level = float(noise_entry.get())
         light_level = float(light_entry.get())
@@ -185,8 +283,9 @@ def on_update():
         sleep_hours = float(sleep_entry.get())
 
         # Assess stress based on the values
-        stress_score = assess_mental_health(heart_rate, sleep_hours, noise_level, light_level)
-        recommendation = provide_recommendation(stress_score)
+        with fit_metrics.span('scoring'):
+            stress_score = assess_mental_health(heart_rate, sleep_hours, noise_level, light_level)
+            recommendation = provide_recommendation(stress_score)
 
         # Set the stress score and recommendation
         result_var.set(f"Stress Score: {stress_score}")
@@ -198,10 +297,115 @@ def on_update():
             result_label.config(fg='#007BFF')  # Blue for other levels
 
         recommendation_var.set(f"Recommendation: {recommendation}")
+
+        last_assessment = (stress_score, recommendation, time.time())
+        save_warm_start()
         
     except ValueError:
         messagebox.showerror("Input Error", "Please enter valid numeric values.")
 
+# Function to display results based on user inputs
+def on_update():
+    total = fit_metrics.span('on_update')
+
+    def assess():
+        display_assessment()
+        total.stop()
+
+    # Fetch heart rate and sleep data, then assess once they are in the entry fields
+    fetch_and_display_data(then=assess)
+
+# Save the values on screen, the last assessment and the fetch time as the warm-start snapshot
+def save_warm_start():
+    stress_score, recommendation, assessed_at = last_assessment or (None, None, None)
+    try:
+        save_snapshot({
+            'heart_rate': hrv_entry.get(),
+            'sleep_hours': sleep_entry.get(),
+            'noise_level': noise_entry.get(),
+            'light_level': light_entry.get(),
+            'stress_score': stress_score,
+            'recommendation': recommendation,
+            'fetched_at': last_fetched_at,
+            'assessed_at': assessed_at,
+        })
+    except OSError as e:
+        print(f"Could not save the warm-start snapshot: {e}")
+
+# Show the snapshot of the last session right away, greyed out as stale until the
+# background refresh replaces it. Returns the snapshot, or None if there is none.
+def restore_warm_start():
+    global last_fetched_at, last_assessment
+    snapshot = load_snapshot()
+    if snapshot is None:
+        return None
+
+    for entry, field in ((hrv_entry, 'heart_rate'), (sleep_entry, 'sleep_hours'),
+                         (noise_entry, 'noise_level'), (light_entry, 'light_level')):
+        if snapshot[field]:
+            entry.delete(0, tk.END)
+            entry.insert(0, snapshot[field])
+    hrv_entry.config(fg=STALE_FG)
+    sleep_entry.config(fg=STALE_FG)
+
+    if snapshot['stress_score'] is not None:
+        last_assessment = (snapshot['stress_score'], snapshot['recommendation'], snapshot['assessed_at'])
+        result_var.set(f"Stress Score: {snapshot['stress_score']}")
+        result_label.config(fg=STALE_FG)
+        recommendation_var.set(f"Recommendation: {snapshot['recommendation']}")
+
+    last_fetched_at = snapshot['fetched_at']
+    if last_fetched_at:
+        fetched = datetime.fromtimestamp(last_fetched_at).strftime('%Y-%m-%d %H:%M')
+        status_var.set(f"Showing data from {fetched}, refreshing...")
+    return snapshot
+
+# Show the newest sample a running collector published, then check again later.
+# The records are read in place from shared memory; only the newest one is shown, in the
+# status line, so the day's heart rate and the user's noise and light entries are left alone.
+def poll_samples():
+    global sample_reader, sample_seen_at
+    if sample_reader is None:
+        try:
+            sample_reader = SampleRing.attach().reader(from_start=True)
+            sample_seen_at = time.monotonic()
+        except (FileNotFoundError, ValueError):
+            pass  # No collector running (yet)
+
+    if sample_reader is not None:
+        segments = sample_reader.read_new()
+        if segments:
+            sample_seen_at = time.monotonic()
+            timestamp, heart_rate, _, _ = segments[-1][-RECORD_DOUBLES:].tolist()
+            sampled = datetime.fromtimestamp(timestamp).strftime('%H:%M')
+            status_var.set(f"Heart rate from the collector: {heart_rate:.0f} bpm (hourly average to {sampled})")
+        del segments  # Release the views into shared memory
+
+        # The collector stopped (or was restarted): let go of the old ring and attach to the new one
+        if sample_reader.ring.closed or time.monotonic() - sample_seen_at > RING_REATTACH_SECONDS:
+            sample_reader.ring.close()
+            sample_reader = None
+
+    app.after(RING_POLL_MILLIS, poll_samples)
+
+# Refresh the trend chart with the newest heart rate minutes, then again later.
+# Skipped while a fetch is running, as that updates the chart as well.
+def refresh_chart():
+    if not fetcher.busy:
+        chart_since = chart.times[-1] if chart.times else None
+        fetcher.submit(lambda report: fetch_chart_values(report, chart_since), display_chart_data,
+                       on_error=lambda e: print(f"Error refreshing the heart rate trend: {e}"))
+    app.after(CHART_REFRESH_MILLIS, refresh_chart)
+
+# Stop the background worker (and write the last metrics export) when the window is closed
+def on_close():
+    fetcher.shutdown()
+    if sample_reader is not None:
+        sample_reader.ring.close()
+    save_warm_start()
+    fit_metrics.shutdown()
+    app.destroy()
+
 # Create the main application window
 app = tk.Tk()
 app.title("Mental Health Monitoring System")
@@ -211,9 +415,7 @@ app.configure(bg='#e6f2ff')
 
 # Load and display logo (ensure you have an image file 'logo.png' in the same directory)
 try:
-    logo_image = Image.open("logo.jpeg")
-    logo_image = logo_image.resize((400, 200))  # Resize logo to fit desktop size
-    logo_photo = ImageTk.PhotoImage(logo_image)
+    logo_photo = load_logo("logo.jpeg", (400, 200), master=app)  # Resized to fit desktop size, cached
     logo_label = tk.Label(app, image=logo_photo, bg='#e6f2ff')
     logo_label.grid(row=0, column=0, columnspan=2, pady=20)
 except Exception as e:
@@ -223,6 +425,7 @@ except Exception as e:
 label_fg = '#003366'  # Dark blue for text
 entry_bg = '#ffffff'  # White background for entry fields
 entry_fg = '#000000'  # Black text color for entry fields
+STALE_FG = '#999999'  # Grey text for values restored from the last session
 
 # Define the labels and entry fields dynamically
 fields = [
@@ -262,8 +465,37 @@ recommendation_var = tk.StringVar()
 recommendation_label = tk.Label(app, textvariable=recommendation_var, font=("Helvetica", 12), bg='#e6f2ff')
 recommendation_label.grid(row=7, column=0, columnspan=2)
 
-# Start the automatic data fetch when the app is launched
-fetch_and_display_data()
+# Display fetch progress; Escape cancels a running fetch
+status_var = tk.StringVar()
+status_label = tk.Label(app, textvariable=status_var, font=("Helvetica", 10), fg='#666666', bg='#e6f2ff')
+status_label.grid(row=8, column=0, columnspan=2, pady=(0, 10))
+
+# Live heart rate and sleep trend (scroll to zoom, drag to pan, double-click to follow the newest data)
+chart = TrendChart(app, width=400, height=180)
+chart.grid(row=9, column=0, columnspan=2, padx=20, pady=(0, 20))
+app.bind('<Escape>', cancel_fetch)
+
+# Background worker that keeps Google Fit requests off the Tk thread
+fetcher = BackgroundFetcher(app)
+app.protocol("WM_DELETE_WINDOW", on_close)
+
+# Show the last session's values until the first fetch has finished
+snapshot = restore_warm_start()
+startup.mark('window_built')
+
+# Once the window is on screen, report the startup time and start the automatic data fetch.
+# With noise and light levels restored, the assessment is refreshed as well.
+def on_first_paint():
+    startup.mark('first_paint')
+    startup.report()
+    if snapshot and snapshot['noise_level'] and snapshot['light_level']:
+        fetch_and_display_data(then=display_assessment)
+    else:
+        fetch_and_display_data()
+    poll_samples()
+    app.after(CHART_REFRESH_MILLIS, refresh_chart)
+
+startup.after_first_paint(app, on_first_paint)
 
 # Start the GUI event loop
 app.mainloop()
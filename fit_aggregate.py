@@ -0,0 +1,84 @@
+from fit_store import point_value
+
+DAY_BUCKET_MILLIS = 86400000  # 1 day in milliseconds
+
+# Bucket size of the requests that sync into the local store. Sync windows start on a
+# bucket boundary, so a bucket fetched again has the same start time and replaces the
+# stored one instead of adding a second summary of the same time.
+SYNC_BUCKET_MILLIS = 3600000  # 1 hour in milliseconds
+
+# Build one aggregate request body for several data sources.
+# `sources` is a list of (data_source_id, data_type) pairs; the response has one
+# dataset per source in every bucket, in the same order.
+def build_aggregate_body(sources, start_time, end_time, bucket_millis=DAY_BUCKET_MILLIS):
+    return {
+        "aggregateBy": [
+            {
+                "dataTypeName": data_type,
+                "dataSourceId": data_source_id
+            }
+            for data_source_id, data_type in sources
+        ],
+        "bucketByTime": { "durationMillis": bucket_millis },
+        "startTimeMillis": start_time,
+        "endTimeMillis": end_time
+    }
+
+# Walk an aggregate response once, handing every point of the i-th dataset of
+# each bucket to the i-th accumulator. Returns the accumulators.
+def parse_aggregate_response(response, accumulators):
+    for bucket in response.get('bucket', []):
+        for dataset, accumulator in zip(bucket.get('dataset', []), accumulators):
+            add = accumulator.add
+            for point in dataset.get('point', []):
+                add(point)
+    return accumulators
+
+
+# Collects (start_ns, end_ns, value) rows, ready for FitStore.append
+class PointCollector:
+    def __init__(self):
+        self.points = []
+
+    def add(self, point):
+        self.points.append((int(point['startTimeNanos']), int(point['endTimeNanos']), point_value(point)))
+
+    def result(self):
+        return self.points
+
+
+# Average point value weighted by the time each point covers, like FitStore.average
+# (for heart rate summaries the value is the bucket average, not its min or max)
+class AverageAccumulator:
+    def __init__(self):
+        self.weighted_total = 0
+        self.total_nanos = 0
+        self.total = 0
+        self.count = 0
+
+    def add(self, point):
+        value = point_value(point)
+        nanos = int(point['endTimeNanos']) - int(point['startTimeNanos'])
+        self.weighted_total += value * nanos
+        self.total_nanos += nanos
+        self.total += value
+        self.count += 1
+
+    def result(self):
+        if self.count == 0:
+            return None
+        if self.total_nanos <= 0:  # Only raw samples without a duration
+            return self.total / self.count
+        return self.weighted_total / self.total_nanos
+
+
+# Total duration of the points in hours, like calculate_total_sleep_hours
+class DurationAccumulator:
+    def __init__(self):
+        self.total_nanos = 0
+
+    def add(self, point):
+        self.total_nanos += int(point['endTimeNanos']) - int(point['startTimeNanos'])
+
+    def result(self):
+        return self.total_nanos / 1e9 / 3600
@@ -0,0 +1,124 @@
+import os
+import threading
+from datetime import datetime, timezone
+from google.oauth2.credentials import Credentials
+from google_auth_oauthlib.flow import InstalledAppFlow
+from google.auth.transport.requests import Request
+
+TOKEN_FILE = 'token.json'
+CLIENT_SECRETS_FILE = 'credentials.json'
+
+# Refresh the access token this many seconds before it expires
+REFRESH_MARGIN = 5 * 60
+# Wait this long before trying again when a background refresh fails
+REFRESH_RETRY = 60
+
+_managers_lock = threading.Lock()
+_managers = {}  # (token file, scopes) -> CredentialManager
+
+
+# Raised when a non-interactive manager would need the user to log in
+class AuthorizationRequired(Exception):
+    pass
+
+
+# Keeps Google Fit credentials in memory and refreshes the access token on a
+# background timer shortly before it expires, so fetches never wait for token
+# file I/O or a refresh round trip. token.json is rewritten (atomically) only
+# when the token has actually changed. With `interactive=False` a missing or
+# unrefreshable token raises AuthorizationRequired instead of opening a browser.
+class CredentialManager:
+    def __init__(self, scopes, token_file=TOKEN_FILE, client_secrets_file=CLIENT_SECRETS_FILE,
+                 refresh_margin=REFRESH_MARGIN, interactive=True):
+        self.scopes = list(scopes)
+        self.token_file = token_file
+        self.client_secrets_file = client_secrets_file
+        self.refresh_margin = refresh_margin
+        self.interactive = interactive
+        self._lock = threading.RLock()
+        self._creds = None
+        self._saved_json = None
+        self._timer = None
+
+    # Valid credentials; only the first call (or one after a failed refresh) touches the disk or network
+    def get_credentials(self):
+        with self._lock:
+            if self._creds is None:
+                self._load()
+            if not self._creds.valid:
+                self._refresh_or_authorize()
+            return self._creds
+
+    # Stop the background refresh timer
+    def stop(self):
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+
+    def _load(self):
+        if os.path.exists(self.token_file):
+            with open(self.token_file) as f:
+                self._saved_json = f.read()
+            self._creds = Credentials.from_authorized_user_file(self.token_file, self.scopes)
+        if not self._creds or not self._creds.valid:
+            self._refresh_or_authorize()
+        else:
+            self._schedule_refresh()
+
+    def _refresh_or_authorize(self):
+        if self._creds and self._creds.expired and self._creds.refresh_token:
+            self._creds.refresh(Request())
+        elif not self.interactive:
+            raise AuthorizationRequired(f"{self.token_file} has no valid or refreshable token")
+        else:
+            flow = InstalledAppFlow.from_client_secrets_file(self.client_secrets_file, self.scopes)
+            self._creds = flow.run_local_server(port=0)
+        self._save()
+        self._schedule_refresh()
+
+    # Save the credentials for the next run, but only if they changed
+    def _save(self):
+        token_json = self._creds.to_json()
+        if token_json == self._saved_json:
+            return
+        tmp_path = self.token_file + '.tmp'
+        with open(tmp_path, 'w') as token:
+            token.write(token_json)
+        os.replace(tmp_path, self.token_file)
+        self._saved_json = token_json
+
+    def _schedule_refresh(self, delay=None):
+        if self._timer is not None:
+            self._timer.cancel()
+        if delay is None:
+            expiry = self._creds.expiry
+            if expiry is None or not self._creds.refresh_token:
+                return  # Nothing to refresh
+            now = datetime.now(timezone.utc).replace(tzinfo=None)  # google-auth uses naive UTC
+            delay = max((expiry - now).total_seconds() - self.refresh_margin, 0)
+
+        self._timer = threading.Timer(delay, self._background_refresh)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _background_refresh(self):
+        with self._lock:
+            try:
+                self._creds.refresh(Request())
+                self._save()
+                self._schedule_refresh()
+            except Exception as e:
+                print(f"Error refreshing Google Fit token, retrying in {REFRESH_RETRY} seconds: {e}")
+                self._schedule_refresh(REFRESH_RETRY)
+
+# Get the process-wide credential manager for a token file and set of scopes
+def get_credential_manager(scopes, token_file=TOKEN_FILE, client_secrets_file=CLIENT_SECRETS_FILE,
+                           interactive=True):
+    key = (os.path.abspath(token_file), tuple(sorted(scopes)))
+    with _managers_lock:
+        manager = _managers.get(key)
+        if manager is None:
+            manager = CredentialManager(scopes, token_file, client_secrets_file, interactive=interactive)
+            _managers[key] = manager
+        return manager
@@ -0,0 +1,38 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+# Seconds to wait for a data source before giving up on it
+DEFAULT_FETCH_TIMEOUT = 30
+
+# Run several fetches at once and gather their results.
+#
+# `fetches` maps a key (usually the data source ID) to a function taking no arguments.
+# `timeouts` optionally maps a key to its own timeout in seconds. A fetch that raises
+# or does not finish within its timeout gives None, without delaying the others.
+def fetch_concurrently(fetches, timeouts=None, default_timeout=DEFAULT_FETCH_TIMEOUT):
+    timeouts = timeouts or {}
+    results = {}
+    if not fetches:
+        return results
+
+    executor = ThreadPoolExecutor(max_workers=len(fetches), thread_name_prefix='fit-source')
+    try:
+        started = time.monotonic()
+        futures = {key: executor.submit(fetch) for key, fetch in fetches.items()}
+
+        # Wait for the sources with the shortest timeouts first
+        for key in sorted(futures, key=lambda key: timeouts.get(key, default_timeout)):
+            remaining = started + timeouts.get(key, default_timeout) - time.monotonic()
+            try:
+                results[key] = futures[key].result(timeout=max(remaining, 0))
+            except TimeoutError:
+                print(f"Timed out fetching {key}")
+                results[key] = None
+            except Exception as e:
+                print(f"Error fetching {key}: {e}")
+                results[key] = None
+    finally:
+        # Don't wait for sources that timed out; their threads finish on their own
+        executor.shutdown(wait=False)
+
+    return results
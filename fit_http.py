@@ -0,0 +1,108 @@
+import os
+import queue
+import threading
+from contextlib import contextmanager
+import httplib2
+import google_auth_httplib2
+from fit_metrics import count
+
+# Number of keep-alive connections shared by all Google Fit requests of one user
+POOL_SIZE = 4
+# Socket timeout in seconds for every request
+HTTP_TIMEOUT = 30
+# Environment variables that override the two defaults above
+POOL_SIZE_ENV = 'FIT_HTTP_POOL_SIZE'
+TIMEOUT_ENV = 'FIT_HTTP_TIMEOUT'
+
+_pools_lock = threading.Lock()
+_pools = {}  # (id(credentials), size, timeout) -> (credentials, HttpPool)
+
+
+# A pool of authorized keep-alive HTTP connections.
+#
+# httplib2 keeps connections open between requests but an Http object must not be
+# used by two threads at once, so each request checks one out, uses it and puts it
+# back warm. The pool has the same `request()` method as an Http object and can be
+# handed to googleapiclient as the service's `http`, which makes the service safe
+# to use from several threads.
+class HttpPool:
+    def __init__(self, creds, size=POOL_SIZE, timeout=HTTP_TIMEOUT):
+        self.credentials = creds
+        self.size = size
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()  # The most recently used connection is the most likely to still be open
+        self._slots = threading.BoundedSemaphore(size)
+
+    def _new_http(self):
+        if self.credentials is None:  # Unauthenticated, e.g. for the local fake API
+            return httplib2.Http(timeout=self.timeout)
+        return google_auth_httplib2.AuthorizedHttp(self.credentials, http=httplib2.Http(timeout=self.timeout))
+
+    # Borrow a connection, waiting for one to be returned when all of them are in use
+    @contextmanager
+    def connection(self):
+        self._slots.acquire()
+        try:
+            try:
+                http = self._idle.get_nowait()
+            except queue.Empty:
+                http = self._new_http()
+            try:
+                yield http
+            finally:
+                self._idle.put(http)
+        finally:
+            self._slots.release()
+
+    def request(self, *args, **kwargs):
+        with self.connection() as http:
+            try:
+                response, content = http.request(*args, **kwargs)
+            except Exception:
+                count('http_errors')
+                raise
+        count('http_requests')
+        count('http_bytes_received', len(content or b''))
+        if response.status >= 400:
+            count('http_errors')
+        return response, content
+
+    # Close every idle connection
+    def close(self):
+        while True:
+            try:
+                http = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            getattr(http, 'http', http).close()
+
+# Read a number from the environment, or return `default` when it is unset or invalid
+def _env_number(name, convert, default):
+    text = os.environ.get(name)
+    if not text:
+        return default
+    try:
+        return convert(text)
+    except ValueError:
+        print(f"Ignoring invalid {name}={text!r}, using {default}")
+        return default
+
+# Pool size and timeout to use: the ones given, else the environment, else the defaults
+def pool_settings(size=None, timeout=None):
+    if size is None:
+        size = _env_number(POOL_SIZE_ENV, int, POOL_SIZE)
+    if timeout is None:
+        timeout = _env_number(TIMEOUT_ENV, float, HTTP_TIMEOUT)
+    return size, timeout
+
+# Get the process-wide connection pool for a set of credentials with the given settings
+# (see pool_settings); asking for other settings gives a pool of its own
+def get_http_pool(creds, size=None, timeout=None):
+    size, timeout = pool_settings(size, timeout)
+    key = (id(creds), size, timeout)
+    with _pools_lock:
+        entry = _pools.get(key)
+        if entry is None or entry[0] is not creds:
+            entry = (creds, HttpPool(creds, size, timeout))
+            _pools[key] = entry
+        return entry[1]
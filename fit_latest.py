@@ -0,0 +1,45 @@
+from fit_store import points_from_response
+
+# First window asked for when looking for the latest value
+TAIL_WINDOW_MILLIS = 5 * 60 * 1000  # 5 minutes
+# Never look further back than this
+MAX_LOOKBACK_MILLIS = 24 * 3600 * 1000  # 1 day
+
+# Find the most recent point of a data source without scanning the whole day.
+#
+# `fetch(start_time, end_time)` requests a window (in milliseconds) and returns the response
+# (a dict, or its raw JSON bytes), or None on failure. A short tail window ending at `end_time` is asked
+# for first and doubled only while it comes back empty, down to `earliest_time`.
+# With a `store`, fetched points are written into it and the search stops at the last stored
+# point, which is returned when nothing newer exists.
+# Returns (start_time_nanos, value), or None when there is no data.
+def fetch_latest_value(fetch, end_time, earliest_time=None, store=None, data_source_id=None,
+                       tail_window=TAIL_WINDOW_MILLIS):
+    if earliest_time is None:
+        earliest_time = end_time - MAX_LOOKBACK_MILLIS
+
+    stored = store.last_value(data_source_id) if store is not None else None
+    if stored is not None:
+        earliest_time = max(earliest_time, stored[0] // 1000000)
+
+    window = tail_window
+    while True:
+        start_time = max(end_time - window, earliest_time)
+        response = fetch(start_time, end_time)
+        if response is None:
+            break
+
+        points = list(points_from_response(response))
+        if store is not None and points:
+            store.append(data_source_id, points)
+        if points:
+            start_nanos, _, value = max(points)
+            if stored is None or start_nanos >= stored[0]:
+                return start_nanos, value
+            break
+
+        if start_time <= earliest_time:
+            break
+        window *= 2
+
+    return stored
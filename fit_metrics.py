@@ -0,0 +1,180 @@
+import os
+import json
+import time
+import threading
+from bisect import bisect_left
+
+# Set to a file path to enable metrics and export them there (".json" files get
+# JSON, anything else the Prometheus text format)
+METRICS_FILE_ENV = 'FIT_METRICS_FILE'
+# Seconds between two exports
+EXPORT_INTERVAL = 15
+
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, float('inf'))
+
+_lock = threading.Lock()
+_enabled = False
+_stages = {}  # stage name -> [bucket counts, count, sum, errors]
+_counters = {}  # counter name -> value
+_exporter = None
+
+
+# Times one stage. Use it as a context manager, or call stop() for stages that
+# end in a callback; an exception leaving the `with` block counts as an error.
+class Span:
+    __slots__ = ('name', 'started')
+
+    def __init__(self, name):
+        self.name = name
+        self.started = time.perf_counter()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop(exc_type is not None)
+        return False
+
+    def stop(self, error=False):
+        observe(self.name, time.perf_counter() - self.started, error)
+
+# Stand-in for Span while metrics are disabled; one shared instance that does nothing
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+    def stop(self, error=False):
+        pass
+
+_NOOP_SPAN = _NoopSpan()
+
+# Start timing a stage
+def span(name):
+    return Span(name) if _enabled else _NOOP_SPAN
+
+# Record one finished stage
+def observe(name, seconds, error=False):
+    with _lock:
+        stage = _stages.get(name)
+        if stage is None:
+            stage = _stages[name] = [[0] * len(LATENCY_BUCKETS), 0, 0.0, 0]
+        stage[0][bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        stage[1] += 1
+        stage[2] += seconds
+        if error:
+            stage[3] += 1
+
+# Add to a counter (requests, bytes received, errors, ...)
+def count(name, value=1):
+    if not _enabled:
+        return
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + value
+
+def is_enabled():
+    return _enabled
+
+# Start recording. With a path, the metrics are also exported there every `interval` seconds.
+def enable(path=None, interval=EXPORT_INTERVAL):
+    global _enabled, _exporter
+    _enabled = True
+    if path and _exporter is None:
+        _exporter = MetricsExporter(path, interval)
+        _exporter.start()
+
+# Stop recording and write the last export
+def shutdown():
+    global _enabled, _exporter
+    _enabled = False
+    if _exporter is not None:
+        _exporter.stop()
+        _exporter = None
+
+# Copy of everything recorded so far
+def snapshot():
+    with _lock:
+        return {
+            'stages': {name: {
+                'count': stage[1],
+                'sum_seconds': stage[2],
+                'errors': stage[3],
+                'buckets': dict(zip(('+Inf' if bound == float('inf') else bound for bound in LATENCY_BUCKETS),
+                                    stage[0])),
+            } for name, stage in _stages.items()},
+            'counters': dict(_counters),
+        }
+
+def render_json(data=None):
+    data = data or snapshot()
+    return json.dumps(dict(data, timestamp=time.time()), indent=2)
+
+# Prometheus text exposition format
+def render_prometheus(data=None):
+    data = data or snapshot()
+    lines = [
+        '# HELP fit_stage_duration_seconds Time spent in each stage of a Google Fit update.',
+        '# TYPE fit_stage_duration_seconds histogram',
+    ]
+    for name, stage in sorted(data['stages'].items()):
+        cumulative = 0
+        for bound, bucket_count in stage['buckets'].items():
+            cumulative += bucket_count
+            lines.append(f'fit_stage_duration_seconds_bucket{{stage="{name}",le="{bound}"}} {cumulative}')
+        lines.append(f'fit_stage_duration_seconds_sum{{stage="{name}"}} {stage["sum_seconds"]}')
+        lines.append(f'fit_stage_duration_seconds_count{{stage="{name}"}} {stage["count"]}')
+    lines.append('# HELP fit_stage_errors_total Stages that ended with an error.')
+    lines.append('# TYPE fit_stage_errors_total counter')
+    for name, stage in sorted(data['stages'].items()):
+        lines.append(f'fit_stage_errors_total{{stage="{name}"}} {stage["errors"]}')
+    for name, value in sorted(data['counters'].items()):
+        lines.append(f'# TYPE fit_{name}_total counter')
+        lines.append(f'fit_{name}_total {value}')
+    return '\n'.join(lines) + '\n'
+
+
+# Writes the metrics to a file periodically (atomically, so scrapers never see half a file)
+class MetricsExporter:
+    def __init__(self, path, interval=EXPORT_INTERVAL):
+        self.path = path
+        self.interval = interval
+        self.render = render_json if path.endswith('.json') else render_prometheus
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def export(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            f.write(self.render())
+        os.replace(tmp_path, self.path)
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            try:
+                self.export()
+            except OSError as e:
+                print(f"Could not export metrics to {self.path}: {e}")
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='metrics-exporter', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+        try:
+            self.export()
+        except OSError as e:
+            print(f"Could not export metrics to {self.path}: {e}")
+
+if os.environ.get(METRICS_FILE_ENV):
+    enable(os.environ[METRICS_FILE_ENV])
@@ -0,0 +1,177 @@
+import time
+import random
+import socket
+import threading
+import httplib2
+from googleapiclient.errors import HttpError
+
+# Requests per second allowed by default, and how many may be sent in a burst
+DEFAULT_RATE = 5
+DEFAULT_BURST = 10
+# Retries per request, and the backoff delays in seconds
+DEFAULT_MAX_RETRIES = 5
+DEFAULT_BASE_DELAY = 0.5
+DEFAULT_MAX_DELAY = 32
+# Retries may add at most this fraction on top of the requests sent (plus a small reserve)
+DEFAULT_RETRY_RATIO = 0.2
+DEFAULT_RETRY_RESERVE = 10
+
+# Reasons Google returns with a 403 when the quota, not the permission, is the problem
+RATE_LIMIT_REASONS = (b'rateLimitExceeded', b'userRateLimitExceeded', b'quotaExceeded')
+
+
+# A failed Google Fit request. `retryable` tells whether sending it again may succeed.
+class FitApiError(Exception):
+    retryable = False
+
+    def __init__(self, message, status=None, retry_after=None, cause=None):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+        self.cause = cause
+
+# 400: the request itself is wrong
+class BadRequestError(FitApiError):
+    pass
+
+# 401: the credentials are missing or no longer valid
+class AuthError(FitApiError):
+    pass
+
+# 403: the data source is not accessible (e.g. sleep data that was never shared)
+class ForbiddenError(FitApiError):
+    pass
+
+# 404: the data source or dataset does not exist
+class NotFoundError(FitApiError):
+    pass
+
+# 429, or 403 with a quota reason: too many requests
+class RateLimitError(FitApiError):
+    retryable = True
+
+# 5xx: the server failed
+class ServerError(FitApiError):
+    retryable = True
+
+# The connection failed or timed out before a response arrived
+class TransientError(FitApiError):
+    retryable = True
+
+# Turn an exception raised while executing a request into a typed FitApiError
+def classify_error(error):
+    if isinstance(error, FitApiError):
+        return error
+
+    if isinstance(error, HttpError):
+        status = error.resp.status
+        content = error.content or b''
+        retry_after = error.resp.get('retry-after')
+        try:
+            retry_after = float(retry_after) if retry_after is not None else None
+        except ValueError:
+            retry_after = None
+
+        if status == 429 or (status == 403 and any(reason in content for reason in RATE_LIMIT_REASONS)):
+            error_class = RateLimitError
+        elif status == 400:
+            error_class = BadRequestError
+        elif status == 401:
+            error_class = AuthError
+        elif status == 403:
+            error_class = ForbiddenError
+        elif status == 404:
+            error_class = NotFoundError
+        elif status >= 500:
+            error_class = ServerError
+        else:
+            error_class = FitApiError
+        return error_class(f"HTTP {status}: {error.reason}", status=status, retry_after=retry_after, cause=error)
+
+    if isinstance(error, (socket.timeout, TimeoutError, ConnectionError, httplib2.HttpLib2Error)):
+        return TransientError(f"Connection error: {error}", cause=error)
+
+    return FitApiError(str(error), cause=error)
+
+
+# Token bucket: allows `rate` acquisitions per second on average, up to `burst` at once
+class TokenBucket:
+    def __init__(self, rate=DEFAULT_RATE, burst=DEFAULT_BURST):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    # Wait until a token is available and take it
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+# Sends Google Fit requests through a token bucket, classifies failures and retries
+# the retryable ones with jittered exponential backoff. A retry budget shared by
+# all requests stops retries from multiplying the load while the API is struggling.
+class RequestScheduler:
+    def __init__(self, rate=DEFAULT_RATE, burst=DEFAULT_BURST, max_retries=DEFAULT_MAX_RETRIES,
+                 base_delay=DEFAULT_BASE_DELAY, max_delay=DEFAULT_MAX_DELAY,
+                 retry_ratio=DEFAULT_RETRY_RATIO, retry_reserve=DEFAULT_RETRY_RESERVE):
+        self.bucket = TokenBucket(rate, burst)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retry_ratio = retry_ratio
+        self.retry_reserve = retry_reserve
+        self._retry_budget = float(retry_reserve)
+        self._lock = threading.Lock()
+
+    # Execute a googleapiclient request; raises a FitApiError subclass when it finally fails
+    def execute(self, request):
+        return self.call(request.execute)
+
+    # Call `function()` under the rate limit, retrying retryable failures
+    def call(self, function):
+        with self._lock:
+            self._retry_budget = min(self._retry_budget + self.retry_ratio,
+                                     self.retry_reserve + self.retry_ratio * 100)
+        attempt = 0
+        while True:
+            self.bucket.acquire()
+            try:
+                return function()
+            except Exception as e:
+                error = classify_error(e)
+                if not error.retryable or attempt >= self.max_retries or not self._take_retry():
+                    raise error from e
+
+            attempt += 1
+            time.sleep(self.backoff_delay(attempt, error.retry_after))
+
+    # Full-jitter exponential backoff, or the server's Retry-After when it gives one
+    def backoff_delay(self, attempt, retry_after=None):
+        if retry_after is not None:
+            return min(retry_after, self.max_delay)
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def _take_retry(self):
+        with self._lock:
+            if self._retry_budget < 1:
+                return False
+            self._retry_budget -= 1
+            return True
+
+
+# Scheduler shared by every Google Fit request of the process
+default_scheduler = RequestScheduler()
+
+# Execute a googleapiclient request through the shared scheduler
+def execute_request(request):
+    return default_scheduler.execute(request)
@@ -0,0 +1,122 @@
+import os
+import json
+import time
+import threading
+import httplib2
+from urllib.parse import urljoin
+from googleapiclient.discovery import build_from_document
+from googleapiclient.discovery_cache import get_static_doc
+from googleapiclient.version import __version__ as CLIENT_VERSION
+from fit_http import get_http_pool, pool_settings
+
+API_NAME = 'fitness'
+API_VERSION = 'v1'
+DISCOVERY_URL = f"https://{API_NAME}.googleapis.com/$discovery/rest?version={API_VERSION}"
+
+# Local copy of the discovery document, refreshed once it is older than this
+DISCOVERY_CACHE_FILE = os.path.join('fit_cache', f"{API_NAME}_{API_VERSION}_discovery.json")
+DISCOVERY_MAX_AGE = 7 * 24 * 3600  # 1 week in seconds
+
+# Set to a base URL (e.g. http://127.0.0.1:8765/ from fake_fit_server.py) to send
+# every request there instead of to Google
+ENDPOINT_ENV = 'FIT_API_ENDPOINT'
+
+_lock = threading.Lock()
+_discovery_document = None
+_services = {}  # (endpoint, credentials key) -> service
+
+# Load the cached discovery document, or None if it is missing or was written for another API or client version
+def load_cached_discovery(path=DISCOVERY_CACHE_FILE):
+    try:
+        with open(path) as f:
+            cached = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    document = cached.get('document') or {}
+    if (document.get('name') != API_NAME or document.get('version') != API_VERSION
+            or cached.get('client_version') != CLIENT_VERSION):
+        return None
+    return cached
+
+# Write the discovery document to the cache file atomically
+def save_cached_discovery(document, path=DISCOVERY_CACHE_FILE):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump({
+            'client_version': CLIENT_VERSION,
+            'fetched_at': time.time(),
+            'document': document,
+        }, f)
+    os.replace(tmp_path, path)
+
+# Download the discovery document
+def download_discovery(url=DISCOVERY_URL, timeout=30):
+    resp, content = httplib2.Http(timeout=timeout).request(url)
+    if resp.status != 200:
+        raise RuntimeError(f"Discovery request failed with HTTP {resp.status}")
+    return json.loads(content)
+
+# Get the discovery document from memory, the cache file, or the network (in that order).
+# A stale cached copy, or else the copy bundled with googleapiclient, is used when the
+# network is unavailable; with `download=False` the network is not tried at all.
+def get_discovery_document(download=True):
+    global _discovery_document
+    if _discovery_document is not None:
+        return _discovery_document
+
+    cached = load_cached_discovery()
+    if cached and time.time() - cached.get('fetched_at', 0) < DISCOVERY_MAX_AGE:
+        _discovery_document = cached['document']
+        return _discovery_document
+
+    try:
+        if not download:
+            raise RuntimeError("Discovery download disabled")
+        document = download_discovery()
+        save_cached_discovery(document)
+    except Exception as e:
+        if cached:
+            print(f"Using cached discovery document, could not refresh it: {e}")
+            document = cached['document']
+        else:
+            static = get_static_doc(API_NAME, API_VERSION)
+            if static is None:
+                raise
+            document = json.loads(static)
+
+    _discovery_document = document
+    return _discovery_document
+
+# Services are shared per user: credentials loaded again from the same token map to the same key
+def _credentials_key(creds):
+    refresh_token = getattr(creds, 'refresh_token', None)
+    if refresh_token:
+        return (getattr(creds, 'client_id', None), refresh_token)
+    return id(creds)
+
+# Get the process-wide Fitness service for a set of credentials, building it on first use.
+# `endpoint` (default: the FIT_API_ENDPOINT environment variable) sends the requests to
+# another server, such as fake_fit_server.py; credentials may then be None.
+# `pool_size` and `timeout` set up its connection pool (default: the FIT_HTTP_POOL_SIZE and
+# FIT_HTTP_TIMEOUT environment variables, else fit_http.POOL_SIZE and HTTP_TIMEOUT).
+def get_fitness_service(creds, endpoint=None, pool_size=None, timeout=None):
+    endpoint = endpoint or os.environ.get(ENDPOINT_ENV)
+    pool_size, timeout = pool_settings(pool_size, timeout)
+    key = (endpoint, _credentials_key(creds), pool_size, timeout)
+    with _lock:
+        service = _services.get(key)
+        if service is None:
+            # All requests of the service go through the shared pool of keep-alive connections
+            http = get_http_pool(creds, pool_size, timeout)
+            if endpoint:
+                document = get_discovery_document(download=False)
+                service = build_from_document(document, http=http,
+                                              client_options={'api_endpoint': urljoin(endpoint, document['servicePath'])})
+            else:
+                service = build_from_document(get_discovery_document(), http=http)
+            _services[key] = service
+        return service
@@ -0,0 +1,204 @@
+import os
+import re
+import hashlib
+from array import array
+from fit_stream import iter_buckets
+
+# Directory that holds the local time-series store
+STORE_DIR = 'fit_data'
+
+NANOS_PER_DAY = 86400 * 1000000000
+
+# Column name, array typecode and file suffix for each column of a day chunk
+COLUMNS = (
+    ('start', 'q', '.start'),   # int64 startTimeNanos
+    ('end', 'q', '.end'),       # int64 endTimeNanos
+    ('value', 'd', '.value'),   # float64 point value
+)
+
+# Turn a Google Fit data source ID into a safe directory name
+def source_dir_name(data_source_id):
+    readable = re.sub(r'[^A-Za-z0-9._-]+', '_', data_source_id).strip('_')
+    digest = hashlib.sha1(data_source_id.encode('utf-8')).hexdigest()[:8]
+    return f"{readable}-{digest}"
+
+# Read the numeric value of a Google Fit data point: its first value, which for a heart
+# rate summary is the average (followed by the max and min)
+def point_value(point):
+    for value in point.get('value', []):
+        if value.get('fpVal') is not None:
+            return float(value['fpVal'])
+        if value.get('intVal') is not None:
+            return float(value['intVal'])
+    return 0.0
+
+# Turn an aggregate response (or a datasets().get response) into (start_ns, end_ns, value) rows.
+# The raw JSON bytes of an aggregate response (see fit_stream.raw_request) are parsed
+# as a stream, one bucket at a time.
+def points_from_response(response):
+    if not response:
+        return
+    if isinstance(response, (bytes, bytearray)):
+        buckets = iter_buckets(response)
+    else:
+        for point in response.get('point', []):
+            yield int(point['startTimeNanos']), int(point['endTimeNanos']), point_value(point)
+        buckets = response.get('bucket', [])
+    for bucket in buckets:
+        for dataset in bucket.get('dataset', []):
+            for point in dataset.get('point', []):
+                yield int(point['startTimeNanos']), int(point['endTimeNanos']), point_value(point)
+
+
+# Append-only columnar store of Google Fit points, chunked by UTC day.
+#
+# Each data source gets its own directory, and each day a set of column files
+# (int64 start, int64 end, float64 value) that rows are only ever appended to.
+# When the same start timestamp is written twice, the most recent row wins.
+class FitStore:
+    def __init__(self, root=STORE_DIR):
+        self.root = root
+        self._chunks = {}  # (source dir, day) -> (start column size, columns) loaded from disk
+
+    def _source_path(self, data_source_id):
+        return os.path.join(self.root, source_dir_name(data_source_id))
+
+    def _chunk_path(self, data_source_id, day):
+        return os.path.join(self._source_path(data_source_id), str(day))
+
+    def _load_chunk(self, data_source_id, day):
+        key = (source_dir_name(data_source_id), day)
+        base = self._chunk_path(data_source_id, day)
+        try:
+            size = os.path.getsize(base + COLUMNS[0][2])
+        except OSError:
+            size = 0
+
+        # Reuse the loaded chunk unless another writer has appended to it since
+        cached = self._chunks.get(key)
+        if cached is not None and cached[0] == size:
+            return cached[1]
+
+        columns = []
+        for _, typecode, suffix in COLUMNS:
+            column = array(typecode)
+            path = base + suffix
+            if os.path.exists(path):
+                with open(path, 'rb') as f:
+                    column.frombytes(f.read())
+            columns.append(column)
+
+        # A crash between column writes can leave one column longer than the others
+        rows = min(len(column) for column in columns)
+        for column in columns:
+            del column[rows:]
+
+        self._chunks[key] = (size, columns)
+        return columns
+
+    # Append points for a data source; rows identical to the last stored one for their timestamp are skipped
+    def append(self, data_source_id, points):
+        by_day = {}
+        for start_ns, end_ns, value in points:
+            by_day.setdefault(start_ns // NANOS_PER_DAY, []).append((start_ns, end_ns, value))
+
+        written = 0
+        for day, rows in by_day.items():
+            starts, ends, values = self._load_chunk(data_source_id, day)
+            latest = {starts[i]: (ends[i], values[i]) for i in range(len(starts))}
+            new_rows = []
+            for start_ns, end_ns, value in rows:
+                if latest.get(start_ns) != (end_ns, value):
+                    latest[start_ns] = (end_ns, value)
+                    new_rows.append((start_ns, end_ns, value))
+            if not new_rows:
+                continue
+
+            os.makedirs(self._source_path(data_source_id), exist_ok=True)
+            base = self._chunk_path(data_source_id, day)
+            for index, (_, typecode, suffix) in enumerate(COLUMNS):
+                column = array(typecode, (row[index] for row in new_rows))
+                with open(base + suffix, 'ab') as f:
+                    column.tofile(f)
+                (starts, ends, values)[index].extend(column)
+            key = (source_dir_name(data_source_id), day)
+            self._chunks[key] = (os.path.getsize(base + COLUMNS[0][2]), [starts, ends, values])
+            written += len(new_rows)
+
+        return written
+
+    # Cut the stored points of a source that run past `cut_ns` (started before it and end
+    # after it) off at `cut_ns`. Used before storing a response clipped to a window that
+    # starts at `cut_ns`, which holds the rest of such a point as a point of its own.
+    def truncate_at(self, data_source_id, cut_ns):
+        cut_day = cut_ns // NANOS_PER_DAY
+        truncated = []
+        for day in (cut_day - 1, cut_day):  # Points are at most a day long
+            starts, ends, values = self._load_chunk(data_source_id, day)
+            latest = {starts[i]: (ends[i], values[i]) for i in range(len(starts))}
+            for start_ns, (end_ns, value) in latest.items():
+                if start_ns < cut_ns < end_ns:
+                    truncated.append((start_ns, cut_ns, value))
+        return self.append(data_source_id, truncated)
+
+    # List the days (as days since the epoch) that have data for a source
+    def days(self, data_source_id):
+        path = self._source_path(data_source_id)
+        if not os.path.isdir(path):
+            return []
+        suffix = COLUMNS[0][2]
+        return sorted(int(name[:-len(suffix)]) for name in os.listdir(path) if name.endswith(suffix))
+
+    # The loaded (starts, ends, values) columns of every stored day of a source that may hold
+    # points overlapping [start_ns, end_ns), oldest day first. The columns are not copied:
+    # read them before anything is appended to the store again.
+    def day_columns(self, data_source_id, start_ns, end_ns):
+        first_day = start_ns // NANOS_PER_DAY - 1  # a segment may start the day before the window
+        last_day = (end_ns - 1) // NANOS_PER_DAY
+        return [self._load_chunk(data_source_id, day) for day in self.days(data_source_id)
+                if first_day <= day <= last_day]
+
+    # Read the points of a source that overlap [start_ns, end_ns), sorted by start time
+    def read(self, data_source_id, start_ns, end_ns):
+        # The newest row for every start time first, then the window test: an older row
+        # (e.g. one that truncate_at cut short since) must not win just because it overlaps
+        latest = {}
+        for starts, ends, values in self.day_columns(data_source_id, start_ns, end_ns):
+            for i in range(len(starts)):
+                latest[starts[i]] = (ends[i], values[i])
+
+        out_starts, out_ends, out_values = array('q'), array('q'), array('d')
+        for start in sorted(latest):
+            end, value = latest[start]
+            if start >= end_ns or end < start_ns:
+                continue
+            out_starts.append(start)
+            out_ends.append(end)
+            out_values.append(value)
+        return out_starts, out_ends, out_values
+
+    # Average point value of a source over a window, or None when there is no data.
+    # Every point is weighted by the part of the window it covers, so a heart rate summary
+    # of a long bucket counts for more than one of a short bucket; points without a
+    # duration (raw samples) are averaged as they are.
+    def average(self, data_source_id, start_ns, end_ns):
+        from aggregation import store_to_arrays, window_average  # Imports NumPy
+        return window_average(*store_to_arrays(self, data_source_id, start_ns, end_ns), start_ns, end_ns)
+
+    # Total duration in hours covered by the segments of a source over a window
+    # (segments that run over the edges of the window only count inside it)
+    def total_duration_hours(self, data_source_id, start_ns, end_ns):
+        from aggregation import store_to_arrays, window_duration_hours  # Imports NumPy
+        starts, ends, _ = store_to_arrays(self, data_source_id, start_ns, end_ns)
+        return window_duration_hours(starts, ends, start_ns, end_ns)
+
+    # Most recent (start_ns, value) stored for a source, or None when there is no data
+    def last_value(self, data_source_id):
+        for day in reversed(self.days(data_source_id)):
+            starts, _, values = self._load_chunk(data_source_id, day)
+            if not starts:
+                continue
+            latest = {starts[i]: values[i] for i in range(len(starts))}
+            start = max(latest)
+            return start, latest[start]
+        return None
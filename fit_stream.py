@@ -0,0 +1,59 @@
+import re
+import json
+import codecs
+from datetime import datetime, timezone
+
+# Start of the top-level bucket list of an aggregate response (no other key is named "bucket")
+_BUCKETS = re.compile(r'"bucket"\s*:\s*\[')
+# What may come between two buckets
+_SEPARATOR = re.compile(r'[\s,]*')
+# Characters kept while looking for the bucket list, so its key is found when split across chunks
+_KEY_TAIL = 16
+
+_decoder = json.JSONDecoder()
+
+# Make the raw JSON bytes of a googleapiclient request come back from execute(), instead of parsed dicts.
+# Used where the bytes are parsed as a stream, or passed on as they are (e.g. to a worker process).
+def raw_request(request):
+    request.postproc = lambda resp, content: content
+    return request
+
+# Yield the buckets of an aggregate response one at a time, as dicts, from its raw JSON bytes
+# (whole, or an iterable of byte chunks). Every bucket is decoded by the C JSON scanner and
+# dropped once the caller moves on, so only one bucket is ever held as Python objects.
+def iter_buckets(data):
+    chunks = (data,) if isinstance(data, (bytes, bytearray, str)) else data
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    buffer = ''
+    pos = None  # Position of the next bucket in `buffer`, once the bucket list was found
+
+    for chunk in chunks:
+        buffer += chunk if isinstance(chunk, str) else decoder.decode(chunk)
+        if pos is None:
+            match = _BUCKETS.search(buffer)
+            if match is None:
+                buffer = buffer[-_KEY_TAIL:]
+                continue
+            pos = match.end()
+
+        while True:
+            pos = _SEPARATOR.match(buffer, pos).end()
+            if pos == len(buffer):
+                break
+            if buffer[pos] == ']':
+                return
+            try:
+                bucket, end = _decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                break  # The bucket continues in the next chunk
+            yield bucket
+            pos = end
+        buffer = buffer[pos:]
+        pos = 0
+
+    if pos is not None:
+        raise ValueError("Aggregate response ended inside its bucket list")
+
+# Format a nanosecond timestamp as UTC 'YYYY-MM-DD HH:MM:SS'; only called for values that are displayed
+def format_nanos(time_nanos):
+    return datetime.fromtimestamp(time_nanos / 1e9, timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
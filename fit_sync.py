@@ -0,0 +1,167 @@
+import os
+import json
+from fit_store import STORE_DIR, points_from_response
+from fit_fetch import DEFAULT_FETCH_TIMEOUT, fetch_concurrently
+from fit_aggregate import SYNC_BUCKET_MILLIS, PointCollector, parse_aggregate_response
+from fit_metrics import span
+from response_cache import CACHED_AT_FIELD
+
+# File that records the last synced endTimeNanos for every data source
+SYNC_STATE_FILE = os.path.join(STORE_DIR, 'sync_state.json')
+
+# Re-request this much before the high-water mark to catch late-arriving points
+SYNC_OVERLAP_MILLIS = 10 * 60 * 1000  # 10 minutes
+
+# Data source IDs that were answered with 403 (e.g. sleep data that was never shared).
+# The fetch functions add to it; sync_all leaves these out of combined requests.
+forbidden_sources = set()
+
+
+# High-water marks (last synced endTimeNanos) per data source, persisted as JSON
+class SyncState:
+    def __init__(self, path=SYNC_STATE_FILE):
+        self.path = path
+        self.synced_nanos = {}
+        if os.path.exists(path):
+            try:
+                with open(path) as f:
+                    self.synced_nanos = {source: int(nanos) for source, nanos in json.load(f).items()}
+            except (OSError, ValueError) as e:
+                print(f"Ignoring unreadable sync state {path}: {e}")
+
+    def get(self, data_source_id):
+        return self.synced_nanos.get(data_source_id)
+
+    # Move the high-water mark of a source forward (never backwards)
+    def advance(self, data_source_id, end_time_nanos):
+        current = self.synced_nanos.get(data_source_id)
+        if current is None or end_time_nanos > current:
+            self.synced_nanos[data_source_id] = end_time_nanos
+
+    def save(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({source: str(nanos) for source, nanos in self.synced_nanos.items()}, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+# Work out the window (in milliseconds) to request for a source: only the delta since the last sync.
+# The window starts on a `bucket_millis` boundary, so its buckets line up with the stored ones.
+def delta_window(state, data_source_id, start_time, end_time, overlap_millis=SYNC_OVERLAP_MILLIS,
+                 bucket_millis=SYNC_BUCKET_MILLIS):
+    synced_nanos = state.get(data_source_id)
+    if synced_nanos is not None:
+        start_time = max(start_time, synced_nanos // 1000000 - overlap_millis)
+    start_time = min(start_time, end_time) // bucket_millis * bucket_millis
+    return start_time, end_time
+
+# The time (in milliseconds) up to which a response for a window ending at `request_end` has the
+# data: a response served from the response cache only has what had arrived when it was fetched
+def covered_until(response, request_end):
+    cached_at = response.get(CACHED_AT_FIELD) if isinstance(response, dict) else None
+    return min(request_end, cached_at) if cached_at else request_end
+
+# Store the points of a source fetched for a window starting at `request_start` and advance its
+# high-water mark up to `covered_end` (see covered_until). The response is clipped to the window,
+# so a stored segment that runs into it is cut off where the window starts; the rest of it comes
+# back in the response.
+def record_sync(store, state, data_source_id, request_start, covered_end, points):
+    with span('store_write'):
+        store.truncate_at(data_source_id, request_start * 1000000)
+        store.append(data_source_id, points)
+
+    # With no points the whole requested window counts as synced; a bucket summary can end
+    # after the window, but the mark never moves past what the response covers
+    covered_nanos = covered_end * 1000000
+    synced_nanos = min(max((end_nanos for _, end_nanos, _ in points), default=covered_nanos), covered_nanos)
+    state.advance(data_source_id, synced_nanos)
+
+# Fetch only the new data of a source into the store and advance its high-water mark.
+#
+# `fetch(start_time, end_time)` performs the actual request and returns the response,
+# or None on failure, in which case the high-water mark is left where it was.
+def sync_source(store, state, data_source_id, start_time, end_time, fetch, bucket_millis=SYNC_BUCKET_MILLIS):
+    request_start, request_end = delta_window(state, data_source_id, start_time, end_time,
+                                              bucket_millis=bucket_millis)
+    response = fetch(request_start, request_end)
+    if response is None:
+        return None
+
+    with span('parse'):
+        points = list(points_from_response(response))
+    record_sync(store, state, data_source_id, request_start, covered_until(response, request_end), points)
+    state.save()
+    return response
+
+# Sync several sources at once. `fetches` maps each data source ID to its
+# `fetch(start_time, end_time)`; `timeouts` optionally maps it to a timeout in seconds.
+# Returns the response of every source (None for the ones that failed or timed out).
+def sync_sources(store, state, fetches, start_time, end_time, timeouts=None, bucket_millis=SYNC_BUCKET_MILLIS):
+    windows = {source: delta_window(state, source, start_time, end_time, bucket_millis=bucket_millis)
+               for source in fetches}
+    responses = fetch_concurrently(
+        {source: (lambda fetch=fetch, window=windows[source]: fetch(*window)) for source, fetch in fetches.items()},
+        timeouts=timeouts,
+    )
+
+    for source, response in responses.items():
+        if response is not None:
+            with span('parse'):
+                points = list(points_from_response(response))
+            request_start, request_end = windows[source]
+            record_sync(store, state, source, request_start, covered_until(response, request_end), points)
+    state.save()
+    return responses
+
+# Sync several sources with a single combined aggregate request.
+# `sources` is a list of (data_source_id, data_type) pairs and `fetch(start_time, end_time)`
+# requests all of them at once (see fit_aggregate.build_aggregate_body). The window starts
+# at the earliest delta of all sources. Returns the response, or None if the request failed
+# or did not finish within `timeout` seconds (when given).
+def sync_combined(store, state, sources, start_time, end_time, fetch, bucket_millis=SYNC_BUCKET_MILLIS,
+                  timeout=None):
+    windows = [delta_window(state, source, start_time, end_time, bucket_millis=bucket_millis)
+               for source, _ in sources]
+    request_start = min(window[0] for window in windows)
+    if timeout is None:
+        response = fetch(request_start, end_time)
+    else:
+        # A request that times out is left to finish on its own; nothing of it is stored
+        response = fetch_concurrently({'combined request': lambda: fetch(request_start, end_time)},
+                                      default_timeout=timeout)['combined request']
+    if response is None:
+        return None
+
+    # One pass over the response routes every dataset to its source
+    with span('parse'):
+        collectors = parse_aggregate_response(response, [PointCollector() for _ in sources])
+    for (source, _), collector in zip(sources, collectors):
+        record_sync(store, state, source, request_start, covered_until(response, end_time), collector.result())
+    state.save()
+    return response
+
+# Sync several sources with as few requests as possible: one combined request, and when that
+# fails or takes longer than `combined_timeout` seconds, every source on its own, all at once,
+# each with its own timeout (see sync_sources). Sources that were forbidden before are not
+# requested again. `fetch_combined(start_time, end_time, sources)` and `fetch_one(start_time,
+# end_time, data_source_id, data_type)` request the data.
+# Returns the response of every source (None for the ones that failed or are forbidden).
+def sync_all(store, state, sources, start_time, end_time, fetch_combined, fetch_one, timeouts=None,
+             combined_timeout=DEFAULT_FETCH_TIMEOUT, bucket_millis=SYNC_BUCKET_MILLIS):
+    readable = [(source, data_type) for source, data_type in sources if source not in forbidden_sources]
+    responses = {source: None for source, _ in sources}
+    if len(readable) > 1:
+        response = sync_combined(store, state, readable, start_time, end_time,
+                                 lambda start, end: fetch_combined(start, end, readable),
+                                 bucket_millis=bucket_millis, timeout=combined_timeout)
+        if response is not None:
+            responses.update((source, response) for source, _ in readable)
+            return responses
+
+    responses.update(sync_sources(store, state, {
+        source: (lambda start, end, source=source, data_type=data_type: fetch_one(start, end, source, data_type))
+        for source, data_type in readable
+    }, start_time, end_time, timeouts=timeouts, bucket_millis=bucket_millis))
+    return responses
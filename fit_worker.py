@@ -0,0 +1,85 @@
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# How often the Tk thread checks for results handed back by the worker
+POLL_MILLIS = 50
+
+
+# Raised inside a job when it has been cancelled
+class FetchCancelled(Exception):
+    pass
+
+
+# Runs Google Fit fetch jobs off the Tk thread and hands their progress and
+# results back to the Tk thread through `app.after`, so the window stays interactive.
+#
+# A job is called as `job(report)`. It calls `report("message")` between stages,
+# which shows progress and raises FetchCancelled once the job has been cancelled.
+class BackgroundFetcher:
+    def __init__(self, app):
+        self.app = app
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='fit-fetch')
+        self._events = queue.Queue()
+        self._cancel_event = None
+        self._pending = 0  # Jobs whose final event has not been handled yet (Tk thread only)
+
+    @property
+    def busy(self):
+        return self._pending > 0
+
+    # Start a job, cancelling the one still running if any
+    def submit(self, job, on_done, on_progress=None, on_error=None):
+        self.cancel()
+        cancel_event = threading.Event()
+        self._cancel_event = cancel_event
+
+        def report(message):
+            if cancel_event.is_set():
+                raise FetchCancelled()
+            if on_progress:
+                self._events.put((cancel_event, on_progress, message))
+
+        def run():
+            try:
+                result = job(report)
+            except FetchCancelled:
+                self._events.put((cancel_event, None, None))
+            except Exception as e:
+                self._events.put((cancel_event, on_error, e))
+            else:
+                self._events.put((cancel_event, on_done, result))
+            self._events.put((None, self._job_finished, None))
+
+        self._pending += 1
+        if self._pending == 1:
+            self.app.after(POLL_MILLIS, self._poll)
+        self._executor.submit(run)
+
+    # Ask the running job to stop at its next progress report; its result is dropped
+    def cancel(self):
+        if self._cancel_event is not None:
+            self._cancel_event.set()
+
+    def shutdown(self):
+        self.cancel()
+        self._executor.shutdown(wait=False)
+
+    def _job_finished(self, _):
+        self._pending -= 1
+
+    # Deliver queued events on the Tk thread
+    def _poll(self):
+        while True:
+            try:
+                cancel_event, callback, value = self._events.get_nowait()
+            except queue.Empty:
+                break
+            if callback is None:
+                continue
+            if cancel_event is not None and cancel_event.is_set():
+                continue
+            callback(value)
+
+        if self._pending > 0:
+            self.app.after(POLL_MILLIS, self._poll)
@@ -1,40 +1,36 @@
-import os
-import json
+from startup_report import StartupTimer
+startup = StartupTimer()  # Created before the other imports so they are timed too
+
 import tkinter as tk
 from tkinter import messagebox
-from PIL import Image, ImageTk
 from datetime import datetime, timezone
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from google.auth.transport.requests import Request
-from googleapiclient.discovery import build
+from logo_cache import load_logo
+from fit_store import FitStore
+from fit_aggregate import build_aggregate_body
+from fit_latest import fetch_latest_value
+from fit_worker import BackgroundFetcher
+from scoring import assess_mental_health, provide_recommendation
+startup.mark('imports')
 
 # Set the required Google Fit API scopes
 SCOPES = ['https://www.googleapis.com/auth/fitness.heart_rate.read']
 
-# Authenticate with Google Fit API
+# Authenticate with Google Fit API. The token is loaded once, kept in memory
+# and refreshed in the background before it expires.
+# The Google API client and auth libraries take a while to import, so they are
+# imported on first use (on the fetch worker) instead of before the window appears.
 def authenticate_google_fit():
-    creds = None
-    if os.path.exists('token.json'):
-        creds = Credentials.from_authorized_user_file('token.json', SCOPES)
-    
-    if not creds or not creds.valid:
-        if creds and creds.expired and creds.refresh_token:
-            creds.refresh(Request())
-        else:
-            flow = InstalledAppFlow.from_client_secrets_file('credentials.json', SCOPES)
-            creds = flow.run_local_server(port=0)
-        
-        # Save the credentials for the next run
-        with open('token.json', 'w') as token:
-            token.write(creds.to_json())
-
-    return creds
+    from fit_auth import get_credential_manager
+    return get_credential_manager(SCOPES).get_credentials()
 
 # Fetch the last recorded heart rate data from Google Fit API
 def fetch_last_heart_rate_data():
+    from fit_service import get_fitness_service
+    from fit_scheduler import execute_request
+    from fit_stream import raw_request
+
     creds = authenticate_google_fit()
-    service = build('fitness', 'v1', credentials=creds)
+    service = get_fitness_service(creds)
 
     now = datetime.now(timezone.utc)
     start_of_today = datetime.combine(now.date(), datetime.min.time()).replace(tzinfo=timezone.utc)
@@ -43,63 +39,24 @@ def fetch_last_heart_rate_data():
 
     data_source_id = "derived:com.google.heart_rate.bpm:com.google.android.gms:merge_heart_rate_bpm"
 
-    body = {
-        "aggregateBy": [
-            {
-                "dataTypeName": "com.google.heart_rate.bpm",
-                "dataSourceId": data_source_id
-            }
-        ],
-        "bucketByTime": { "durationMillis": 60000 },
-        "startTimeMillis": start_time,
-        "endTimeMillis": end_time
-    }
-    
-    try:
-        response = service.users().dataset().aggregate(userId="me", body=body).execute()
-        last_heart_rate = None
-        for bucket in response.get('bucket', []):
-            for dataset in bucket.get('dataset', []):
-                for point in dataset.get('point', []):
-                    for value in point.get('value', []):
-                        last_heart_rate = value.get('fpVal')
-        return last_heart_rate
-    except Exception as e:
-        print(f"Error fetching heart rate data: {e}")
-        return None
-
-# Function to assess mental health based on input values
-def assess_mental_health(heart_rate_var, sleep_hours, noise_level, light_level):
-    stress_score = 0
-
-    # Physiological Factors
-    if heart_rate_var < 50 or heart_rate_var > 95:
-        stress_score += 1
-
-    if sleep_hours < 6 or sleep_hours > 15:
-        stress_score += 1
-
-    # Environmental Factors
-    if noise_level > 70:
-        stress_score += 1
-
-    if light_level < 30 or light_level > 200:
-        stress_score += 1
-
-    return stress_score
-
-# Function to provide recommendations based on stress score
-def provide_recommendation(stress_score):
-    if stress_score == 0:
-        return "You are doing well! Keep up your current routine."
-    elif stress_score == 1:
-        return "Slight stress detected. Try to relax and take breaks."
-    elif stress_score == 2:
-        return "Moderate stress detected. Ensure you have enough sleep and reduce exposure to noise."
-    elif stress_score == 3:
-        return "High stress detected. Consider reducing environmental stressors and practice mindfulness."
-    else:
-        return "Critical stress levels detected! Please reach out to a mental health professional."
+    # Ask for a short tail window first and widen it only while it is empty,
+    # never going back past the last point already in the local store
+    def fetch(start, end):
+        body = build_aggregate_body([(data_source_id, "com.google.heart_rate.bpm")], start, end, bucket_millis=60000)
+        try:
+            # Keep the raw JSON bytes; the minute buckets are parsed as a stream instead of into nested dicts
+            return execute_request(raw_request(service.users().dataset().aggregate(userId="me", body=body)))
+        except Exception as e:
+            print(f"Error fetching heart rate data: {e}")
+            return None
+
+    latest = fetch_latest_value(fetch, end_time, earliest_time=start_time, store=store, data_source_id=data_source_id)
+    if latest is None or latest[0] < start_time * 1000000:
+        return None  # Nothing recorded today
+    return latest[1]
+
+# Local time-series store that fetched points are written into
+store = FitStore()
 
 # Function to collect sensor data from user input and assess mental health
 def on_submit():
@@ -126,12 +83,23 @@ def on_submit():
     except ValueError:
         messagebox.showerror("Input Error", "Please enter valid numeric values.")
 
-# Function to auto-fill heart rate value from Google Fit API
+# Function to auto-fill heart rate value from Google Fit API.
+# The fetch runs on the background worker so the window stays responsive.
 def auto_fill_heart_rate():
-    last_heart_rate = fetch_last_heart_rate_data()
-    if last_heart_rate:
-        hrv_entry.delete(0, tk.END)  # Clear the entry field first
-        hrv_entry.insert(0, str(int(last_heart_rate)))  # Insert the fetched heart rate value
+    def on_done(last_heart_rate):
+        if last_heart_rate:
+            hrv_entry.delete(0, tk.END)  # Clear the entry field first
+            hrv_entry.insert(0, str(int(last_heart_rate)))  # Insert the fetched heart rate value
+
+    def on_error(e):
+        print(f"Error fetching heart rate data: {e}")
+
+    fetcher.submit(lambda report: fetch_last_heart_rate_data(), on_done, on_error=on_error)
+
+# Stop the background worker when the window is closed
+def on_close():
+    fetcher.shutdown()
+    app.destroy()
 
 # Create the main application window
 app = tk.Tk()
@@ -140,9 +108,7 @@ app.configure(bg='#e6f2ff')
 
 # Load and display logo (ensure you have an image file 'logo.png' in the same directory)
 try:
-    logo_image = Image.open("logo.jpeg")
-    logo_image = logo_image.resize((400, 200))
-    logo_photo = ImageTk.PhotoImage(logo_image)
+    logo_photo = load_logo("logo.jpeg", (400, 200), master=app)
     logo_label = tk.Label(app, image=logo_photo, bg='#e6f2ff')
     logo_label.grid(row=0, column=0, columnspan=2, pady=20)
 except Exception as e:
@@ -183,8 +149,18 @@ result_label.grid(row=6, columnspan=2, pady=10)
 recommendation_var = tk.StringVar()
 tk.Label(app, textvariable=recommendation_var, bg='#e6f2ff', fg='#FF5733', font=('Arial', 12, 'italic')).grid(row=7, columnspan=2, pady=10)
 
-# Automatically fill heart rate when app starts
-auto_fill_heart_rate()
+# Background worker that keeps Google Fit requests off the Tk thread
+fetcher = BackgroundFetcher(app)
+app.protocol("WM_DELETE_WINDOW", on_close)
+startup.mark('window_built')
+
+# Once the window is on screen, report the startup time and automatically fill the heart rate
+def on_first_paint():
+    startup.mark('first_paint')
+    startup.report()
+    auto_fill_heart_rate()
+
+startup.after_first_paint(app, on_first_paint)
 
 # Start the main event loop
 app.mainloop()
@@ -1,9 +1,11 @@
-import os
+import sys
 from datetime import datetime, timedelta, timezone
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from google.auth.transport.requests import Request
-from googleapiclient.discovery import build
+from fit_store import FitStore
+from fit_sync import SyncState, forbidden_sources, sync_all
+from fit_aggregate import SYNC_BUCKET_MILLIS, build_aggregate_body
+from fit_service import get_fitness_service
+from fit_scheduler import FitApiError, ForbiddenError, execute_request
+from fit_auth import get_credential_manager
 
 # Set the required Google Fit API scopes for heart rate and sleep data
 SCOPES = [
@@ -11,48 +13,38 @@ SCOPES = [
     'https://www.googleapis.com/auth/fitness.sleep.read'
 ]
 
-# Authenticate with Google Fit API
+# Authenticate with Google Fit API. The token is loaded once, kept in memory
+# and refreshed in the background before it expires.
 def authenticate_google_fit():
-    creds = None
-    if os.path.exists('token.json'):
-        creds = Credentials.from_authorized_user_file('token.json', SCOPES)
-    
-    if not creds or not creds.valid:
-        if creds and creds.expired and creds.refresh_token:
-            creds.refresh(Request())
-        else:
-            flow = InstalledAppFlow.from_client_secrets_file('credentials.json', SCOPES)
-            creds = flow.run_local_server(port=0)
-        
-        # Save the credentials for the next run
-        with open('token.json', 'w') as token:
-            token.write(creds.to_json())
-
-    return creds
+    return get_credential_manager(SCOPES).get_credentials()
 
 # Fetch data from Google Fit API
 def fetch_data(service, start_time, end_time, data_source_id, data_type):
-    body = {
-        "aggregateBy": [
-            {
-                "dataTypeName": data_type,
-                "dataSourceId": data_source_id
-            }
-        ],
-        "bucketByTime": { "durationMillis": 86400000 },  # 1 day in milliseconds
-        "startTimeMillis": start_time,
-        "endTimeMillis": end_time
-    }
+    body = build_aggregate_body([(data_source_id, data_type)], start_time, end_time, bucket_millis=SYNC_BUCKET_MILLIS)
     
     try:
-        response = service.users().dataset().aggregate(userId="me", body=body).execute()
+        response = execute_request(service.users().dataset().aggregate(userId="me", body=body))
         return response
-    except Exception as e:
-        if "403" in str(e):  # Check if the error is 403 (Forbidden)
-            print("Error: Unable to access sleep data source. Data may not be available or accessible.")
-        else:
-            print(f"Error fetching {data_type} data: {e}")
-        return None
+    except ForbiddenError:
+        print("Error: Unable to access sleep data source. Data may not be available or accessible.")
+        forbidden_sources.add(data_source_id)  # Not asked for again this session
+    except FitApiError as e:  # Rate limits and server errors were already retried
+        print(f"Error fetching {data_type} data: {e}")
+    return None
+
+# Fetch several data sources from Google Fit API with one combined aggregate request.
+# `sources` is a list of (data_source_id, data_type) pairs.
+def fetch_combined_data(service, start_time, end_time, sources):
+    body = build_aggregate_body(sources, start_time, end_time, bucket_millis=SYNC_BUCKET_MILLIS)
+
+    try:
+        response = execute_request(service.users().dataset().aggregate(userId="me", body=body))
+        return response
+    except ForbiddenError:  # One of the sources (usually sleep) is not accessible
+        print("Error: Unable to access one of the data sources. Fetching them separately.")
+    except FitApiError as e:
+        print(f"Error fetching combined data: {e}")
+    return None
 
 # Calculate the average heart rate from the data points
 def calculate_average_heart_rate(response):
@@ -90,33 +82,54 @@ def calculate_total_sleep_hours(response):
     total_sleep_hours = total_sleep_duration_nanos / 1e9 / 3600  # nanoseconds to hours
     return total_sleep_hours
 
+# Data source IDs
+heart_rate_data_source = "raw:com.google.heart_rate.bpm:com.boAt.wristgear:GoogleFitSync - HR count"
+sleep_data_source = "derived:com.google.sleep.segment:com.google.android.gms:merge_sleep_segments"
+
+# Seconds to wait for each data source; the sleep source is often slow or forbidden
+FETCH_TIMEOUTS = {
+    heart_rate_data_source: 20,
+    sleep_data_source: 10,
+}
+# Seconds to wait for the combined request before fetching every source on its own
+COMBINED_FETCH_TIMEOUT = 10
+
 def main():
     # Step 1: Authenticate
     creds = authenticate_google_fit()
 
     # Step 2: Build the Google Fit API service
-    service = build('fitness', 'v1', credentials=creds)
+    service = get_fitness_service(creds)
 
     # Step 3: Define the time period (example: last 1 day)
     now = datetime.now(timezone.utc)
     start_time = int((now - timedelta(days=1)).timestamp() * 1000)
     end_time = int(now.timestamp() * 1000)
 
-    # Data source IDs
-    heart_rate_data_source = "raw:com.google.heart_rate.bpm:com.boAt.wristgear:GoogleFitSync - HR count"
-    sleep_data_source = "derived:com.google.sleep.segment:com.google.android.gms:merge_sleep_segments"
-    
     print(f"Querying heart rate and sleep data sources...")
 
-    # Step 4: Fetch heart rate data
-    heart_rate_response = fetch_data(service, start_time, end_time, heart_rate_data_source, "com.google.heart_rate.bpm")
-    
-    # Step 5: Fetch sleep data
-    sleep_response = fetch_data(service, start_time, end_time, sleep_data_source, "com.google.sleep.segment")
-
-    # Step 6: Calculate and print average heart rate
+    # Step 4: Fetch the heart rate and sleep data that is new since the last sync into the local store,
+    # with a single combined request. If that fails or is slow, both are fetched at once, each with
+    # its own timeout; a source that was forbidden (usually sleep) is not asked for again.
+    store = FitStore()
+    sync_state = SyncState()
+    sources = [
+        (heart_rate_data_source, "com.google.heart_rate.bpm"),
+        (sleep_data_source, "com.google.sleep.segment"),
+    ]
+    responses = sync_all(store, sync_state, sources, start_time, end_time,
+                         lambda start, end, sources: fetch_combined_data(service, start, end, sources),
+                         lambda start, end, source, data_type: fetch_data(service, start, end, source, data_type),
+                         timeouts=FETCH_TIMEOUTS, combined_timeout=COMBINED_FETCH_TIMEOUT)
+    heart_rate_response = responses[heart_rate_data_source]
+
+    # Step 5: Answer everything below from the local store
+    start_nanos = start_time * 1000000
+    end_nanos = end_time * 1000000
+
+    # Step 6: Calculate and print average heart rate from the local store
     if heart_rate_response:
-        avg_heart_rate = calculate_average_heart_rate(heart_rate_response)
+        avg_heart_rate = store.average(heart_rate_data_source, start_nanos, end_nanos)
     
         if avg_heart_rate:
             print(f"Average Heart Rate: {avg_heart_rate:.2f} bpm")
@@ -125,13 +138,19 @@ def main():
     else:
         print(f"Failed to retrieve heart rate data.")
 
-    # Step 7: Calculate and print total sleep hours
-    if sleep_response:
-        total_sleep_hours = calculate_total_sleep_hours(sleep_response)
-    else:
-        total_sleep_hours = 0  # Set sleep hours to 0 if data is not available
+    # Step 7: Calculate and print total sleep hours from the local store
+    total_sleep_hours = store.total_duration_hours(sleep_data_source, start_nanos, end_nanos)
 
     print(f"Total Sleep Time: {total_sleep_hours:.2f} hours")
 
 if __name__ == '__main__':
-    main()
+    # `python krde.py backfill --start YYYY-MM-DD` backfills history into the local store,
+    # `python krde.py collect` runs the headless collector
+    if len(sys.argv) > 1 and sys.argv[1] == 'backfill':
+        from backfill import main as backfill_main
+        backfill_main(sys.argv[2:])
+    elif len(sys.argv) > 1 and sys.argv[1] == 'collect':
+        from collector import main as collector_main
+        collector_main(sys.argv[2:])
+    else:
+        main()
@@ -0,0 +1,33 @@
+import os
+import tkinter as tk
+
+# Pre-scaled copies of the logo
+LOGO_CACHE_DIR = os.path.join('fit_cache', 'logo')
+
+# Path of the scaled copy of an image, keyed by the target size and the image's modification time
+def cached_logo_path(path, size, cache_dir=LOGO_CACHE_DIR):
+    name = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(cache_dir, f"{name}_{size[0]}x{size[1]}_{os.stat(path).st_mtime_ns}.png")
+
+# Scale an image with PIL and save it as PNG, removing copies made from older versions of it
+def _scale_into_cache(path, size, cached_path):
+    from PIL import Image  # Only needed when the cache is missing or out of date
+
+    cache_dir = os.path.dirname(cached_path)
+    os.makedirs(cache_dir, exist_ok=True)
+    prefix = os.path.basename(cached_path).rsplit('_', 1)[0] + '_'
+    for name in os.listdir(cache_dir):
+        if name.startswith(prefix):
+            os.remove(os.path.join(cache_dir, name))
+
+    tmp_path = cached_path + '.tmp'
+    Image.open(path).resize(size).save(tmp_path, format='PNG')
+    os.replace(tmp_path, cached_path)
+
+# Load an image scaled to `size` (width, height) as a Tk PhotoImage. Tk reads the cached
+# PNG by itself, so PIL is only imported and the JPEG only decoded when the image changes.
+def load_logo(path, size, master=None, cache_dir=LOGO_CACHE_DIR):
+    cached_path = cached_logo_path(path, size, cache_dir)
+    if not os.path.exists(cached_path):
+        _scale_into_cache(path, size, cached_path)
+    return tk.PhotoImage(master=master, file=cached_path)
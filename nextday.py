@@ -1,32 +1,18 @@
-import os
-import json
 from datetime import datetime, timedelta, timezone
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from google.auth.transport.requests import Request
-from googleapiclient.discovery import build
+from fit_store import FitStore, point_value
+from fit_latest import fetch_latest_value
+from fit_stream import format_nanos, iter_buckets, raw_request
+from fit_service import get_fitness_service
+from fit_scheduler import execute_request
+from fit_auth import get_credential_manager
 
 # Set the required Google Fit API scopes
 SCOPES = ['https://www.googleapis.com/auth/fitness.heart_rate.read']
 
-# Authenticate with Google Fit API
+# Authenticate with Google Fit API. The token is loaded once, kept in memory
+# and refreshed in the background before it expires.
 def authenticate_google_fit():
-    creds = None
-    if os.path.exists('token.json'):
-        creds = Credentials.from_authorized_user_file('token.json', SCOPES)
-    
-    if not creds or not creds.valid:
-        if creds and creds.expired and creds.refresh_token:
-            creds.refresh(Request())
-        else:
-            flow = InstalledAppFlow.from_client_secrets_file('credentials.json', SCOPES)
-            creds = flow.run_local_server(port=0)
-        
-        # Save the credentials for the next run
-        with open('token.json', 'w') as token:
-            token.write(creds.to_json())
-
-    return creds
+    return get_credential_manager(SCOPES).get_credentials()
 
 # Fetch heart rate data from Google Fit API
 def fetch_heart_rate_data(service, start_time, end_time, data_source_id):
@@ -43,34 +29,34 @@ def fetch_heart_rate_data(service, start_time, end_time, data_source_id):
     }
     
     try:
-        response = service.users().dataset().aggregate(userId="me", body=body).execute()
+        # Keep the raw JSON bytes; the minute buckets are parsed as a stream instead of into nested dicts
+        response = execute_request(raw_request(service.users().dataset().aggregate(userId="me", body=body)))
         return response
     except Exception as e:
         print(f"Error fetching heart rate data: {e}")
         return None
 
-# Extract the last recorded heart rate data point
+# Extract the last recorded heart rate data point: the average of the last minute bucket
+# (like fetch_latest_value). Raw response bytes are parsed as a stream, one bucket at a time,
+# and only the point that is returned gets its value read and its timestamp formatted.
 def extract_last_heart_rate_data(response):
-    last_heart_rate = None
-    last_time = None
+    buckets = iter_buckets(response) if isinstance(response, (bytes, bytearray)) else response.get('bucket', [])
+    last_point = None
 
-    for bucket in response.get('bucket', []):
+    for bucket in buckets:
         for dataset in bucket.get('dataset', []):
             for point in dataset.get('point', []):
-                start_time = datetime.utcfromtimestamp(int(point['startTimeNanos']) / 1e9).strftime('%Y-%m-%d %H:%M:%S')
-                for value in point.get('value', []):
-                    heart_rate = value.get('fpVal')
-                    last_heart_rate = heart_rate
-                    last_time = start_time  # Keep updating to get the latest time and heart rate
+                last_point = point  # Keep updating to get the latest point
 
-    return {'time': last_time, 'heart_rate': last_heart_rate} if last_heart_rate else None
+    last_heart_rate = point_value(last_point) if last_point else None
+    return {'time': format_nanos(int(last_point['startTimeNanos'])), 'heart_rate': last_heart_rate} if last_heart_rate else None
 
 def main():
     # Step 1: Authenticate
     creds = authenticate_google_fit()
 
     # Step 2: Build the Google Fit API service
-    service = build('fitness', 'v1', credentials=creds)
+    service = get_fitness_service(creds)
 
     # Step 3: Define the time period (start of today to now)
     now = datetime.now(timezone.utc)
@@ -81,20 +67,19 @@ def main():
     # Use derived data source to fetch detailed heart rate data
     data_source_id = "derived:com.google.heart_rate.bpm:com.google.android.gms:merge_heart_rate_bpm"
     
-    # Step 4: Fetch heart rate data for today
-    response = fetch_heart_rate_data(service, start_time, end_time, data_source_id)
-
-    # Step 5: Extract and print the last recorded heart rate data point
-    if response:
-        last_heart_rate_data = extract_last_heart_rate_data(response)
+    # Step 4: Find the latest heart rate point of today. A short tail window is asked for first and
+    # widened only while it is empty; the search never goes back past the last point already stored.
+    store = FitStore()
+    latest = fetch_latest_value(lambda start, end: fetch_heart_rate_data(service, start, end, data_source_id),
+                                end_time, earliest_time=start_time, store=store, data_source_id=data_source_id)
 
-        if last_heart_rate_data:
-            print(f"Last recorded heart rate:")
-            print(f"Time: {last_heart_rate_data['time']}, Heart Rate: {last_heart_rate_data['heart_rate']:.2f} bpm")
-        else:
-            print("No heart rate data available for today.")
+    # Step 5: Print the last recorded heart rate data point
+    if latest and latest[0] >= start_time * 1000000:
+        start_time_nanos, heart_rate = latest
+        print(f"Last recorded heart rate:")
+        print(f"Time: {format_nanos(start_time_nanos)}, Heart Rate: {heart_rate:.2f} bpm")
     else:
-        print(f"Failed to retrieve heart rate data from {data_source_id}.")
+        print("No heart rate data available for today.")
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,187 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+# Directory of the optional on-disk layer
+RESPONSE_CACHE_DIR = os.path.join('fit_cache', 'responses')
+
+# A response is fresh for TTL seconds, and may be served stale (while it is
+# refreshed in the background) for STALE_TTL seconds after that
+DEFAULT_TTL = 60
+DEFAULT_STALE_TTL = 10 * 60
+DEFAULT_MAX_ENTRIES = 128
+# Request windows are widened to multiples of this (or of the bucket size, when that is
+# larger), so nearby requests share an entry
+DEFAULT_GRANULARITY_MILLIS = 60 * 1000
+# Expired files of the on-disk layer are deleted at most this often (seconds)
+DISK_SWEEP_INTERVAL = 10 * 60
+
+# Field added to responses that come from the cache: when they were fetched (milliseconds
+# since the epoch). They don't hold data that arrived after that; see fit_sync.
+CACHED_AT_FIELD = 'cachedAtMillis'
+
+
+# TTL/LRU cache of Google Fit aggregate responses with stale-while-revalidate.
+#
+# Entries are kept in memory (bounded, least recently used evicted first) and,
+# when `disk_dir` is given, also as JSON files so they survive a restart.
+class ResponseCache:
+    def __init__(self, ttl=DEFAULT_TTL, stale_ttl=DEFAULT_STALE_TTL, max_entries=DEFAULT_MAX_ENTRIES,
+                 granularity_millis=DEFAULT_GRANULARITY_MILLIS, disk_dir=None):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        self.granularity_millis = granularity_millis
+        self.disk_dir = disk_dir
+        self._entries = OrderedDict()  # key -> (stored_at, response)
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        self._last_sweep = 0
+
+    # Widen a window to the cache granularity (or to whole buckets of `bucket_millis`, when
+    # larger): start rounded down, end rounded up. Requests made up to the end of the same
+    # bucket then have the same window, and so the same cache entry.
+    def round_window(self, start_time, end_time, bucket_millis=0):
+        g = max(self.granularity_millis, bucket_millis)
+        return start_time // g * g, -(-end_time // g) * g
+
+    # Cache key for a request. `sources` is a list of (data_source_id, data_type) pairs.
+    def key(self, sources, bucket_millis, start_time, end_time):
+        start_time, end_time = self.round_window(start_time, end_time, bucket_millis)
+        return json.dumps([[list(source) for source in sources], bucket_millis, start_time, end_time])
+
+    # Return the cached response for a key, calling `fetch()` on a miss.
+    # A stale entry is returned and refreshed in the background. Responses from the
+    # cache carry CACHED_AT_FIELD. Failed fetches (None) are not cached.
+    def get_or_fetch(self, key, fetch):
+        entry = self._get(key)
+        if entry is not None:
+            stored_at, response = entry
+            age = time.time() - stored_at
+            if age < self.ttl:
+                return self._served(entry)
+            if age < self.ttl + self.stale_ttl:
+                self._refresh_in_background(key, fetch)
+                return self._served(entry)
+
+        response = fetch()
+        if response is not None:
+            self._put(key, response)
+        return response
+
+    # A cached response, marked with the time it was fetched
+    @staticmethod
+    def _served(entry):
+        stored_at, response = entry
+        if not isinstance(response, dict):
+            return response
+        served = dict(response)
+        served[CACHED_AT_FIELD] = int(stored_at * 1000)
+        return served
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                return entry
+
+        entry = self._read_disk(key)
+        if entry is not None:
+            with self._lock:
+                self._remember(key, entry)
+        return entry
+
+    def _put(self, key, response):
+        entry = (time.time(), response)
+        with self._lock:
+            self._remember(key, entry)
+        self._write_disk(key, entry)
+
+    def _remember(self, key, entry):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _refresh_in_background(self, key, fetch):
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def refresh():
+            try:
+                response = fetch()
+                if response is not None:
+                    self._put(key, response)
+            except Exception as e:
+                print(f"Error refreshing cached response: {e}")
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        threading.Thread(target=refresh, name='response-cache-refresh', daemon=True).start()
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, hashlib.sha1(key.encode('utf-8')).hexdigest() + '.json')
+
+    def _read_disk(self, key):
+        if not self.disk_dir:
+            return None
+        path = self._disk_path(key)
+        try:
+            with open(path) as f:
+                cached = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if time.time() - cached['stored_at'] >= self.ttl + self.stale_ttl:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+        return cached['stored_at'], cached['response']
+
+    def _write_disk(self, key, entry):
+        if not self.disk_dir:
+            return
+        try:
+            os.makedirs(self.disk_dir, exist_ok=True)
+            path = self._disk_path(key)
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump({'stored_at': entry[0], 'response': entry[1]}, f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Could not write cached response to disk: {e}")
+        self._sweep_disk()
+
+    # Delete the files that expired (every window gets its own file, and most windows are
+    # never requested again, so expired files are not only removed when they are read)
+    def _sweep_disk(self):
+        now = time.time()
+        if now - self._last_sweep < DISK_SWEEP_INTERVAL:
+            return
+        self._last_sweep = now
+        try:
+            names = os.listdir(self.disk_dir)
+        except OSError:
+            return
+        for name in names:
+            if not name.endswith('.json'):
+                continue
+            path = os.path.join(self.disk_dir, name)
+            try:
+                if now - os.path.getmtime(path) >= self.ttl + self.stale_ttl:
+                    os.remove(path)
+            except OSError:
+                pass
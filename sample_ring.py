@@ -0,0 +1,129 @@
+import struct
+from multiprocessing import shared_memory
+
+# Name of the shared-memory segment the collector publishes its samples in
+RING_NAME = 'mhms_samples'
+DEFAULT_CAPACITY = 4096
+
+# Every record is (timestamp in seconds, heart rate, noise level, light level) as doubles.
+# The collector's heart rate is an hourly average, stamped with the time its data runs up to.
+FIELDS = ('timestamp', 'heart_rate', 'noise_level', 'light_level')
+RECORD_DOUBLES = len(FIELDS)
+RECORD_SIZE = RECORD_DOUBLES * 8
+
+# Header: magic, layout version, capacity (records), write count (records ever written).
+# The write count is 8-byte aligned, so it is written and read with a single store/load.
+_HEADER = struct.Struct('<IIQQ')
+HEADER_SIZE = 64  # Keeps the records cache-line aligned
+MAGIC = 0x4d484d53  # "MHMS"
+VERSION = 1
+_WRITE_COUNT = 2  # Index of the write count in the header viewed as unsigned 64-bit words
+_MAGIC_WORD = 0  # Index of the magic and version; zeroed by the writer when it closes the ring
+
+
+# Fixed-size ring of samples in shared memory, with one writer and any number of readers.
+#
+# It needs no lock: only the writer changes anything. It writes the record into
+# its slot first and then publishes it by bumping the write count, so a reader never
+# sees a count that covers a record that is not written yet (ordering is guaranteed
+# on x86; other CPUs may need the reader's lap check to catch reordering). Readers
+# keep their own cursor and get memoryview slices straight into the shared segment.
+class SampleRing:
+    def __init__(self, shm, owner):
+        self.shm = shm
+        self.owner = owner
+        magic, version, self.capacity, _ = _HEADER.unpack_from(shm.buf)
+        if magic != MAGIC or version != VERSION:
+            shm.close()
+            raise ValueError(f"Shared memory {shm.name} does not hold a sample ring")
+        self._words = shm.buf[:HEADER_SIZE].cast('Q')
+        self._records = shm.buf[HEADER_SIZE:HEADER_SIZE + self.capacity * RECORD_SIZE].cast('d')
+
+    # Create the ring (in the writer's process)
+    @classmethod
+    def create(cls, name=RING_NAME, capacity=DEFAULT_CAPACITY):
+        shm = shared_memory.SharedMemory(name=name, create=True, size=HEADER_SIZE + capacity * RECORD_SIZE)
+        _HEADER.pack_into(shm.buf, 0, MAGIC, VERSION, capacity, 0)
+        return cls(shm, owner=True)
+
+    # Attach to an existing ring; raises FileNotFoundError while no writer has created it
+    @classmethod
+    def attach(cls, name=RING_NAME):
+        shm = shared_memory.SharedMemory(name=name)
+        # Before Python 3.13 the resource tracker would unlink the segment when a
+        # reader exits, pulling it from under the writer; only the owner may do that
+        try:
+            from multiprocessing import resource_tracker
+            resource_tracker.unregister(shm._name, 'shared_memory')
+        except (ImportError, AttributeError, KeyError):
+            pass
+        return cls(shm, owner=False)
+
+    @property
+    def write_count(self):
+        return self._words[_WRITE_COUNT]
+
+    # True once the writer has closed the ring. Readers still map the old segment after the
+    # writer unlinked it; a new writer creates a new segment under the name, to attach to again.
+    @property
+    def closed(self):
+        return self._words[_MAGIC_WORD] == 0
+
+    # Append one record (writer only)
+    def append(self, timestamp, heart_rate, noise_level, light_level):
+        count = self._words[_WRITE_COUNT]
+        offset = (count % self.capacity) * RECORD_DOUBLES
+        records = self._records
+        records[offset] = timestamp
+        records[offset + 1] = heart_rate
+        records[offset + 2] = noise_level
+        records[offset + 3] = light_level
+        self._words[_WRITE_COUNT] = count + 1  # Publish
+
+    # A reader that starts at the records written from now on (or at the oldest one kept)
+    def reader(self, from_start=False):
+        return RingReader(self, max(0, self.write_count - self.capacity) if from_start else self.write_count)
+
+    def close(self):
+        if self.owner:
+            self._words[_MAGIC_WORD] = 0  # Tell the readers
+        self._words.release()
+        self._records.release()
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+# Reads the records a ring received since the last read
+class RingReader:
+    def __init__(self, ring, cursor):
+        self.ring = ring
+        self.cursor = cursor
+        self.lost = 0  # Records overwritten before this reader got to them
+
+    # New records as at most two memoryview slices of doubles into the shared segment
+    # (two when they wrap around the end), RECORD_DOUBLES values per record. The
+    # slices are live: use them before the writer wraps around the ring again.
+    def read_new(self):
+        ring = self.ring
+        end = ring.write_count
+        start = self.cursor
+        if end - start > ring.capacity:
+            self.lost += end - ring.capacity - start
+            start = end - ring.capacity
+        self.cursor = end
+        if start == end:
+            return []
+
+        first = start % ring.capacity
+        last = first + (end - start)
+        if last <= ring.capacity:
+            return [ring._records[first * RECORD_DOUBLES:last * RECORD_DOUBLES]]
+        return [ring._records[first * RECORD_DOUBLES:],
+                ring._records[:(last - ring.capacity) * RECORD_DOUBLES]]
+
+# Iterate the records of slices returned by RingReader.read_new as tuples
+def iter_records(segments):
+    for segment in segments:
+        for offset in range(0, len(segment), RECORD_DOUBLES):
+            yield tuple(segment[offset:offset + RECORD_DOUBLES])
@@ -0,0 +1,31 @@
+import os
+from stress_rules import DEFAULT_RULES_FILE, load_rules
+
+# Stress rules, loaded and compiled once (STRESS_RULES_FILE points at another config)
+RULES = load_rules(os.environ.get('STRESS_RULES_FILE', DEFAULT_RULES_FILE))
+
+# Column names used by assess_table
+COLUMNS = RULES.names
+
+# Function to assess mental health based on input values.
+# Factors added to the rules after the first four are passed as extra arguments.
+def assess_mental_health(heart_rate_var, sleep_hours, noise_level, light_level, *extra_factors):
+    return RULES.score(heart_rate_var, sleep_hours, noise_level, light_level, *extra_factors)
+
+# Function to provide recommendations based on stress score
+def provide_recommendation(stress_score):
+    return RULES.recommend(stress_score)
+
+# Assess many observations at once. Takes one equally long array (or list) per
+# factor and returns an array of stress scores, one per row.
+def assess_mental_health_batch(heart_rate_var, sleep_hours, noise_level, light_level, *extra_factors):
+    return RULES.score_batch(heart_rate_var, sleep_hours, noise_level, light_level, *extra_factors)
+
+# Assess a columnar table: anything indexable by the names in COLUMNS
+# (a dict of arrays, a NumPy structured array, a pandas DataFrame, ...)
+def assess_table(table):
+    return RULES.score_table(table)
+
+# Recommendations for an array of stress scores, as an object array of strings
+def provide_recommendations(stress_scores):
+    return RULES.recommend_batch(stress_scores)
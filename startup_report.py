@@ -0,0 +1,35 @@
+import time
+
+# Launch-to-first-paint time the Tk apps should stay under, in seconds
+FIRST_PAINT_TARGET = 0.5
+
+
+# Records how long the stages of an app's startup take, from the moment it was
+# created (create it before the other imports so they are included).
+class StartupTimer:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.marks = []  # (stage name, seconds since start)
+
+    def mark(self, name):
+        self.marks.append((name, time.perf_counter() - self.started))
+
+    # Call `callback` once the window has been mapped and drawn for the first time
+    def after_first_paint(self, app, callback):
+        def on_map(event):
+            if event.widget is app:
+                app.unbind('<Map>', binding)
+                app.after_idle(callback)  # Runs after the pending redraws
+        binding = app.bind('<Map>', on_map, add='+')
+
+    # Print the stage times, warn when the first paint missed its target, and record
+    # them as metrics (exported when FIT_METRICS_FILE is set)
+    def report(self, target=FIRST_PAINT_TARGET):
+        from fit_metrics import observe, is_enabled
+
+        print("Startup: " + ", ".join(f"{name} {seconds * 1000:.0f} ms" for name, seconds in self.marks))
+        for name, seconds in self.marks:
+            if is_enabled():
+                observe(f'startup_{name}', seconds)
+            if name == 'first_paint' and seconds > target:
+                print(f"Startup: first paint took {seconds * 1000:.0f} ms, over the {target * 1000:.0f} ms target")
@@ -0,0 +1,81 @@
+import os
+import json
+from bisect import bisect_right
+
+# Rules shipped with the app
+DEFAULT_RULES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'stress_rules.json')
+
+
+# Stress rules compiled into flat tables.
+#
+# Every factor adds its weight to the stress score when its value is below `low`
+# or above `high` (a missing bound never triggers). The recommendation is the one
+# with the highest `min_score` not above the score. The config is parsed once;
+# scoring only walks tuples, so it is cheap per sample and vectorizes over batches.
+class StressRules:
+    def __init__(self, factors, recommendations):
+        if not factors:
+            raise ValueError("At least one stress factor is required")
+        if not recommendations:
+            raise ValueError("At least one recommendation is required")
+
+        self.names = tuple(factor['name'] for factor in factors)
+        if len(set(self.names)) != len(self.names):
+            raise ValueError(f"Duplicate stress factor names: {self.names}")
+        self.lows = tuple(float(factor.get('low', float('-inf'))) for factor in factors)
+        self.highs = tuple(float(factor.get('high', float('inf'))) for factor in factors)
+        self.weights = tuple(factor.get('weight', 1) for factor in factors)
+        self._predicates = tuple(zip(self.lows, self.highs, self.weights))
+
+        recommendations = sorted(recommendations, key=lambda recommendation: recommendation['min_score'])
+        self.thresholds = tuple(recommendation['min_score'] for recommendation in recommendations)
+        self.texts = tuple(recommendation['text'] for recommendation in recommendations)
+
+    # Score one sample; values are given in the order of `names`
+    def score(self, *values):
+        if len(values) != len(self._predicates):
+            raise TypeError(f"Expected {len(self._predicates)} values ({', '.join(self.names)}), got {len(values)}")
+        stress_score = 0
+        for value, (low, high, weight) in zip(values, self._predicates):
+            if value < low or value > high:
+                stress_score += weight
+        return stress_score
+
+    # Score many samples at once; one array per factor, in the order of `names`
+    def score_batch(self, *columns):
+        import numpy as np  # Only the batch methods need NumPy; importing it is slow
+
+        if len(columns) != len(self._predicates):
+            raise TypeError(f"Expected {len(self._predicates)} columns ({', '.join(self.names)}), got {len(columns)}")
+        dtype = np.result_type(np.int8, *self.weights)
+        stress_score = None
+        for column, (low, high, weight) in zip(columns, self._predicates):
+            column = np.asarray(column, np.float64)
+            triggered = (column < low) | (column > high)
+            if stress_score is None:
+                stress_score = np.zeros(column.shape, dtype)
+            if weight == 1:
+                stress_score += triggered
+            else:
+                stress_score += weight * triggered
+        return stress_score
+
+    # Score a columnar table indexed by factor name (dict of arrays, structured array, DataFrame, ...)
+    def score_table(self, table):
+        return self.score_batch(*(table[name] for name in self.names))
+
+    def recommend(self, stress_score):
+        return self.texts[max(bisect_right(self.thresholds, stress_score) - 1, 0)]
+
+    # Recommendations for an array of stress scores, as an object array of strings
+    def recommend_batch(self, stress_scores):
+        import numpy as np
+
+        index = np.searchsorted(np.asarray(self.thresholds), np.asarray(stress_scores), side='right') - 1
+        return np.array(self.texts, dtype=object)[np.maximum(index, 0)]
+
+# Load and compile the stress rules from a JSON config file
+def load_rules(path=DEFAULT_RULES_FILE):
+    with open(path) as f:
+        config = json.load(f)
+    return StressRules(config['factors'], config['recommendations'])
@@ -1,40 +1,28 @@
-import os
-import json
 import tkinter as tk
 from tkinter import messagebox
 from PIL import Image, ImageTk
 from datetime import datetime, timezone
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from google.auth.transport.requests import Request
-from googleapiclient.discovery import build
+from fit_service import get_fitness_service
+from fit_scheduler import execute_request
+from fit_stream import raw_request
+from fit_auth import get_credential_manager
+from fit_store import FitStore
+from fit_aggregate import build_aggregate_body
+from fit_latest import fetch_latest_value
+from scoring import assess_mental_health, provide_recommendation
 
 # Set the required Google Fit API scopes
 SCOPES = ['https://www.googleapis.com/auth/fitness.heart_rate.read']
 
-# Authenticate with Google Fit API
+# Authenticate with Google Fit API. The token is loaded once, kept in memory
+# and refreshed in the background before it expires.
 def authenticate_google_fit():
-    creds = None
-    if os.path.exists('token.json'):
-        creds = Credentials.from_authorized_user_file('token.json', SCOPES)
-    
-    if not creds or not creds.valid:
-        if creds and creds.expired and creds.refresh_token:
-            creds.refresh(Request())
-        else:
-            flow = InstalledAppFlow.from_client_secrets_file('credentials.json', SCOPES)
-            creds = flow.run_local_server(port=0)
-        
-        # Save the credentials for the next run
-        with open('token.json', 'w') as token:
-            token.write(creds.to_json())
-
-    return creds
+    return get_credential_manager(SCOPES).get_credentials()
 
 # Fetch the last recorded heart rate data from Google Fit API
 def fetch_last_heart_rate_data():
     creds = authenticate_google_fit()
-    service = build('fitness', 'v1', credentials=creds)
+    service = get_fitness_service(creds)
 
     now = datetime.now(timezone.utc)
     start_of_today = datetime.combine(now.date(), datetime.min.time()).replace(tzinfo=timezone.utc)
@@ -43,63 +31,24 @@ def fetch_last_heart_rate_data():
 
     data_source_id = "derived:com.google.heart_rate.bpm:com.google.android.gms:merge_heart_rate_bpm"
 
-    body = {
-        "aggregateBy": [
-            {
-                "dataTypeName": "com.google.heart_rate.bpm",
-                "dataSourceId": data_source_id
-            }
-        ],
-        "bucketByTime": { "durationMillis": 60000 },
-        "startTimeMillis": start_time,
-        "endTimeMillis": end_time
-    }
-    
-    try:
-        response = service.users().dataset().aggregate(userId="me", body=body).execute()
-        last_heart_rate = None
-        for bucket in response.get('bucket', []):
-            for dataset in bucket.get('dataset', []):
-                for point in dataset.get('point', []):
-                    for value in point.get('value', []):
-                        last_heart_rate = value.get('fpVal')
-        return last_heart_rate
-    except Exception as e:
-        print(f"Error fetching heart rate data: {e}")
-        return None
-
-# Function to assess mental health based on input values
-def assess_mental_health(heart_rate_var, sleep_hours, noise_level, light_level):
-    stress_score = 0
-
-    # Physiological Factors
-    if heart_rate_var < 50 or heart_rate_var > 95:
-        stress_score += 1
-
-    if sleep_hours < 6 or sleep_hours > 15:
-        stress_score += 1
-
-    # Environmental Factors
-    if noise_level > 70:
-        stress_score += 1
-
-    if light_level < 30 or light_level > 200:
-        stress_score += 1
-
-    return stress_score
-
-# Function to provide recommendations based on stress score
-def provide_recommendation(stress_score):
-    if stress_score == 0:
-        return "You are doing well! Keep up your current routine."
-    elif stress_score == 1:
-        return "Slight stress detected. Try to relax and take breaks."
-    elif stress_score == 2:
-        return "Moderate stress detected. Ensure you have enough sleep and reduce exposure to noise."
-    elif stress_score == 3:
-        return "High stress detected. Consider reducing environmental stressors and practice mindfulness."
-    else:
-        return "Critical stress levels detected! Please reach out to a mental health professional."
+    # Ask for a short tail window first and widen it only while it is empty,
+    # never going back past the last point already in the local store
+    def fetch(start, end):
+        body = build_aggregate_body([(data_source_id, "com.google.heart_rate.bpm")], start, end, bucket_millis=60000)
+        try:
+            # Keep the raw JSON bytes; the minute buckets are parsed as a stream instead of into nested dicts
+            return execute_request(raw_request(service.users().dataset().aggregate(userId="me", body=body)))
+        except Exception as e:
+            print(f"Error fetching heart rate data: {e}")
+            return None
+
+    latest = fetch_latest_value(fetch, end_time, earliest_time=start_time, store=store, data_source_id=data_source_id)
+    if latest is None or latest[0] < start_time * 1000000:
+        return None  # Nothing recorded today
+    return latest[1]
+
+# Local time-series store that fetched points are written into
+store = FitStore()
 
 # Function to collect sensor data from user input and assess mental health
 def on_submit():
@@ -0,0 +1,66 @@
+import os
+import sys
+import random
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aggregation import response_to_arrays, store_to_arrays, window_average, window_duration_hours
+from benchmarks.synthetic import daily_sleep_response, heart_rate_response
+from fit_store import FitStore, points_from_response
+
+QUARTER_HOUR = 15 * 60 * 1000000000
+
+
+# The NumPy store reads give what the row-by-row FitStore.read gives
+class StoreToArraysTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.store = FitStore(self.directory.name)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_matches_read_after_rewrites_and_truncation(self):
+        generator = random.Random(3)
+        for _ in range(50):
+            points = []
+            for _ in range(30):
+                start = generator.randrange(0, 300) * QUARTER_HOUR
+                points.append((start, start + generator.randrange(1, 20) * QUARTER_HOUR, generator.random()))
+            self.store.append('source', points)
+            if generator.random() < 0.3:
+                self.store.truncate_at('source', generator.randrange(0, 300) * QUARTER_HOUR)
+
+        for _ in range(200):
+            start_ns = generator.randrange(-10, 320) * QUARTER_HOUR
+            end_ns = start_ns + generator.randrange(1, 100) * QUARTER_HOUR
+            expected = self.store.read('source', start_ns, end_ns)
+            arrays = store_to_arrays(self.store, 'source', start_ns, end_ns)
+            self.assertEqual([column.tolist() for column in arrays], [list(column) for column in expected])
+
+    def test_summaries(self):
+        hour = 4 * QUARTER_HOUR
+        self.store.append('source', [(0, hour, 60.0), (hour, 3 * hour, 90.0)])
+        arrays = store_to_arrays(self.store, 'source', 0, 4 * hour)
+        self.assertAlmostEqual(window_average(*arrays, 0, 4 * hour), 80.0)
+        self.assertAlmostEqual(window_average(*arrays, hour // 2, 2 * hour), 80.0)
+        self.assertAlmostEqual(window_duration_hours(arrays[0], arrays[1], hour // 2, 4 * hour), 2.5)
+        self.assertIsNone(window_average(*store_to_arrays(self.store, 'missing', 0, hour), 0, hour))
+
+
+# response_to_arrays gives the rows of points_from_response as columns
+class ResponseToArraysTest(unittest.TestCase):
+    def test_matches_points_from_response(self):
+        for response in (heart_rate_response(2, 1), daily_sleep_response(5)):
+            rows = list(points_from_response(response))
+            arrays = response_to_arrays(response)
+            self.assertEqual([column.tolist() for column in arrays], [list(column) for column in zip(*rows)])
+
+    def test_empty(self):
+        self.assertEqual([column.size for column in response_to_arrays(None)], [0, 0, 0])
+
+
+if __name__ == '__main__':
+    unittest.main()
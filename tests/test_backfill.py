@@ -0,0 +1,54 @@
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backfill import SOURCES, BackfillCheckpoint, backfill
+from fake_fit_server import FakeFitServer
+from fit_service import get_fitness_service
+from fit_store import FitStore
+
+DAY_MILLIS = 24 * 60 * 60 * 1000
+# 2024-03-01 00:00 UTC
+START_MILLIS = 1709251200000
+HEART_RATE = SOURCES[0][0]
+SLEEP = SOURCES[1][0]
+
+
+# A backfill where one source can not be read still stores and checkpoints the others
+class ForbiddenSourceBackfillTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.store = FitStore(self.directory.name)
+        self.checkpoint_path = os.path.join(self.directory.name, 'backfill_checkpoint.json')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def run_backfill(self, server):
+        service = get_fitness_service(None, endpoint=server.url)
+        return backfill(service, self.store, BackfillCheckpoint(self.checkpoint_path),
+                        START_MILLIS, START_MILLIS + 4 * DAY_MILLIS, chunk_days=2, workers=2)
+
+    def test_readable_sources_are_stored_when_sleep_is_forbidden(self):
+        with FakeFitServer(forbidden=['com.google.sleep.segment']) as server:
+            self.assertEqual(self.run_backfill(server), (0, 2))
+        self.assertTrue(self.store.days(HEART_RATE))
+        self.assertEqual(self.store.days(SLEEP), [])
+
+        checkpoint = BackfillCheckpoint(self.checkpoint_path)
+        chunk = (START_MILLIS, START_MILLIS + 2 * DAY_MILLIS)
+        self.assertTrue(checkpoint.is_done(chunk, HEART_RATE))
+        self.assertFalse(checkpoint.is_done(chunk, SLEEP))
+
+        # Once sleep can be read, the next run only fetches the sleep chunks
+        with FakeFitServer() as server:
+            self.assertEqual(self.run_backfill(server), (2, 0))
+            self.assertEqual(server.stats['requests'], 2)
+        self.assertTrue(self.store.days(SLEEP))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,117 @@
+import os
+import sys
+import socket
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httplib2
+from googleapiclient.errors import HttpError
+from fit_scheduler import (AuthError, BadRequestError, FitApiError, ForbiddenError, NotFoundError, RateLimitError,
+                           RequestScheduler, ServerError, TransientError, classify_error)
+
+
+def http_error(status, content=b'', retry_after=None):
+    headers = {'status': status}
+    if retry_after is not None:
+        headers['retry-after'] = retry_after
+    return HttpError(httplib2.Response(headers), content)
+
+
+# Failures are turned into the FitApiError subclass that tells whether to retry
+class ClassifyErrorTest(unittest.TestCase):
+    def test_http_statuses(self):
+        for status, error_class in ((400, BadRequestError), (401, AuthError), (403, ForbiddenError),
+                                    (404, NotFoundError), (429, RateLimitError), (500, ServerError),
+                                    (503, ServerError), (418, FitApiError)):
+            error = classify_error(http_error(status))
+            self.assertIs(type(error), error_class)
+            self.assertEqual(error.status, status)
+
+    def test_403_with_a_quota_reason_is_a_rate_limit(self):
+        error = classify_error(http_error(403, b'{"error": {"errors": [{"reason": "userRateLimitExceeded"}]}}'))
+        self.assertIsInstance(error, RateLimitError)
+        self.assertTrue(error.retryable)
+
+    def test_retry_after(self):
+        self.assertEqual(classify_error(http_error(429, retry_after='3')).retry_after, 3.0)
+        self.assertIsNone(classify_error(http_error(429, retry_after='Wed, 21 Oct 2026 07:28:00 GMT')).retry_after)
+
+    def test_connection_errors_are_transient(self):
+        for error in (socket.timeout('timed out'), ConnectionResetError(), httplib2.ServerNotFoundError('no server')):
+            self.assertIsInstance(classify_error(error), TransientError)
+        self.assertIs(type(classify_error(ValueError('other'))), FitApiError)
+
+    def test_only_rate_limits_server_and_connection_errors_are_retryable(self):
+        self.assertEqual([error_class.retryable for error_class in (RateLimitError, ServerError, TransientError)],
+                         [True, True, True])
+        self.assertEqual([error_class.retryable for error_class in (BadRequestError, AuthError, ForbiddenError,
+                                                                    NotFoundError, FitApiError)],
+                         [False] * 5)
+
+
+# Retries with backoff, Retry-After and the shared retry budget (without actually sleeping)
+@mock.patch('fit_scheduler.time.sleep')
+class RequestSchedulerTest(unittest.TestCase):
+    def scheduler(self, **options):
+        return RequestScheduler(rate=1000, burst=1000, **options)
+
+    # A function that raises the given errors, one per call, and then returns 'ok'
+    def failing(self, *errors):
+        calls = []
+
+        def function():
+            calls.append(1)
+            if len(calls) <= len(errors):
+                raise errors[len(calls) - 1]
+            return 'ok'
+        return function, calls
+
+    def test_retries_retryable_errors(self, sleep):
+        function, calls = self.failing(http_error(503), socket.timeout('timed out'))
+        self.assertEqual(self.scheduler().call(function), 'ok')
+        self.assertEqual(len(calls), 3)
+        self.assertEqual(sleep.call_count, 2)
+
+    def test_does_not_retry_other_errors(self, sleep):
+        function, calls = self.failing(http_error(403))
+        with self.assertRaises(ForbiddenError):
+            self.scheduler().call(function)
+        self.assertEqual(len(calls), 1)
+        sleep.assert_not_called()
+
+    def test_gives_up_after_max_retries(self, sleep):
+        function, calls = self.failing(*[http_error(500)] * 10)
+        with self.assertRaises(ServerError):
+            self.scheduler(max_retries=3).call(function)
+        self.assertEqual(len(calls), 4)
+
+    def test_waits_for_retry_after(self, sleep):
+        function, _ = self.failing(http_error(429, retry_after='7'), http_error(429, retry_after='100'))
+        self.scheduler(max_delay=32).call(function)
+        self.assertEqual([call.args[0] for call in sleep.call_args_list], [7.0, 32])
+
+    def test_backoff_is_jittered_and_capped(self, sleep):
+        scheduler = self.scheduler(base_delay=0.5, max_delay=4)
+        for attempt in range(1, 8):
+            delay = scheduler.backoff_delay(attempt)
+            self.assertGreaterEqual(delay, 0)
+            self.assertLessEqual(delay, min(4, 0.5 * 2 ** attempt))
+
+    def test_retry_budget_is_shared(self, sleep):
+        scheduler = self.scheduler(retry_ratio=0, retry_reserve=2)
+        function, calls = self.failing(*[http_error(500)] * 10)
+        with self.assertRaises(ServerError):
+            scheduler.call(function)
+        self.assertEqual(len(calls), 3)  # The first try and the two retries of the budget
+
+        # The budget is spent, so the next request is not retried at all
+        function, calls = self.failing(http_error(500))
+        with self.assertRaises(ServerError):
+            scheduler.call(function)
+        self.assertEqual(len(calls), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,42 @@
+import os
+import sys
+import json
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.synthetic import heart_rate_response
+from fit_store import points_from_response
+from fit_stream import iter_buckets
+
+
+# Streaming the buckets out of raw response bytes gives what json.loads gives
+class IterBucketsTest(unittest.TestCase):
+    def setUp(self):
+        self.response = heart_rate_response(1, 10)
+        self.raw = json.dumps(self.response, indent=1).encode()
+
+    def chunks(self, size):
+        return (self.raw[i:i + size] for i in range(0, len(self.raw), size))
+
+    def test_whole_bytes(self):
+        self.assertEqual(list(iter_buckets(self.raw)), self.response['bucket'])
+
+    def test_chunks_split_anywhere(self):
+        for size in (1, 7, 100, 4096):
+            self.assertEqual(list(iter_buckets(self.chunks(size))), self.response['bucket'])
+
+    def test_points_from_raw_bytes(self):
+        self.assertEqual(list(points_from_response(self.raw)), list(points_from_response(self.response)))
+
+    def test_empty_and_missing_bucket_lists(self):
+        self.assertEqual(list(iter_buckets(b'{"bucket": []}')), [])
+        self.assertEqual(list(iter_buckets(b'{}')), [])
+
+    def test_truncated_response(self):
+        with self.assertRaises(ValueError):
+            list(iter_buckets(self.raw[:len(self.raw) // 2]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,173 @@
+import os
+import sys
+import time
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_fit_server import FakeApiError, FakeFitApi, SyntheticFitData
+from fit_aggregate import SYNC_BUCKET_MILLIS, build_aggregate_body
+from fit_store import FitStore
+from fit_sync import SyncState, forbidden_sources, sync_all, sync_combined, sync_source
+
+HEART_RATE = ("raw:com.google.heart_rate.bpm:com.boAt.wristgear:GoogleFitSync - HR count", "com.google.heart_rate.bpm")
+SLEEP = ("derived:com.google.sleep.segment:com.google.android.gms:merge_sleep_segments", "com.google.sleep.segment")
+
+MINUTE_MILLIS = 60 * 1000
+DAY_MILLIS = 24 * 60 * MINUTE_MILLIS
+# 2024-03-05 12:34:56 UTC: not on a bucket boundary, and the window before it holds a night of sleep
+NOW_MILLIS = 1709642096000
+# The day checked after every sync; it ends on a bucket boundary, so it holds whole buckets only
+WINDOW_END = NOW_MILLIS // SYNC_BUCKET_MILLIS * SYNC_BUCKET_MILLIS
+
+
+# Syncing overlapping delta windows into the store must not change what the store
+# answers for a window whose data did not change
+class SyncStabilityTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.store = FitStore(self.directory.name)
+        self.state = SyncState(os.path.join(self.directory.name, 'sync_state.json'))
+        self.data = SyntheticFitData(seed=1)
+        self.api = FakeFitApi(self.data)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def fetch(self, sources, start_time, end_time):
+        return self.api.aggregate(build_aggregate_body(sources, start_time, end_time, bucket_millis=SYNC_BUCKET_MILLIS))
+
+    def sync(self, end_time):
+        sync_combined(self.store, self.state, [HEART_RATE, SLEEP], end_time - DAY_MILLIS, end_time,
+                      lambda start, end: self.fetch([HEART_RATE, SLEEP], start, end))
+
+    def window_values(self, end_time):
+        start_nanos = (end_time - DAY_MILLIS) * 1000000
+        end_nanos = end_time * 1000000
+        return (self.store.average(HEART_RATE[0], start_nanos, end_nanos),
+                self.store.total_duration_hours(SLEEP[0], start_nanos, end_nanos))
+
+    def test_repeated_syncs_keep_the_window_values(self):
+        self.sync(NOW_MILLIS)
+        heart_rate, sleep_hours = self.window_values(WINDOW_END)
+
+        for minutes in (20, 40, 40, 60):
+            self.sync(NOW_MILLIS + minutes * MINUTE_MILLIS)
+            self.assertAlmostEqual(self.window_values(WINDOW_END)[0], heart_rate, places=9)
+            self.assertAlmostEqual(self.window_values(WINDOW_END)[1], sleep_hours, places=9)
+
+    def test_window_values_match_the_data(self):
+        for minutes in (0, 20, 40):
+            self.sync(NOW_MILLIS + minutes * MINUTE_MILLIS)
+        heart_rate, sleep_hours = self.window_values(WINDOW_END)
+
+        start_nanos = (WINDOW_END - DAY_MILLIS) * 1000000
+        end_nanos = WINDOW_END * 1000000
+        samples = [bpm for _, _, bpm in self.data.heart_rate_samples(start_nanos, end_nanos)]
+        segments = list(self.data.sleep_segments(start_nanos, end_nanos))
+        self.assertAlmostEqual(heart_rate, sum(samples) / len(samples), places=9)
+        self.assertAlmostEqual(sleep_hours, sum(end - start for start, end, _ in segments) / 3.6e12, places=9)
+
+    def test_sleep_segment_cut_at_the_window_start_is_not_counted_twice(self):
+        # With windows aligned to the minute, the second sync starts at 01:50, in the middle of a
+        # segment the first sync stored; the response holds that segment clipped to 01:50
+        night = NOW_MILLIS - NOW_MILLIS % DAY_MILLIS + 2 * 60 * MINUTE_MILLIS  # 02:00 UTC
+        for end_time in (night, night + 45 * MINUTE_MILLIS):
+            sync_source(self.store, self.state, SLEEP[0], night - DAY_MILLIS, end_time,
+                        lambda start, end: self.fetch([SLEEP], start, end), bucket_millis=MINUTE_MILLIS)
+
+        start_nanos = (night - DAY_MILLIS) * 1000000
+        end_nanos = (night + 45 * MINUTE_MILLIS) * 1000000
+        segments = list(self.data.sleep_segments(start_nanos, end_nanos))
+        self.assertAlmostEqual(self.store.total_duration_hours(SLEEP[0], start_nanos, end_nanos),
+                               sum(end - start for start, end, _ in segments) / 3.6e12, places=9)
+
+
+# Reading a window back from the store after truncate_at cut a point short
+class TruncatedReadTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.store = FitStore(self.directory.name)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_cut_off_row_is_not_read_after_the_cut(self):
+        night = (NOW_MILLIS - NOW_MILLIS % DAY_MILLIS) * 1000000
+        minute = MINUTE_MILLIS * 1000000
+        self.store.append(SLEEP[0], [(night + 90 * minute, night + 150 * minute, 1.0)])  # 01:30-02:30
+        self.store.truncate_at(SLEEP[0], night + 120 * minute)
+        self.store.append(SLEEP[0], [(night + 120 * minute, night + 150 * minute, 1.0)])  # 02:00-02:30
+
+        # 02:10-03:00 only holds 02:10-02:30 of the remainder
+        self.assertAlmostEqual(self.store.total_duration_hours(SLEEP[0], night + 130 * minute, night + 180 * minute),
+                               20 / 60, places=9)
+        # 01:00-03:00 holds the whole segment once
+        self.assertAlmostEqual(self.store.total_duration_hours(SLEEP[0], night + 60 * minute, night + 180 * minute),
+                               1.0, places=9)
+        starts, ends, _ = self.store.read(SLEEP[0], night + 130 * minute, night + 180 * minute)
+        self.assertEqual((list(starts), list(ends)), ([night + 120 * minute], [night + 150 * minute]))
+
+
+# sync_all: one combined request, falling back to one request per source
+class SyncAllTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.store = FitStore(self.directory.name)
+        self.state = SyncState(os.path.join(self.directory.name, 'sync_state.json'))
+        self.requests = []
+        self.delay = 0
+        forbidden_sources.clear()
+
+    def tearDown(self):
+        forbidden_sources.clear()
+        self.directory.cleanup()
+
+    # Like the apps' fetch functions: a 403 is printed, remembered and answered with None
+    def fetch(self, api, sources, start_time, end_time):
+        self.requests.append([source for source, _ in sources])
+        try:
+            return api.aggregate(build_aggregate_body(sources, start_time, end_time, bucket_millis=SYNC_BUCKET_MILLIS))
+        except FakeApiError:
+            if len(sources) == 1:
+                forbidden_sources.add(sources[0][0])
+            return None
+
+    def sync(self, api, end_time=NOW_MILLIS, combined_timeout=5):
+        def fetch_combined(start, end, sources):
+            time.sleep(self.delay)
+            return self.fetch(api, sources, start, end)
+        return sync_all(self.store, self.state, [HEART_RATE, SLEEP], end_time - DAY_MILLIS, end_time,
+                        fetch_combined, lambda start, end, source, data_type: self.fetch(api, [(source, data_type)], start, end),
+                        combined_timeout=combined_timeout)
+
+    def test_one_combined_request(self):
+        responses = self.sync(FakeFitApi(SyntheticFitData(seed=1)))
+        self.assertEqual(self.requests, [[HEART_RATE[0], SLEEP[0]]])
+        self.assertIsNotNone(responses[HEART_RATE[0]])
+        self.assertIsNotNone(responses[SLEEP[0]])
+
+    def test_forbidden_source_is_left_out_afterwards(self):
+        api = FakeFitApi(SyntheticFitData(seed=1), forbidden=['com.google.sleep.segment'])
+        responses = self.sync(api)
+        self.assertEqual(len(self.requests), 3)  # Combined, then each source on its own
+        self.assertIsNotNone(responses[HEART_RATE[0]])
+        self.assertIsNone(responses[SLEEP[0]])
+
+        self.requests.clear()
+        responses = self.sync(api, NOW_MILLIS + 20 * MINUTE_MILLIS)
+        self.assertEqual(self.requests, [[HEART_RATE[0]]])
+        self.assertIsNotNone(responses[HEART_RATE[0]])
+
+    def test_slow_combined_request_falls_back(self):
+        self.delay = 1
+        started = time.monotonic()
+        responses = self.sync(FakeFitApi(SyntheticFitData(seed=1)), combined_timeout=0.2)
+        self.assertLess(time.monotonic() - started, 1)
+        self.assertIsNotNone(responses[HEART_RATE[0]])
+        self.assertIsNotNone(responses[SLEEP[0]])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,138 @@
+import os
+import sys
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from response_cache import CACHED_AT_FIELD, ResponseCache
+
+HOUR_MILLIS = 60 * 60 * 1000
+SOURCES = [("derived:com.google.sleep.segment:com.google.android.gms:merge_sleep_segments", "com.google.sleep.segment")]
+
+
+# A fetch function that returns {'n': <call number>} and counts its calls
+class Fetch:
+    def __init__(self):
+        self.calls = 0
+        self.done = threading.Event()
+
+    def __call__(self):
+        self.calls += 1
+        self.done.set()
+        return {'n': self.calls}
+
+
+# Expiry, stale-while-revalidate and LRU eviction, on a clock the tests move
+class ResponseCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.now = 1000000.0
+        patcher = mock.patch('response_cache.time.time', lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.cache = ResponseCache(ttl=60, stale_ttl=600, max_entries=2)
+
+    def test_fresh_entry_is_served_from_the_cache(self):
+        fetch = Fetch()
+        self.assertEqual(self.cache.get_or_fetch('a', fetch), {'n': 1})
+        self.now += 30
+        served = self.cache.get_or_fetch('a', fetch)
+        self.assertEqual(fetch.calls, 1)
+        self.assertEqual(served, {'n': 1, CACHED_AT_FIELD: 1000000000})
+
+        # The cached response itself is not marked
+        served['n'] = 5
+        self.assertEqual(self.cache.get_or_fetch('a', fetch)['n'], 1)
+
+    def test_stale_entry_is_served_and_refreshed_in_the_background(self):
+        fetch = Fetch()
+        self.cache.get_or_fetch('a', fetch)
+        self.now += 120
+        fetch.done.clear()
+        self.assertEqual(self.cache.get_or_fetch('a', fetch)['n'], 1)
+        self.assertTrue(fetch.done.wait(5))
+        for _ in range(100):  # Until the refresh has stored its response
+            if not self.cache._refreshing:
+                break
+            threading.Event().wait(0.01)
+        self.assertEqual(self.cache.get_or_fetch('a', fetch)['n'], 2)
+
+    def test_expired_entry_is_fetched_again(self):
+        fetch = Fetch()
+        self.cache.get_or_fetch('a', fetch)
+        self.now += 60 + 600
+        self.assertEqual(self.cache.get_or_fetch('a', fetch), {'n': 2})
+
+    def test_failed_fetches_are_not_cached(self):
+        calls = []
+        self.assertIsNone(self.cache.get_or_fetch('a', lambda: calls.append(1)))
+        self.assertIsNone(self.cache.get_or_fetch('a', lambda: calls.append(1)))
+        self.assertEqual(len(calls), 2)
+
+    def test_least_recently_used_entry_is_evicted(self):
+        fetches = {key: Fetch() for key in 'abc'}
+        self.cache.get_or_fetch('a', fetches['a'])
+        self.cache.get_or_fetch('b', fetches['b'])
+        self.cache.get_or_fetch('a', fetches['a'])  # 'b' is now the least recently used
+        self.cache.get_or_fetch('c', fetches['c'])
+        self.cache.get_or_fetch('a', fetches['a'])
+        self.cache.get_or_fetch('b', fetches['b'])
+        self.assertEqual((fetches['a'].calls, fetches['b'].calls), (1, 2))
+
+    def test_requests_in_the_same_bucket_share_a_key(self):
+        start = 1709596800000  # On an hour boundary
+        key = self.cache.key(SOURCES, HOUR_MILLIS, start, start + 10 * 60 * 1000)
+        self.assertEqual(self.cache.key(SOURCES, HOUR_MILLIS, start + 1, start + 59 * 60 * 1000), key)
+        self.assertNotEqual(self.cache.key(SOURCES, HOUR_MILLIS, start, start + HOUR_MILLIS + 1), key)
+        self.assertEqual(self.cache.round_window(start + 1, start + 61 * 1000), (start, start + 2 * 60 * 1000))
+
+
+# The on-disk layer: entries survive a restart, and expired files are deleted
+class DiskCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.now = 1000000.0
+        patcher = mock.patch('response_cache.time.time', lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def cache(self):
+        return ResponseCache(ttl=60, stale_ttl=600, disk_dir=self.directory.name)
+
+    def files(self):
+        return sorted(name for name in os.listdir(self.directory.name) if name.endswith('.json'))
+
+    def test_entry_survives_a_restart(self):
+        self.cache().get_or_fetch('a', Fetch())
+        fetch = Fetch()
+        self.assertEqual(self.cache().get_or_fetch('a', fetch)['n'], 1)
+        self.assertEqual(fetch.calls, 0)
+
+    def test_expired_file_is_not_served(self):
+        self.cache().get_or_fetch('a', Fetch())
+        self.now += 60 + 600
+        fetch = Fetch()
+        self.assertEqual(self.cache().get_or_fetch('a', fetch), {'n': 1})
+        self.assertEqual(fetch.calls, 1)
+
+    def test_sweep_deletes_expired_files_of_other_windows(self):
+        cache = self.cache()
+        for key in 'abc':
+            cache.get_or_fetch(key, Fetch())
+        self.assertEqual(len(self.files()), 3)
+        for name in self.files():
+            path = os.path.join(self.directory.name, name)
+            os.utime(path, (self.now - 60 - 600, self.now - 60 - 600))
+
+        # The next write after the sweep interval deletes the expired files, not the new one
+        self.now += 60 + 600
+        cache.get_or_fetch('d', Fetch())
+        self.assertEqual(len(self.files()), 1)
+        self.assertEqual(cache.get_or_fetch('d', Fetch())['n'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+import os
+import sys
+import unittest
+from multiprocessing import resource_tracker
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sample_ring import RECORD_DOUBLES, SampleRing, iter_records
+
+RING_NAME = f'mhms_test_{os.getpid()}'
+
+
+# Attach like a reader process would. Here the writer is in the same process, and attaching
+# drops the writer's resource tracker registration too, so it is registered again.
+def attach():
+    ring = SampleRing.attach(RING_NAME)
+    resource_tracker.register(ring.shm._name, 'shared_memory')
+    return ring
+
+
+# One writer and its readers, in one process
+class SampleRingTest(unittest.TestCase):
+    def setUp(self):
+        self.writer = SampleRing.create(RING_NAME, capacity=4)
+        self.ring = attach()
+
+    def tearDown(self):
+        self.ring.close()
+        if self.writer is not None:
+            self.writer.close()
+
+    def close_writer(self):
+        self.writer.close()
+        self.writer = None
+
+    def append(self, first, last):
+        for i in range(first, last):
+            self.writer.append(i, 60 + i, 50, 100)
+
+    def read(self, reader):
+        segments = reader.read_new()
+        records = list(iter_records(segments))
+        del segments
+        return [int(timestamp) for timestamp, _, _, _ in records]
+
+    def test_reader_gets_each_record_once(self):
+        reader = self.ring.reader()
+        self.append(0, 3)
+        self.assertEqual(self.read(reader), [0, 1, 2])
+        self.assertEqual(self.read(reader), [])
+        self.append(3, 4)
+        self.assertEqual(self.read(reader), [3])
+
+    def test_wrap_around_gives_two_slices(self):
+        reader = self.ring.reader()
+        self.append(0, 3)
+        self.read(reader)
+        self.append(3, 6)
+        segments = reader.read_new()
+        self.assertEqual([len(segment) // RECORD_DOUBLES for segment in segments], [1, 2])
+        self.assertEqual([int(record[0]) for record in iter_records(segments)], [3, 4, 5])
+        del segments
+
+    def test_lapped_reader_counts_lost_records(self):
+        reader = self.ring.reader()
+        self.append(0, 10)
+        self.assertEqual(self.read(reader), [6, 7, 8, 9])
+        self.assertEqual(reader.lost, 6)
+
+    def test_reader_from_start_gets_the_records_kept(self):
+        self.append(0, 6)
+        self.assertEqual(self.read(self.ring.reader(from_start=True)), [2, 3, 4, 5])
+        self.assertEqual(self.read(self.ring.reader()), [])
+
+    def test_readers_see_the_writer_close(self):
+        self.assertFalse(self.ring.closed)
+        self.close_writer()
+        self.assertTrue(self.ring.closed)
+
+        # A new writer creates a new ring under the same name
+        self.writer = SampleRing.create(RING_NAME, capacity=4)
+        ring = attach()
+        self.assertFalse(ring.closed)
+        ring.close()
+
+    def test_attach_needs_a_ring(self):
+        self.close_writer()
+        with self.assertRaises(FileNotFoundError):
+            attach()
+
+
+if __name__ == '__main__':
+    unittest.main()
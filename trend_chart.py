@@ -0,0 +1,285 @@
+import time
+import tkinter as tk
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+
+# Time shown while following the newest data, and the zoom limits (seconds)
+FOLLOW_WINDOW = 24 * 3600
+MIN_SPAN = 10 * 60
+MAX_SPAN = 2 * 366 * 24 * 3600
+
+# Heart rate range drawn until a value falls outside it
+HEART_RATE_RANGE = (40, 140)
+# Sleep bars are scaled to this many hours
+SLEEP_HOURS_MAX = 12
+
+# Delay before the exact redraw after zooming or panning; until then the items on the
+# canvas are just moved and scaled, which keeps dragging and scrolling smooth
+REDRAW_DELAY_MILLIS = 120
+# Full redraw after this many incremental appends, to drop the items that scrolled away
+MAX_INCREMENTAL_ITEMS = 200
+
+CHART_BG = '#ffffff'
+HEART_RATE_COLOR = '#d9534f'
+SLEEP_COLOR = '#5b7fb9'
+AXIS_COLOR = '#666666'
+
+
+# Largest-Triangle-Three-Buckets downsampling: picks `threshold` of the points so the
+# line keeps its visual shape (peaks and dips survive, unlike with plain striding).
+# Returns the selected indexes. The buckets are walked in Python but every bucket is
+# handled with NumPy, so a year of minute data downsamples in milliseconds.
+def lttb_indexes(xs, ys, threshold):
+    import numpy as np  # Only needed once a view holds more points than pixels
+
+    n = len(xs)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    x = np.asarray(xs, np.float64)
+    y = np.asarray(ys, np.float64)
+
+    # Bucket i covers [edges[i], edges[i + 1]); the first and last points are always kept
+    edges = (np.arange(threshold - 1) * ((n - 2) / (threshold - 2))).astype(np.intp) + 1
+    edges[-1] = n - 1
+    selected = np.empty(threshold, np.intp)
+    selected[0] = 0
+    selected[-1] = n - 1
+
+    a = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        # Third corner: the average of the next bucket (or the last point)
+        average_x = x[end:next_end].mean()
+        average_y = y[end:next_end].mean()
+        areas = np.abs((x[a] - average_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (average_y - y[a]))
+        a = start + int(areas.argmax())
+        selected[i + 1] = a
+    return selected
+
+
+# Live trend panel: minute-level heart rate as a line and daily sleep as bars below it.
+#
+# New points are appended to the canvas as short line items (scrolling the existing
+# items when following the newest data) instead of redrawing everything. A full
+# redraw only draws what is in view, downsampled with LTTB to about one point per
+# pixel. The mouse wheel zooms around the pointer, dragging pans, and a double
+# click goes back to following the newest data.
+class TrendChart(tk.Canvas):
+    def __init__(self, master, width=400, height=180, **kwargs):
+        super().__init__(master, width=width, height=height, bg=CHART_BG, highlightthickness=0, **kwargs)
+        self.times = array('d')  # Heart rate sample times (seconds since the epoch), ascending
+        self.values = array('d')
+        self.sleep = {}  # Day start (seconds since the epoch) -> hours slept
+        self.follow = True
+        now = time.time()
+        self.view = (now - FOLLOW_WINDOW, now)
+        self.y_range = HEART_RATE_RANGE
+        self._last_point = None  # Canvas coordinates of the newest point, when it is drawn
+        self._incremental_items = 0
+        self._redraw_job = None
+        self._drag_x = None
+
+        self.bind('<Configure>', lambda event: self.redraw())
+        self.bind('<MouseWheel>', lambda event: self._zoom(event.x, 0.8 if event.delta > 0 else 1.25))
+        self.bind('<Button-4>', lambda event: self._zoom(event.x, 0.8))  # X11 wheel up
+        self.bind('<Button-5>', lambda event: self._zoom(event.x, 1.25))  # X11 wheel down
+        self.bind('<ButtonPress-1>', self._start_drag)
+        self.bind('<B1-Motion>', self._drag)
+        self.bind('<Double-Button-1>', lambda event: self.follow_latest())
+
+    # Plot area boundaries: heart rate on top, sleep bars in the strip below
+    def _layout(self):
+        width = max(self.winfo_width(), 2)
+        height = max(self.winfo_height(), 2)
+        return width, 12, int(height * 0.68), int(height * 0.74), height - 16
+
+    def _x(self, t, width):
+        start, end = self.view
+        return (t - start) * width / (end - start)
+
+    def _y(self, value, top, bottom):
+        low, high = self.y_range
+        return bottom - (value - low) * (bottom - top) / (high - low)
+
+    # Replace all heart rate samples (times in seconds, ascending)
+    def set_heart_rate(self, times, values):
+        self.times = array('d', times)
+        self.values = array('d', values)
+        self._fit_y_range(self.values)
+        if self.follow and self.times:
+            self._follow_view()
+        self.redraw()
+
+    # Add samples; only the ones newer than the newest sample so far are kept
+    def append_heart_rate(self, times, values):
+        first_new = bisect_right(times, self.times[-1]) if self.times else 0
+        new_times, new_values = times[first_new:], values[first_new:]
+        if not new_times:
+            return
+        previous_count = len(self.times)
+        self.times.extend(new_times)
+        self.values.extend(new_values)
+
+        if self._fit_y_range(new_values) or self._last_point is None or not self.follow:
+            # The scale changed, nothing is drawn yet, or the view is somewhere else
+            if self.follow:
+                self._follow_view()
+            if self.follow or self.view[0] <= new_times[0] <= self.view[1]:
+                self._schedule_redraw(0)
+            return
+
+        width, top, bottom, _, _ = self._layout()
+        # Scroll what is drawn to the left so the newest point ends up at the right edge
+        old_end = self.view[1]
+        self._follow_view()
+        shift = -(self.view[1] - old_end) * width / (self.view[1] - self.view[0])
+        self.move('plot', shift, 0)
+
+        coords = [self._last_point[0] + shift, self._last_point[1]]
+        for t, value in zip(self.times[previous_count:], self.values[previous_count:]):
+            coords.extend((self._x(t, width), self._y(value, top, bottom)))
+        self.create_line(coords, fill=HEART_RATE_COLOR, width=1.5, tags=('plot', 'heart_rate'))
+        self._last_point = tuple(coords[-2:])
+        self._draw_axis()
+
+        self._incremental_items += 1
+        if self._incremental_items > MAX_INCREMENTAL_ITEMS:
+            self._schedule_redraw(0)
+
+    # Set the samples the first time, append the new ones after that
+    def update_heart_rate(self, times, values):
+        if self.times:
+            self.append_heart_rate(times, values)
+        else:
+            self.set_heart_rate(times, values)
+
+    # Replace the daily sleep hours: {day start in seconds: hours}
+    def set_daily_sleep(self, daily_hours):
+        if daily_hours == self.sleep:
+            return
+        self.sleep = dict(daily_hours)
+        self.delete('sleep')
+        self._draw_sleep(*self._layout())
+
+    # Grow the heart rate range to include `values`; returns True if it changed
+    def _fit_y_range(self, values):
+        if not values:
+            return False
+        low, high = self.y_range
+        new_low = min(low, (min(values) // 10) * 10)
+        new_high = max(high, (max(values) // 10 + 1) * 10)
+        if (new_low, new_high) == (low, high):
+            return False
+        self.y_range = (new_low, new_high)
+        return True
+
+    # Keep the current span but end it at the newest sample
+    def _follow_view(self):
+        span = self.view[1] - self.view[0]
+        end = self.times[-1] if self.times else time.time()
+        self.view = (end - span, end)
+
+    # Go back to the last FOLLOW_WINDOW up to the newest sample
+    def follow_latest(self):
+        self.follow = True
+        end = self.times[-1] if self.times else time.time()
+        self.view = (end - FOLLOW_WINDOW, end)
+        self.redraw()
+
+    # Draw everything in view from scratch
+    def redraw(self):
+        self._redraw_job = None
+        self._incremental_items = 0
+        self.delete('plot', 'axis')
+        width, top, bottom, sleep_top, sleep_bottom = self._layout()
+
+        self._last_point = None
+        start, end = self.view
+        # One point beyond each edge keeps the line running to the border
+        first = max(bisect_left(self.times, start) - 1, 0)
+        last = min(bisect_right(self.times, end) + 1, len(self.times))
+        times = self.times[first:last]
+        values = self.values[first:last]
+        if len(times) > width:
+            selected = lttb_indexes(times, values, width)
+            times = [times[i] for i in selected]
+            values = [values[i] for i in selected]
+
+        coords = []
+        for t, value in zip(times, values):
+            coords.extend((self._x(t, width), self._y(value, top, bottom)))
+        if len(coords) >= 4:
+            self.create_line(coords, fill=HEART_RATE_COLOR, width=1.5, tags=('plot', 'heart_rate'))
+        elif coords:
+            x, y = coords
+            self.create_oval(x - 2, y - 2, x + 2, y + 2, fill=HEART_RATE_COLOR, outline='', tags=('plot', 'heart_rate'))
+        if coords and last == len(self.times):
+            self._last_point = (coords[-2], coords[-1])
+
+        self._draw_sleep(width, top, bottom, sleep_top, sleep_bottom)
+        self._draw_axis()
+
+    def _draw_sleep(self, width, top, bottom, sleep_top, sleep_bottom):
+        start, end = self.view
+        for day, hours in self.sleep.items():
+            if day + 86400 < start or day > end:
+                continue
+            bar_top = sleep_bottom - min(hours, SLEEP_HOURS_MAX) * (sleep_bottom - sleep_top) / SLEEP_HOURS_MAX
+            self.create_rectangle(self._x(day, width) + 1, bar_top, self._x(day + 86400, width) - 1, sleep_bottom,
+                                  fill=SLEEP_COLOR, outline='', tags=('plot', 'sleep'))
+
+    def _draw_axis(self):
+        self.delete('axis')
+        width, top, bottom, sleep_top, sleep_bottom = self._layout()
+        start, end = self.view
+        time_format = '%H:%M' if end - start <= 2 * 86400 else '%d %b'
+        low, high = self.y_range
+        font = ('Helvetica', 8)
+        self.create_text(2, top, text=f"{high:.0f} bpm", anchor='nw', fill=AXIS_COLOR, font=font, tags='axis')
+        self.create_text(2, bottom, text=f"{low:.0f}", anchor='sw', fill=AXIS_COLOR, font=font, tags='axis')
+        self.create_text(2, sleep_top, text="Sleep", anchor='nw', fill=AXIS_COLOR, font=font, tags='axis')
+        self.create_text(2, sleep_bottom + 2, text=datetime.fromtimestamp(start).strftime(time_format),
+                         anchor='nw', fill=AXIS_COLOR, font=font, tags='axis')
+        self.create_text(width - 2, sleep_bottom + 2, text=datetime.fromtimestamp(end).strftime(time_format),
+                         anchor='ne', fill=AXIS_COLOR, font=font, tags='axis')
+
+    def _schedule_redraw(self, delay=REDRAW_DELAY_MILLIS):
+        if self._redraw_job is not None:
+            self.after_cancel(self._redraw_job)
+        self._redraw_job = self.after(delay, self.redraw)
+
+    # Zoom by `factor` around the time under canvas x coordinate `x`
+    def _zoom(self, x, factor):
+        width = self._layout()[0]
+        start, end = self.view
+        span = min(max((end - start) * factor, MIN_SPAN), MAX_SPAN)
+        factor = span / (end - start)
+        if factor == 1:
+            return
+        pivot = start + (end - start) * x / width
+        self.view = (pivot - (pivot - start) * factor, pivot + (end - pivot) * factor)
+        self.follow = bool(self.times) and self.view[1] >= self.times[-1]
+        self.scale('plot', x, 0, 1 / factor, 1)  # Immediate feedback; the exact redraw follows
+        self._last_point = None
+        self._draw_axis()
+        self._schedule_redraw()
+
+    def _start_drag(self, event):
+        self._drag_x = event.x
+
+    def _drag(self, event):
+        if self._drag_x is None:
+            return
+        dx = event.x - self._drag_x
+        self._drag_x = event.x
+        width = self._layout()[0]
+        start, end = self.view
+        shift = -dx * (end - start) / width
+        self.view = (start + shift, end + shift)
+        self.follow = bool(self.times) and self.view[1] >= self.times[-1]
+        self.move('plot', dx, 0)
+        self._last_point = None
+        self._draw_axis()
+        self._schedule_redraw()
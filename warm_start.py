@@ -0,0 +1,37 @@
+import os
+import json
+import time
+
+# Last state shown by the app, restored immediately on the next launch
+SNAPSHOT_FILE = os.path.join('fit_cache', 'warm_start.json')
+
+# Values kept in the snapshot: the entry field texts, the last assessment, and
+# when the Google Fit data was fetched and assessed (seconds since the epoch)
+SNAPSHOT_FIELDS = ('heart_rate', 'sleep_hours', 'noise_level', 'light_level',
+                   'stress_score', 'recommendation', 'fetched_at', 'assessed_at')
+
+# Load the snapshot, or None if there is none or it can't be read
+def load_snapshot(path=SNAPSHOT_FILE):
+    try:
+        with open(path) as f:
+            snapshot = json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        print(f"Ignoring unreadable warm-start snapshot {path}: {e}")
+        return None
+    if not isinstance(snapshot, dict):
+        return None
+    return {field: snapshot.get(field) for field in SNAPSHOT_FIELDS + ('saved_at',)}
+
+# Write the snapshot atomically
+def save_snapshot(state, path=SNAPSHOT_FILE):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    snapshot = {field: state.get(field) for field in SNAPSHOT_FIELDS}
+    snapshot['saved_at'] = time.time()
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(snapshot, f, separators=(',', ':'))
+    os.replace(tmp_path, path)